@@ -0,0 +1,82 @@
+"""
+Benchmark of the set-up cost of the minConflicts engines on a generated week.
+
+For each weekday the day's CSP is built the way assigner builds it and the
+engine's search state is made from one random assignment: INCREMENTAL
+fills eager dict tables and a ConflictTracker, COMPILED keeps LazyTables
+and builds its arrays from the constraint functions' matrix forms. The
+search itself is left out, both engines run the same number of trials.
+
+    python scheduler/benchmarks/bench_compile.py --courses 300 --rooms 40 --profs 80
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cspsolver import TableCache, minConflicts, INCREMENTAL, COMPILED
+from instancegen import generate_instance
+from teachercourse_csp import DaySolver, SlotRegistry, maps_day_to_class, profs_for_courses, \
+    WEEKDAYS
+
+
+def make_instance(no_courses, no_rooms, no_profs, seed):
+    """Generates an instance as the user_data tuple taken by assigner."""
+    out = io.StringIO()
+    generate_instance(out, no_courses, no_rooms, no_profs, seed)
+    data = json.loads(out.getvalue())
+    return (data['professors'], data['prof_info'], data['rooms'], data['room_capacities'],
+            data['courses'], data['course_no_students'], data['course_mins'],
+            data['course_days_weekly'])
+
+
+def measure(user_data, engine, seed):
+    """Builds every weekday and its engine state.
+
+    Returns:
+        [tuple] -- (seconds building the CSPs, seconds making the search states)
+    """
+    professors, prof_info, rooms, room_capacities, courses, \
+        course_no_students, course_mins_map, course_days_weekly = user_data
+    random.seed(seed)
+    full_prof_assignment = profs_for_courses(courses, professors, prof_info)
+    daily_courses = maps_day_to_class(course_days_weekly, courses)
+    day_solver = DaySolver(user_data, full_prof_assignment, SlotRegistry(), TableCache(),
+                           engine)
+    built = 0.0
+    compiled = 0.0
+    for day in WEEKDAYS:
+        start = time.perf_counter()
+        csp = day_solver.build(daily_courses[day])
+        built += time.perf_counter() - start
+        solver = minConflicts(csp, engine, rng=seed)
+        assignments = solver.initial_var_assignment()
+        start = time.perf_counter()
+        solver.new_state(assignments)
+        compiled += time.perf_counter() - start
+    return built, compiled
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--courses', type=int, default=300)
+    parser.add_argument('--rooms', type=int, default=40)
+    parser.add_argument('--profs', type=int, default=80)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    user_data = make_instance(args.courses, args.rooms, args.profs, args.seed)
+    print('{:<14}{:>12}{:>12}{:>12}'.format('engine', 'build s', 'state s', 'total s'))
+    for engine in (INCREMENTAL, COMPILED):
+        built, compiled = measure(user_data, engine, args.seed)
+        print('{:<14}{:>12.2f}{:>12.2f}{:>12.2f}'.format(engine, built, compiled,
+                                                         built + compiled))
+
+
+if __name__ == '__main__':
+    main()
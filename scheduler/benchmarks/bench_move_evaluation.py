@@ -0,0 +1,105 @@
+"""
+Micro-benchmark for candidate evaluation in minConflicts.solve.
+
+Compares the old evaluation, which deep-copied the assignments for every
+candidate value, with minConflicts.score_value, which reads the shared
+assignments in place. Reports the peak bytes allocated and the time spent
+per iteration.
+
+    python scheduler/benchmarks/bench_move_evaluation.py --nodes 100
+"""
+import argparse
+import copy
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cspsolver import CSP, minConflicts
+
+
+def make_csp(no_nodes, no_rooms, no_slots):
+    """Builds a CSP where every pair of nodes must not share a value.
+
+    Arguments:
+        no_nodes {int} -- Number of nodes.
+        no_rooms {int} -- Number of rooms in each domain.
+        no_slots {int} -- Number of half-hour start times in each domain.
+
+    Returns:
+        CSP -- The benchmark problem.
+    """
+    def no_time_clash(val1, val2, course1, course2):
+        return 0 if val1 == val2 else 1
+
+    def room_has_capacity(val, course):
+        return 1
+
+    csp = CSP()
+    domain = [(room, (8 + slot // 2, (slot % 2) * 30))
+              for room in range(no_rooms) for slot in range(no_slots)]
+    for index in range(no_nodes):
+        node = ("course{}".format(index), "prof")
+        csp.add_node(node, list(domain))
+        csp.add_unary_constraint(node, room_has_capacity)
+    for index, node_n in enumerate(csp.nodes):
+        for node_m in csp.nodes[index + 1:]:
+            csp.add_binary_constraint(node_n, node_m, no_time_clash)
+    return csp
+
+
+def copy_per_value(solver, assignments, node, domain):
+    """The evaluation minConflicts.solve used to do: one deepcopy per value."""
+    for each_domain in domain:
+        assignments_cpy = copy.deepcopy(assignments)
+        assignments_cpy[node] = each_domain
+        solver.conflicted_neighbors(assignments_cpy, node)
+
+
+def copy_free(solver, assignments, node, domain):
+    """The evaluation minConflicts.solve does now: score each value in place."""
+    for each_domain in domain:
+        solver.score_value(assignments, node, each_domain)
+
+
+def measure(evaluate, solver, assignments, iterations):
+    """Runs evaluate for random nodes and returns (peak bytes, seconds) per iteration."""
+    nodes = solver.csp.nodes
+    allocated = 0
+    elapsed = 0.0
+    for _ in range(iterations):
+        node = random.choice(nodes)
+        domain = solver.csp.node_domains[node]
+        tracemalloc.start()
+        evaluate(solver, assignments, node, domain)
+        allocated += tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        start = time.perf_counter()
+        evaluate(solver, assignments, node, domain)
+        elapsed += time.perf_counter() - start
+    return allocated / iterations, elapsed / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--nodes', type=int, default=60)
+    parser.add_argument('--rooms', type=int, default=4)
+    parser.add_argument('--slots', type=int, default=12)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    solver = minConflicts(make_csp(args.nodes, args.rooms, args.slots))
+    assignments = solver.initial_var_assignment()
+    print('{:<16}{:>18}{:>18}'.format('evaluation', 'peak bytes/iter', 'ms/iteration'))
+    for name, evaluate in (('copy per value', copy_per_value), ('copy-free', copy_free)):
+        allocated, elapsed = measure(evaluate, solver, assignments, args.iterations)
+        print('{:<16}{:>18.0f}{:>18.3f}'.format(name, allocated, elapsed * 1000))
+
+
+if __name__ == '__main__':
+    main()
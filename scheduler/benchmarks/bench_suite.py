@@ -0,0 +1,243 @@
+"""
+Benchmark suite for building and solving day CSPs over a ladder of seeded
+synthetic instances (see instancegen.py).
+
+For each instance it times and measures the peak memory of add_nodes,
+add_unary_constraint and add_binary_constraint on the busiest day (the
+constraint stages run on nodes built outside the measurement), runs
+minConflicts.search from several seeds on that day (iterations and success
+rate), and runs assigner over the whole week (days solved and retries).
+Results are written as JSON. No baseline is shipped, since timings depend
+on the machine: comparing needs --baseline with the results of an earlier
+run on the same machine, and then regressions beyond the tolerance are
+reported and the exit status is 1.
+The suite re-runs itself under a fixed PYTHONHASHSEED, since the day
+assignment and the search iterate over sets of course names.
+
+    python scheduler/benchmarks/bench_suite.py --output results.json
+    python scheduler/benchmarks/bench_suite.py --baseline results.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cspsolver import CSP, minConflicts, propagate, InfeasibleError, \
+    INCREMENTAL, ENGINES
+from instancegen import generate_instance
+from teachercourse_csp import SlotRegistry, AssignerStats, constraint_functions, add_nodes, \
+    add_unary_constraint, add_binary_constraint, add_room_occupancy, maps_day_to_class, \
+    profs_for_courses, assigner, WEEKDAYS, PHASES
+
+# (name, courses, rooms, professors) of each rung of the ladder
+LADDER = [
+    ('small', 10, 10, 8),
+    ('medium', 40, 30, 30),
+    ('large', 120, 80, 80),
+]
+# Seeded searches run on the busiest day of each instance
+SOLVE_RUNS = 5
+# Relative slowdown or memory growth reported as a regression
+TOLERANCE = 0.25
+# Measurements compared against the baseline, and whether larger is better
+METRICS = {'seconds': False, 'peak_bytes': False, 'success_rate': True}
+# String hashing seed the suite runs under so that runs are comparable
+HASH_SEED = '0'
+
+
+def make_instance(no_courses, no_rooms, no_profs, seed):
+    """Generates an instance in memory and returns its user_data tuple."""
+    out = io.StringIO()
+    generate_instance(out, no_courses, no_rooms, no_profs, seed)
+    data = json.loads(out.getvalue())
+    return (data['professors'], data['prof_info'], data['rooms'], data['room_capacities'],
+            data['courses'], data['course_no_students'], data['course_mins'],
+            data['course_days_weekly'])
+
+
+def measure(stage, setup=None):
+    """Runs stage once under tracemalloc and once under the clock.
+
+    Arguments:
+        stage {function} -- Called without arguments, or with the result of
+                            setup; must be repeatable.
+
+    Keyword Arguments:
+        setup {function} -- Called before each run of stage, outside the
+                            measurement (default: {None}).
+
+    Returns:
+        dict -- {'seconds': wall time, 'peak_bytes': peak traced allocation}.
+    """
+    args = () if setup is None else (setup(),)
+    tracemalloc.start()
+    stage(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    args = () if setup is None else (setup(),)
+    start = time.perf_counter()
+    stage(*args)
+    return {'seconds': time.perf_counter() - start, 'peak_bytes': peak}
+
+
+def bench_instance(name, user_data, seed, engine):
+    """Benchmarks one instance.
+
+    Returns:
+        list -- One result dict per stage.
+    """
+    professors, prof_info, rooms, room_capacities, courses, \
+        course_no_students, course_mins_map, course_days_weekly = user_data
+    random.seed(seed)
+    full_prof_assignment = profs_for_courses(courses, professors, prof_info)
+    daily_courses = maps_day_to_class(course_days_weekly, courses)
+    day_courses = max((daily_courses[day] for day in WEEKDAYS), key=len)
+    registry = SlotRegistry()
+    room_has_capacity, no_class_overlap, _ = constraint_functions(
+        room_capacities, course_no_students, course_mins_map, registry)
+
+    def build_nodes():
+        csp = CSP()
+        add_nodes(day_courses, rooms, {}, full_prof_assignment, prof_info, csp, registry)
+        return csp
+
+    def build_unary(csp):
+        add_unary_constraint(csp, room_has_capacity)
+
+    def build_binary(csp):
+        add_binary_constraint(csp, course_mins_map, no_class_overlap, registry=registry)
+
+    results = []
+    for stage, run, setup in (('add_nodes', build_nodes, None),
+                              ('add_unary_constraint', build_unary, build_nodes),
+                              ('add_binary_constraint', build_binary, build_nodes)):
+        result = {'instance': name, 'stage': stage, 'sections': len(day_courses)}
+        result.update(measure(run, setup))
+        results.append(result)
+
+    csp = build_nodes()
+    add_unary_constraint(csp, room_has_capacity)
+    add_binary_constraint(csp, course_mins_map, no_class_overlap, registry=registry)
+    add_room_occupancy(csp, course_mins_map, registry)
+    try:
+        propagate(csp)
+    except InfeasibleError:
+        pass
+    searches = []
+
+    def solve():
+        searches[:] = [minConflicts(csp, engine, rng=seed + run).search()
+                       for run in range(SOLVE_RUNS)]
+
+    result = {'instance': name, 'stage': 'minConflicts.search', 'sections': len(day_courses)}
+    result.update(measure(solve))
+    result['iterations'] = sum(search.iterations for search in searches) / SOLVE_RUNS
+    result['success_rate'] = sum(search.conflicts == 0 for search in searches) / SOLVE_RUNS
+    results.append(result)
+
+    def week():
+        random.seed(seed)
+        stats = AssignerStats()
+        solution = assigner(user_data, engine, stats=stats)
+        week_result.update({
+            'days_solved': sum(solution[day] is not None for day in WEEKDAYS),
+            'retries': sum(stats.day_retries(day) for day in WEEKDAYS),
+            'phase_seconds': {phase: stats.total(phase) for phase in PHASES}})
+
+    week_result = {'instance': name, 'stage': 'assigner', 'sections':
+                   sum(len(daily_courses[day]) for day in WEEKDAYS)}
+    week_result.update(measure(week))
+    week_result['success_rate'] = week_result['days_solved'] / len(WEEKDAYS)
+    results.append(week_result)
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Compares results to a baseline run.
+
+    Arguments:
+        results {list} -- Result dicts of this run.
+        baseline {list} -- Result dicts of the baseline run.
+
+    Keyword Arguments:
+        tolerance {float} -- Allowed relative change (default: {TOLERANCE}).
+
+    Returns:
+        list -- A message per regressed (instance, stage, metric).
+    """
+    previous = {(result['instance'], result['stage']): result for result in baseline}
+    regressions = []
+    for result in results:
+        old = previous.get((result['instance'], result['stage']))
+        if old is None:
+            continue
+        for metric, larger_is_better in METRICS.items():
+            if metric not in result or metric not in old:
+                continue
+            new_value, old_value = result[metric], old[metric]
+            if larger_is_better:
+                regressed = new_value < old_value - tolerance * max(old_value, 1e-12)
+            else:
+                regressed = new_value > old_value * (1 + tolerance)
+            if regressed:
+                regressions.append('{} {} {}: {:.6g} -> {:.6g}'.format(
+                    result['instance'], result['stage'], metric, old_value, new_value))
+    return regressions
+
+
+def main():
+    if os.environ.get('PYTHONHASHSEED') != HASH_SEED:
+        os.environ['PYTHONHASHSEED'] = HASH_SEED
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', default=[rung[0] for rung in LADDER],
+                        choices=[rung[0] for rung in LADDER])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--engine', default=INCREMENTAL, choices=ENGINES)
+    parser.add_argument('--output', help='file the JSON results are written to')
+    parser.add_argument('--baseline',
+                        help='JSON results of an earlier run on this machine to compare to; '
+                             'without it nothing is compared')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    results = []
+    for name, no_courses, no_rooms, no_profs in LADDER:
+        if name not in args.sizes:
+            continue
+        user_data = make_instance(no_courses, no_rooms, no_profs, args.seed)
+        results.extend(bench_instance(name, user_data, args.seed, args.engine))
+
+    print('{:<10}{:<24}{:>9}{:>12}{:>14}{:>10}'.format(
+        'instance', 'stage', 'sections', 'ms', 'peak bytes', 'success'))
+    for result in results:
+        print('{:<10}{:<24}{:>9}{:>12.3f}{:>14}{:>10}'.format(
+            result['instance'], result['stage'], result['sections'],
+            result['seconds'] * 1000, result['peak_bytes'],
+            '' if 'success_rate' not in result else '{:.0%}'.format(result['success_rate'])))
+
+    if args.output:
+        with open(args.output, 'w') as out:
+            json.dump({'seed': args.seed, 'engine': args.engine,
+                       'hash_seed': HASH_SEED, 'python': platform.python_version(), 'results': results},
+                      out, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline['results'], args.tolerance)
+        for regression in regressions:
+            print('REGRESSION', regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
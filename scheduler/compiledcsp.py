@@ -0,0 +1,469 @@
+import random
+
+import numpy as np
+from cspsolver import LazyTable, least_conflicted
+
+"""
+classes CompiledCSP and CompiledState below map the nodes and domain values of a
+cspsolver.CSP to integer indices, store its constraint tables
+as NumPy arrays and search over integer assignment arrays
+"""
+
+
+def table_matrix(table, values, neigh_values, dtype):
+    """Reads an eager {val: {neigh_val: weight}} table as a matrix. Rows whose
+    keys are already in domain order, as built by CSP.add_binary_constraint,
+    are copied whole.
+
+    Arguments:
+        table {dict} -- The table.
+        values {list} -- Domain values of the rows, in order.
+        neigh_values {list} -- Domain values of the columns, in order.
+        dtype {numpy.dtype} -- Type of the matrix.
+
+    Returns:
+        numpy.ndarray -- A |values| x |neigh_values| matrix.
+    """
+    rows = []
+    for val in values:
+        row = table[val]
+        if len(row) == len(neigh_values) and list(row) == neigh_values:
+            rows.append(list(row.values()))
+        else:
+            rows.append([row[neigh_val] for neigh_val in neigh_values])
+    return np.array(rows, dtype=dtype).reshape(len(values), len(neigh_values))
+
+
+def edge_matrix(table, values, neigh_values, dtype):
+    """Builds the matrix of one edge from its eager table or LazyTable.
+
+    A constraint function with a matrix attribute, called as
+    matrix(values_a, values_b, course_a, course_b) and returning the
+    |values_a| x |values_b| array of its weights, is evaluated over the whole
+    edge at once; the factors of a LazyTable without one are computed entry
+    by entry, without filling its memo.
+
+    Arguments:
+        table {dict or LazyTable} -- The table of the edge.
+        values {list} -- Domain values of the rows, in order.
+        neigh_values {list} -- Domain values of the columns, in order.
+        dtype {numpy.dtype} -- Type of the matrix.
+
+    Returns:
+        numpy.ndarray -- A |values| x |neigh_values| matrix.
+    """
+    if not isinstance(table, LazyTable):
+        return table_matrix(table, values, neigh_values, dtype)
+    if not all(hasattr(constraint_func, 'matrix') for constraint_func, _ in table.factors):
+        rows = [[table.compute(val, neigh_val) for neigh_val in neigh_values]
+                for val in values]
+        return np.array(rows, dtype=dtype).reshape(len(values), len(neigh_values))
+    matrix = np.ones((len(values), len(neigh_values)), dtype=dtype)
+    for table_factor in table.tables:
+        matrix *= table_matrix(table_factor, values, neigh_values, dtype)
+    for constraint_func, reverse in table.factors:
+        if reverse:
+            matrix *= constraint_func.matrix(neigh_values, values,
+                                             table.course_b, table.course_a).T
+        else:
+            matrix *= constraint_func.matrix(values, neigh_values,
+                                             table.course_a, table.course_b)
+    return matrix
+
+
+# Class definition for a dense-array constraint satisfaction problem
+class CompiledCSP(object):
+    def __init__(self, csp, dtype=np.float32):
+        """Compiles a CSP into integer-indexed NumPy arrays.
+
+        Every directed edge (node, neighbor) of csp.binary_constraints becomes a
+        |domain(node)| x |domain(neighbor)| matrix, see edge_matrix. The matrices
+        are stored one after the other in weights, grouped by node, so the edges
+        of node i are indptr[i]:indptr[i + 1].
+
+        Arguments:
+            csp {cspsolver.CSP} -- The constraint satisfaction problem to compile.
+
+        Keyword Arguments:
+            dtype {numpy.dtype} -- Type of the stored weights (default: {numpy.float32}).
+
+        Attributes:
+            nodes {list} -- Nodes in index order.
+            node_index {dict} -- Maps each node to its index.
+            values {list} -- values[i] is the list of domain values of node i.
+            value_index {list} -- value_index[i] maps each value of node i to its index.
+            domain_sizes {numpy.ndarray} -- Domain size of each node.
+            unary {list} -- unary[i] is the vector of unary weights of node i.
+            indptr {numpy.ndarray} -- Edges indptr[i]:indptr[i + 1] start at node i.
+            edge_src {numpy.ndarray} -- Node each edge starts at.
+            edge_dst {numpy.ndarray} -- Node each edge ends at.
+            edge_offset {numpy.ndarray} -- Start of each edge's matrix in weights.
+            weights {numpy.ndarray} -- All edge matrices, flattened row by row.
+            spans {list} -- For each resource constraint, (resource, start, end)
+                            arrays over every value of every node, laid out as
+                            unary_weights; resource is -1 where nothing is held.
+            grid_shapes {list} -- (resources, slots) of each resource constraint.
+            version {int} -- csp.version when compiled.
+        """
+        self.version = csp.version
+        self.nodes = list(csp.nodes)
+        self.node_index = {node: i for i, node in enumerate(self.nodes)}
+        self.values = [list(csp.node_domains[node]) for node in self.nodes]
+        self.value_index = [{val: k for k, val in enumerate(values)}
+                            for values in self.values]
+        self.domain_sizes = np.array([len(values) for values in self.values],
+                                     dtype=np.intp)
+        self.unary = []
+        for node, values in zip(self.nodes, self.values):
+            factor = csp.unary_constraints.get(node)
+            if factor is None:
+                self.unary.append(np.ones(len(values), dtype=dtype))
+            else:
+                self.unary.append(np.array([factor[val] for val in values], dtype=dtype))
+        self.unary_offset = np.zeros(len(self.nodes), dtype=np.intp)
+        if self.nodes:
+            self.unary_offset[1:] = np.cumsum(self.domain_sizes)[:-1]
+        self.unary_weights = np.concatenate(self.unary) if self.unary \
+            else np.zeros(0, dtype=dtype)
+
+        indptr = [0]
+        edge_src = []
+        edge_dst = []
+        edge_offset = []
+        matrices = []
+        offset = 0
+        for i, node in enumerate(self.nodes):
+            neighbors = csp.binary_constraints.get(node, {})
+            for j in sorted(self.node_index[neigh] for neigh in neighbors):
+                matrix = edge_matrix(neighbors[self.nodes[j]], self.values[i],
+                                     self.values[j], dtype)
+                edge_src.append(i)
+                edge_dst.append(j)
+                edge_offset.append(offset)
+                matrices.append(matrix.ravel())
+                offset += matrix.size
+            indptr.append(len(edge_dst))
+        self.indptr = np.array(indptr, dtype=np.intp)
+        self.edge_src = np.array(edge_src, dtype=np.intp)
+        self.edge_dst = np.array(edge_dst, dtype=np.intp)
+        self.edge_offset = np.array(edge_offset, dtype=np.intp)
+        self.edge_cols = self.domain_sizes[self.edge_dst]
+        self.weights = np.concatenate(matrices) if matrices \
+            else np.zeros(0, dtype=dtype)
+
+        self.spans = []
+        self.grid_shapes = []
+        for occupies in csp.resource_constraints:
+            resource_index = {}
+            spans = []
+            for node, values in zip(self.nodes, self.values):
+                for val in values:
+                    span = occupies(node, val)
+                    if span is None:
+                        spans.append((-1, 0, 0))
+                    else:
+                        resource, start, end = span
+                        spans.append((resource_index.setdefault(resource, len(resource_index)),
+                                      start, end))
+            spans = np.array(spans, dtype=np.intp).reshape(-1, 3)
+            self.spans.append((spans[:, 0].copy(), spans[:, 1].copy(), spans[:, 2].copy()))
+            self.grid_shapes.append((len(resource_index),
+                                     int(spans[:, 2].max()) if len(spans) else 0))
+
+    @property
+    def nbytes(self):
+        """Memory held by the compiled arrays, in bytes."""
+        arrays = (self.domain_sizes, self.unary_offset, self.unary_weights, self.indptr,
+                  self.edge_src, self.edge_dst, self.edge_offset, self.edge_cols,
+                  self.weights)
+        return (sum(array.nbytes for array in arrays)
+                + sum(array.nbytes for spans in self.spans for array in spans))
+
+    def table(self, i, j):
+        """Returns the constraint matrix of the edge from node i to node j.
+
+        Arguments:
+            i {int} -- Index of the first node.
+            j {int} -- Index of the second node.
+
+        Raises:
+            KeyError: Raises KeyError if there is no edge between the nodes.
+
+        Returns:
+            numpy.ndarray -- A |domain(i)| x |domain(j)| view into weights.
+        """
+        start, end = self.indptr[i], self.indptr[i + 1]
+        position = start + np.searchsorted(self.edge_dst[start:end], j)
+        if position == end or self.edge_dst[position] != j:
+            raise KeyError((self.nodes[i], self.nodes[j]))
+        offset = self.edge_offset[position]
+        shape = (self.domain_sizes[i], self.domain_sizes[j])
+        return self.weights[offset:offset + shape[0] * shape[1]].reshape(shape)
+
+    def encode(self, assignments):
+        """Maps an assignment {node: value} to an array of value indices.
+
+        Arguments:
+            assignments {dict} -- Domain assignment of each node.
+
+        Returns:
+            numpy.ndarray -- The value index of each node.
+        """
+        return np.array([self.value_index[i][assignments[node]]
+                         for i, node in enumerate(self.nodes)], dtype=np.intp)
+
+    def decode(self, assignment):
+        """Maps an array of value indices back to {node: value}.
+
+        Arguments:
+            assignment {numpy.ndarray} -- The value index of each node.
+
+        Returns:
+            dict -- Domain assignment of each node.
+        """
+        return {node: self.values[i][k]
+                for i, (node, k) in enumerate(zip(self.nodes, assignment.tolist()))}
+
+    def edge_weights(self, assignment):
+        """Returns the weight of every edge under an assignment.
+
+        Arguments:
+            assignment {numpy.ndarray} -- The value index of each node.
+
+        Returns:
+            numpy.ndarray -- One weight per edge.
+        """
+        positions = (self.edge_offset + assignment[self.edge_src] * self.edge_cols
+                     + assignment[self.edge_dst])
+        return self.weights[positions]
+
+    def occupancy(self, assignment):
+        """Builds the occupant counts of each resource constraint.
+
+        Arguments:
+            assignment {numpy.ndarray} -- The value index of each node.
+
+        Returns:
+            list -- One (resources x slots) count array per resource constraint.
+        """
+        grids = []
+        positions = self.unary_offset + assignment
+        for (resources, starts, ends), shape in zip(self.spans, self.grid_shapes):
+            counts = np.zeros(shape, dtype=np.intp)
+            for resource, start, end in zip(resources[positions].tolist(),
+                                            starts[positions].tolist(),
+                                            ends[positions].tolist()):
+                if resource >= 0:
+                    counts[resource, start:end] += 1
+            grids.append(counts)
+        return grids
+
+    def conflicted(self, assignment, grids=None):
+        """Finds the conflicted nodes of an assignment.
+
+        Arguments:
+            assignment {numpy.ndarray} -- The value index of each node.
+
+        Keyword Arguments:
+            grids {list} -- The assignment's occupancy counts, built when None
+                            (default: {None}).
+
+        Returns:
+            numpy.ndarray -- Indices of the nodes in a violated constraint.
+        """
+        if grids is None:
+            grids = self.occupancy(assignment)
+        positions = self.unary_offset + assignment
+        mask = self.unary_weights[positions] == 0
+        mask[self.edge_src[self.edge_weights(assignment) == 0]] = True
+        for (resources, starts, ends), counts in zip(self.spans, grids):
+            # slots held twice, summed along each resource
+            shared = np.zeros((counts.shape[0], counts.shape[1] + 1), dtype=np.intp)
+            np.cumsum(counts > 1, axis=1, out=shared[:, 1:])
+            held = resources[positions]
+            placed = held >= 0
+            mask[placed] |= (shared[held[placed], ends[positions][placed]]
+                             > shared[held[placed], starts[positions][placed]])
+        return np.flatnonzero(mask)
+
+    def score_value(self, assignment, i, k):
+        """Scores a trial move of node i to value k without mutating assignment.
+
+        Arguments:
+            assignment {numpy.ndarray} -- The value index of each node.
+            i {int} -- Index of the node.
+            k {int} -- Index of the value to try.
+
+        Returns:
+            tuple -- (number of conflicted nodes, soft weight), as
+                     minConflicts.score_value.
+        """
+        start, end = self.indptr[i], self.indptr[i + 1]
+        positions = (self.edge_offset[start:end] + k * self.edge_cols[start:end]
+                     + assignment[self.edge_dst[start:end]])
+        weights = self.weights[positions]
+        hard = weights == 0
+        conflicts = int(np.count_nonzero(hard))
+        if self.spans:
+            conflicts += int(self.clashes(assignment, i)[k])
+        soft_weight = float(np.prod(weights[~hard]))
+        unary_ok = self.unary[i][k] != 0
+        if not unary_ok or conflicts:
+            conflicts += 1
+        return (conflicts, soft_weight)
+
+    def clashes(self, assignment, i):
+        """Counts, for each value of node i, the other nodes holding a slot the
+        node would hold, summed over the resource constraints; the rule of
+        cspsolver.OccupancyGrid.clashes.
+
+        Arguments:
+            assignment {numpy.ndarray} -- The value index of each node.
+            i {int} -- Index of the node.
+
+        Returns:
+            numpy.ndarray -- One count per value of node i.
+        """
+        clashes = np.zeros(self.domain_sizes[i], dtype=np.intp)
+        first = self.unary_offset[i]
+        values = slice(first, first + self.domain_sizes[i])
+        positions = self.unary_offset + assignment
+        others = np.arange(len(self.nodes)) != i
+        for resources, starts, ends in self.spans:
+            resource = resources[values]
+            held = resources[positions]
+            placed = (held >= 0) & others
+            if not (resource >= 0).any() or not placed.any():
+                continue
+            held = held[placed]
+            overlap = ((resource[:, None] == held[None, :])
+                       & (starts[values, None] < ends[positions][placed][None, :])
+                       & (starts[positions][placed][None, :] < ends[values, None]))
+            overlap[resource < 0] = False
+            clashes += np.count_nonzero(overlap, axis=1)
+        return clashes
+
+    def score_values(self, assignment, i):
+        """Scores a move of node i to each of its values in one pass over
+        the rows of its neighbors' constraint matrices.
+
+        Arguments:
+            assignment {numpy.ndarray} -- The value index of each node.
+            i {int} -- Index of the node.
+
+        Returns:
+            tuple -- (conflicts, soft weights), two vectors over the values of
+                     node i holding what score_value returns for each value;
+                     a resource constraint adds the clashes count.
+        """
+        start, end = self.indptr[i], self.indptr[i + 1]
+        values = np.arange(self.domain_sizes[i])
+        positions = (self.edge_offset[start:end, None]
+                     + values[None, :] * self.edge_cols[start:end, None]
+                     + assignment[self.edge_dst[start:end], None])
+        weights = self.weights[positions]
+        hard = weights == 0
+        conflicts = np.count_nonzero(hard, axis=0)
+        if self.spans:
+            conflicts += self.clashes(assignment, i)
+        soft_weights = np.where(hard, 1, weights).prod(axis=0, dtype=np.float64)
+        conflicts += (conflicts > 0) | (self.unary[i] == 0)
+        return (conflicts, soft_weights)
+
+
+# Class definition for the search state of the COMPILED engine
+class CompiledState(object):
+    def __init__(self, compiled, assignments, rng=random):
+        """Search state holding an integer assignment array.
+
+        Arguments:
+            compiled {CompiledCSP} -- The compiled problem.
+            assignments {dict} -- Initial domain assignment of each node.
+
+        Keyword Arguments:
+            rng {random.Random} -- Source of randomness (default: {random}).
+        """
+        self.compiled = compiled
+        self.rng = rng
+        self.assignments = compiled.encode(assignments)
+        self.grids = compiled.occupancy(self.assignments)
+        self.conflicted = np.zeros(0, dtype=np.intp)
+
+    def conflicted_nodes(self):
+        """Finds the conflicted nodes of the current assignment.
+
+        Returns:
+            numpy.ndarray -- Indices of the conflicted nodes.
+        """
+        self.conflicted = self.compiled.conflicted(self.assignments, self.grids)
+        return self.conflicted
+
+    def random_conflicted(self):
+        """Chooses a random node of the last conflicted_nodes scan.
+
+        Returns:
+            int -- Index of the node.
+        """
+        return int(self.rng.choice(self.conflicted))
+
+    def value_scores(self, i):
+        """Scores every value of node i in one batch.
+
+        Arguments:
+            i {int} -- Index of the node.
+
+        Returns:
+            tuple -- (domain, conflicts, weights); the value indices of node i
+                     and, indexed by them, their conflicts and soft weights.
+        """
+        conflicts, weights = self.compiled.score_values(self.assignments, i)
+        return list(range(self.compiled.domain_sizes[i])), conflicts.tolist(), weights.tolist()
+
+    def best_value(self, i):
+        """Scores every value of node i in one batch and chooses the least
+        conflicted one, breaking ties at random weighted on soft-constraints.
+
+        Arguments:
+            i {int} -- Index of the node.
+
+        Returns:
+            int -- Index of the chosen value.
+        """
+        domain, conflicts, weights = self.value_scores(i)
+        self.rng.shuffle(domain)
+        return least_conflicted(domain, int(self.assignments[i]), conflicts, weights, self.rng)
+
+    def random_value(self, i):
+        """Chooses a random value of node i.
+
+        Arguments:
+            i {int} -- Index of the node.
+
+        Returns:
+            int -- Index of the value.
+        """
+        return self.rng.randrange(self.compiled.domain_sizes[i])
+
+    def move(self, i, k):
+        """Assigns value k to node i and moves it on the occupancy grids.
+
+        Arguments:
+            i {int} -- Index of the node.
+            k {int} -- Index of the value.
+        """
+        old = self.compiled.unary_offset[i] + self.assignments[i]
+        new = self.compiled.unary_offset[i] + k
+        for (resources, starts, ends), counts in zip(self.compiled.spans, self.grids):
+            if resources[old] >= 0:
+                counts[resources[old], starts[old]:ends[old]] -= 1
+            if resources[new] >= 0:
+                counts[resources[new], starts[new]:ends[new]] += 1
+        self.assignments[i] = k
+
+    def assignment(self):
+        """Decodes the current assignment.
+
+        Returns:
+            dict -- Domain assignment of each node.
+        """
+        return self.compiled.decode(self.assignments)
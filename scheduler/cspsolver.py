@@ -1,17 +1,312 @@
-import copy
+import collections
+import math
+from array import array
+import multiprocessing
 import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed, TimeoutError as FuturesTimeout
 
 """
 classes CSP and minConflicts below define
 & solve a constraint satisfaction problem
 """
 
+# Engines available to minConflicts.solve
+STANDARD = 'standard'
+INCREMENTAL = 'incremental'
+COMPILED = 'compiled'
+ENGINES = (STANDARD, INCREMENTAL, COMPILED)
+
+# Trials a value stays tabu after tabuSearch moves a node off it
+TABU_TENURE = 10
+
+# Outcomes of backtrackingSearch.solve
+SOLVED = 'solved'
+INFEASIBLE = 'infeasible'
+LIMIT = 'limit'
+
+# Iterations per node granted by iteration_budget on a sparse CSP
+ITERATIONS_PER_NODE = 20
+
+# Outcome of minConflicts.search: the least conflicted assignment seen,
+# its number of conflicted nodes (0 when solved) and the iterations run
+SolveResult = collections.namedtuple('SolveResult', ['assignments', 'conflicts', 'iterations'])
+
+# Geometric cooling schedule of simulatedAnnealing, in units of log weight
+ANNEAL_START_TEMPERATURE = 1.0
+ANNEAL_END_TEMPERATURE = 0.01
+# Share of simulatedAnnealing proposals that swap the values of two nodes
+ANNEAL_SWAP_RATE = 0.5
+
+# Outcome of simulatedAnnealing.anneal: the best feasible assignment seen,
+# its summed log soft weights and the proposals tried
+AnnealResult = collections.namedtuple('AnnealResult', ['assignments', 'objective', 'iterations'])
+
+# Rough size of one entry of an eager binary constraint table
+# (two levels of dict slots plus the weight), used for memory estimates
+TABLE_ENTRY_BYTES = 48
+
+
+class InfeasibleError(ValueError):
+    def __init__(self, node):
+        """Raised when constraint propagation empties the domain of a node.
+
+        Arguments:
+            node {tuple} -- The node left without values.
+        """
+        super(InfeasibleError, self).__init__(node, "has no consistent value.")
+        self.node = node
+
+
+class LazyRow(dict):
+    def __init__(self, table, val_a):
+        """One row of a LazyTable; entries are computed on first read.
+
+        Arguments:
+            table {LazyTable} -- The table the row belongs to.
+            val_a {tuple} -- The (room, hours) value of the row's node.
+        """
+        super(LazyRow, self).__init__()
+        self.table = table
+        self.val_a = val_a
+
+    def __missing__(self, val_b):
+        weight = self.table.compute(self.val_a, val_b)
+        self[val_b] = weight
+        return weight
+
+
+class LazyTable(dict):
+    def __init__(self, course_a, course_b):
+        """Binary constraint table from node_a to node_b that stores its
+        constraint functions and memoizes entries the first time they are read.
+
+        Arguments:
+            course_a {string} -- Course of node_a.
+            course_b {string} -- Course of node_b.
+
+        Attributes:
+            factors {list} -- (constraint_func, reverse) pairs multiplied together;
+                              reverse is True when node_a was passed second.
+            tables {list} -- Eager table factors multiplied in as well.
+        """
+        super(LazyTable, self).__init__()
+        self.course_a = course_a
+        self.course_b = course_b
+        self.factors = []
+        self.tables = []
+
+    def __missing__(self, val_a):
+        row = LazyRow(self, val_a)
+        self[val_a] = row
+        return row
+
+    def add_factor(self, constraint_func, reverse):
+        """Multiplies a constraint function into the table.
+
+        Arguments:
+            constraint_func {function} -- A binary constraint function.
+            reverse {bool} -- Whether the function takes node_b's value first.
+        """
+        self.factors.append((constraint_func, reverse))
+        self.clear()
+
+    def add_table(self, table_factor):
+        """Multiplies an eager table {val_a: {val_b: weight}} into the table.
+
+        Arguments:
+            table_factor {dict} -- The table factor.
+        """
+        self.tables.append(table_factor)
+        self.clear()
+
+    def compute(self, val_a, val_b):
+        """Computes one entry without memoizing it.
+
+        Arguments:
+            val_a {tuple} -- The (room, hours) value of node_a.
+            val_b {tuple} -- The (room, hours) value of node_b.
+
+        Returns:
+            int -- The product of every factor at (val_a, val_b).
+        """
+        weight = 1
+        for table_factor in self.tables:
+            weight *= table_factor[val_a][val_b]
+        for constraint_func, reverse in self.factors:
+            if reverse:
+                weight *= constraint_func(val_b, val_a, self.course_b, self.course_a)
+            else:
+                weight *= constraint_func(val_a, val_b, self.course_a, self.course_b)
+        return weight
+
+
+# Class definition for a resource x time-slot occupancy grid
+class OccupancyGrid(object):
+    def __init__(self, occupies):
+        """Counts, for each resource and time slot, the nodes holding it.
+
+        Arguments:
+            occupies {function} -- Maps (node, value) to the (resource, start, end)
+                                   range of slots [start, end) the node holds
+                                   at that value, or None.
+
+        Attributes:
+            counts {dict} -- Maps each resource to a list of occupant counts per slot.
+            residents {dict} -- Maps each resource to the set of nodes placed on it.
+            placements {dict} -- Maps each placed node to its (resource, start, end).
+        """
+        self.occupies = occupies
+        self.counts = {}
+        self.residents = {}
+        self.placements = {}
+
+    def place(self, node, val):
+        """Places a node at a value; the node must not be placed already.
+
+        Arguments:
+            node {tuple} -- A tuple of (course, professor).
+            val {tuple} -- The (room, hours) value of the node.
+        """
+        span = self.occupies(node, val)
+        if span is None:
+            return
+        resource, start, end = span
+        counts = self.counts.setdefault(resource, [])
+        if len(counts) < end:
+            counts.extend([0] * (end - len(counts)))
+        for slot in range(start, end):
+            counts[slot] += 1
+        self.residents.setdefault(resource, set()).add(node)
+        self.placements[node] = span
+
+    def remove(self, node):
+        """Removes a node from the grid.
+
+        Arguments:
+            node {tuple} -- A tuple of (course, professor).
+        """
+        span = self.placements.pop(node, None)
+        if span is None:
+            return
+        resource, start, end = span
+        counts = self.counts[resource]
+        for slot in range(start, end):
+            counts[slot] -= 1
+        self.residents[resource].discard(node)
+
+    def overlapping(self, node, val):
+        """Finds the other nodes holding a slot the node would hold at val.
+
+        Arguments:
+            node {tuple} -- A tuple of (course, professor).
+            val {tuple} -- The (room, hours) value of the node.
+
+        Returns:
+            list -- The overlapping nodes.
+        """
+        span = self.occupies(node, val)
+        if span is None:
+            return []
+        resource, start, end = span
+        return [resident for resident in self.residents.get(resource, ())
+                if resident != node and self.placements[resident][1] < end
+                and start < self.placements[resident][2]]
+
+    def clashes(self, node, val):
+        """Counts the other nodes overlapping the node at val. Only the node's
+        slots are read unless one of them is taken.
+
+        Arguments:
+            node {tuple} -- A tuple of (course, professor).
+            val {tuple} -- The (room, hours) value of the node.
+
+        Returns:
+            int -- Number of overlapping nodes.
+        """
+        span = self.occupies(node, val)
+        if span is None:
+            return 0
+        resource, start, end = span
+        counts = self.counts.get(resource)
+        if counts is None:
+            return 0
+        own = self.placements.get(node)
+        if own is not None and own[0] == resource:
+            taken = any(counts[slot] - (own[1] <= slot < own[2]) > 0
+                        for slot in range(start, min(end, len(counts))))
+        else:
+            taken = any(counts[slot] > 0 for slot in range(start, min(end, len(counts))))
+        return len(self.overlapping(node, val)) if taken else 0
+
+
+def domain_fingerprint(domain):
+    """Returns a hashable key identifying the values of a domain, in order.
+
+    Arguments:
+        domain {list} -- A list of values, or an array of value ids.
+
+    Returns:
+        bytes or tuple -- The fingerprint.
+    """
+    if isinstance(domain, array):
+        return domain.typecode.encode() + domain.tobytes()
+    return tuple(domain)
+
+
+# Class definition for a cache of constraint tables shared between CSPs
+class TableCache(object):
+    def __init__(self, tables=None):
+        """Memoizes unary and binary constraint tables across CSPs, keyed by
+        (constraint kind, courses, domain fingerprints). Tables handed out by
+        the cache are shared and must not be mutated.
+
+        Keyword Arguments:
+            tables {dict} -- Tables to start from, e.g. unpickled (default: {None}).
+
+        Attributes:
+            tables {dict} -- Maps each key to its table(s).
+            hits {int} -- Number of lookups answered from the cache.
+            misses {int} -- Number of lookups that built a table.
+        """
+        self.tables = {} if tables is None else tables
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.tables)
+
+    def get(self, key, build):
+        """Returns the cached table(s) of a key, building them on a miss.
+
+        Arguments:
+            key {tuple} -- The cache key.
+            build {function} -- Called without arguments to build the table(s).
+
+        Returns:
+            object -- The table(s) of the key.
+        """
+        tables = self.tables.get(key)
+        if tables is None:
+            self.misses += 1
+            tables = self.tables[key] = build()
+        else:
+            self.hits += 1
+        return tables
+
 
 # Class definition for a constraint satisfaction problem
 class CSP(object):
-    def __init__(self):
+    def __init__(self, memory_budget=None, table_cache=None):
         """Constraint Satisfaction Problem class.
 
+        Keyword Arguments:
+            memory_budget {int} -- Bytes the eager binary constraint tables may
+                                   take before new ones are stored as LazyTables,
+                                   None for no limit (default: {None}).
+            table_cache {TableCache} -- Reuses the tables of constraints added
+                                        with a kind (default: {None}).
+
         Attributes:
             nodes {list} -- A list of nodes (course, professor).
             node_domains {dict} -- Maps each node to its domain (rooms, hours).
@@ -19,11 +314,28 @@ class CSP(object):
                                         unary constraints
             binary_constraints {dict} -- Maps each node to its
                                          binary constraints
+            resource_constraints {list} -- occupies functions of OccupancyGrid;
+                                           two nodes holding the same slot of a
+                                           resource are in conflict.
+            table_bytes {int} -- Estimated memory of the eager binary tables.
+            unary_funcs {dict} -- Maps each node to its [(constraint_func, kind)].
+            binary_funcs {dict} -- Maps each (node1, node2) to its
+                                   [(constraint_func, lazy, kind)], in the
+                                   argument order they were added with.
+            version {int} -- Incremented by every change to the CSP, so solvers
+                             can tell when state derived from it is stale.
         """
         self.nodes = []
         self.node_domains = {}
         self.unary_constraints = {}
         self.binary_constraints = {}
+        self.resource_constraints = []
+        self.memory_budget = memory_budget
+        self.table_cache = table_cache
+        self.table_bytes = 0
+        self.unary_funcs = {}
+        self.binary_funcs = {}
+        self.version = 0
 
     def add_node(self, node, domain):
         """Adds a node and its list of domains (rooms, hours) to the node domains.
@@ -35,14 +347,64 @@ class CSP(object):
         if node not in self.nodes:
             self.nodes.append(node)
             self.node_domains[node] = domain
+            self.version += 1
+
+    def remove_node(self, node):
+        """Removes a node with its domain and all of its constraints.
 
-    def add_unary_constraint(self, node, constraint_func):
+        Arguments:
+            node {tuple} -- A tuple of (course, professor).
+
+        Raises:
+            ValueError: Raises ValueError if node has not been added yet.
+        """
+        if node not in self.nodes:
+            raise ValueError(node, "was not added.")
+        for neigh in list(self.binary_constraints.get(node, {})):
+            self.remove_binary_constraint(node, neigh)
+        self.binary_constraints.pop(node, None)
+        self.unary_constraints.pop(node, None)
+        self.unary_funcs.pop(node, None)
+        self.nodes.remove(node)
+        del self.node_domains[node]
+        self.version += 1
+
+    def replace_domain(self, node, domain):
+        """Replaces the domain of a node and rebuilds its unary table and the
+        binary tables of its edges from the stored constraint functions.
+
+        Arguments:
+            node {tuple} -- A tuple of (course, professor).
+            domain {list} -- The new domain (rooms, hours) of the node.
+
+        Raises:
+            ValueError: Raises ValueError if node has not been added yet.
+        """
+        if node not in self.nodes:
+            raise ValueError(node, "was not added.")
+        neighbors = list(self.binary_constraints.get(node, {}))
+        for neigh in neighbors:
+            self.discard_binary_tables(node, neigh)
+        self.node_domains[node] = domain
+        self.unary_constraints.pop(node, None)
+        for constraint_func, kind in self.unary_funcs.pop(node, []):
+            self.add_unary_constraint(node, constraint_func, kind)
+        for neigh in neighbors:
+            self.rebuild_binary_constraint(node, neigh)
+        self.version += 1
+
+    def add_unary_constraint(self, node, constraint_func, kind=None):
         """Adds an unary constraint to an existing node.
 
         Arguments:
             node {tuple} -- A tuple of (course, professor).
             constraint_func {function} -- A constraint function.
 
+        Keyword Arguments:
+            kind {str} -- Names the constraint for the table cache; the table
+                          is reused for any node with the same course and
+                          domain (default: {None}).
+
         Raises:
             ValueError: Raises ValueError if node has not been added yet.
         """
@@ -50,14 +412,96 @@ class CSP(object):
             raise ValueError(node, "was not added.")
         node_domain = self.node_domains[node]
         course = node[0]
-        factor = {domain: constraint_func(domain, course) for domain in node_domain}
+
+        def build():
+            return {domain: constraint_func(domain, course) for domain in node_domain}
+
+        if self.table_cache is not None and kind is not None:
+            factor = self.table_cache.get((kind, course, domain_fingerprint(node_domain)),
+                                          build)
+        else:
+            factor = build()
+        self.unary_funcs.setdefault(node, []).append((constraint_func, kind))
+        self.version += 1
         if node not in self.unary_constraints:
             self.unary_constraints[node] = factor
         else:
             self.unary_constraints[node] = ({val: self.unary_constraints[node][val]
                                             * factor[val] for val in node_domain})
 
-    def add_binary_constraint(self, node1, node2, constraint_func):
+    def remove_unary_constraint(self, node, constraint_func=None):
+        """Removes unary constraints from a node and rebuilds its table from
+        the remaining ones.
+
+        Arguments:
+            node {tuple} -- A tuple of (course, professor).
+
+        Keyword Arguments:
+            constraint_func {function} -- The constraint to remove, None removes
+                                          all of them (default: {None}).
+        """
+        funcs = self.unary_funcs.pop(node, [])
+        self.unary_constraints.pop(node, None)
+        for func, kind in funcs:
+            if constraint_func is not None and func is not constraint_func:
+                self.add_unary_constraint(node, func, kind)
+        self.version += 1
+
+    def add_resource_constraint(self, occupies):
+        """Adds a resource-occupancy constraint over all nodes: no two nodes
+        may hold the same slot of a resource. It is checked on an OccupancyGrid
+        instead of pairwise tables.
+
+        Arguments:
+            occupies {function} -- Maps (node, value) to the (resource, start, end)
+                                   range of slots [start, end) the node holds
+                                   at that value, or None.
+        """
+        self.resource_constraints.append(occupies)
+        self.version += 1
+
+    def remove_resource_constraint(self, occupies):
+        """Removes a resource-occupancy constraint.
+
+        Arguments:
+            occupies {function} -- The occupies function it was added with.
+        """
+        self.resource_constraints.remove(occupies)
+        self.version += 1
+
+    def occupancy_grids(self, assignments):
+        """Builds one OccupancyGrid per resource constraint for an assignment.
+
+        Arguments:
+            assignments {dict} -- Domain assignment of each node; unassigned
+                                  nodes are left off the grids.
+
+        Returns:
+            list -- The filled grids.
+        """
+        grids = []
+        for occupies in self.resource_constraints:
+            grid = OccupancyGrid(occupies)
+            for node in self.nodes:
+                if node in assignments:
+                    grid.place(node, assignments[node])
+            grids.append(grid)
+        return grids
+
+    def estimate_table_bytes(self, node1, node2):
+        """Estimates the memory of the eager tables between two nodes.
+
+        Arguments:
+            node1 {tuple} -- A tuple of (course, professor).
+            node2 {tuple} -- A tuple of (course, professor).
+
+        Returns:
+            int -- Estimated bytes of both directions of the table.
+        """
+        return (2 * len(self.node_domains[node1]) * len(self.node_domains[node2])
+                * TABLE_ENTRY_BYTES)
+
+    def add_binary_constraint(self, node1, node2, constraint_func, lazy=None, kind=None):
         """Adds a binary constraint to two existing nodes.
 
         Arguments:
@@ -65,20 +509,101 @@ class CSP(object):
             node2 {tuple} -- A tuple of (course, professor).
             constraint_func {function} -- A constraint function.
 
+        Keyword Arguments:
+            lazy {bool} -- Store the constraint as a LazyTable; None stores it
+                           lazily only if the pair already has a LazyTable or
+                           the eager tables would exceed memory_budget
+                           (default: {None}).
+            kind {str} -- Names the constraint for the table cache; eager tables
+                          are reused for any pair with the same courses and
+                          domains (default: {None}).
+
         Raises:
             ValueError: Raises ValueError if either node has not been added yet
         """
         if node1 not in self.nodes or node2 not in self.nodes:
             raise ValueError("{} or {} were not added.".format(node1, node2))
+        self.binary_funcs.setdefault((node1, node2), []).append((constraint_func, lazy, kind))
+        self.version += 1
+        current_table = self.binary_constraints.get(node1, {}).get(node2)
+        if lazy is None:
+            lazy = (isinstance(current_table, LazyTable)
+                    or (current_table is None and self.memory_budget is not None
+                        and self.table_bytes + self.estimate_table_bytes(node1, node2)
+                        > self.memory_budget))
+        if lazy:
+            self.add_lazy_factor(node1, node2, constraint_func, False)
+            self.add_lazy_factor(node2, node1, constraint_func, True)
+            return
+        if current_table is None:
+            self.table_bytes += self.estimate_table_bytes(node1, node2)
         domain1 = self.node_domains[node1]
         domain2 = self.node_domains[node2]
-        table_factor1 = {val1: {val2: constraint_func(val1, val2, node1[0], node2[0])
-                                for val2 in domain2} for val1 in domain1}
-        table_factor2 = {val2: {val1: constraint_func(val1, val2, node1[0], node2[0])
-                                for val1 in domain1} for val2 in domain2}
+
+        def build():
+            table_factor1 = {val1: {val2: constraint_func(val1, val2, node1[0], node2[0])
+                                    for val2 in domain2} for val1 in domain1}
+            table_factor2 = {val2: {val1: table_factor1[val1][val2] for val1 in domain1}
+                             for val2 in domain2}
+            return table_factor1, table_factor2
+
+        if self.table_cache is not None and kind is not None:
+            key = (kind, node1[0], node2[0], domain_fingerprint(domain1),
+                   domain_fingerprint(domain2))
+            table_factor1, table_factor2 = self.table_cache.get(key, build)
+        else:
+            table_factor1, table_factor2 = build()
         self.update_binary_constraint_table(node1, node2, table_factor1)
         self.update_binary_constraint_table(node2, node1, table_factor2)
 
+    def discard_binary_tables(self, node1, node2):
+        """Drops the tables between two nodes in both directions, keeping
+        their constraint functions.
+
+        Arguments:
+            node1 {tuple} -- A tuple of (course, professor).
+            node2 {tuple} -- A tuple of (course, professor).
+        """
+        table = self.binary_constraints.get(node1, {}).pop(node2, None)
+        self.binary_constraints.get(node2, {}).pop(node1, None)
+        if table is not None and not isinstance(table, LazyTable):
+            self.table_bytes -= self.estimate_table_bytes(node1, node2)
+        for node in (node1, node2):
+            if node in self.binary_constraints and not self.binary_constraints[node]:
+                del self.binary_constraints[node]
+
+    def rebuild_binary_constraint(self, node1, node2):
+        """Rebuilds the tables between two nodes from their constraint functions.
+
+        Arguments:
+            node1 {tuple} -- A tuple of (course, professor).
+            node2 {tuple} -- A tuple of (course, professor).
+        """
+        self.discard_binary_tables(node1, node2)
+        for pair in ((node1, node2), (node2, node1)):
+            for constraint_func, lazy, kind in self.binary_funcs.pop(pair, []):
+                self.add_binary_constraint(pair[0], pair[1], constraint_func, lazy, kind)
+
+    def remove_binary_constraint(self, node1, node2, constraint_func=None):
+        """Removes binary constraints between two nodes, in both directions,
+        and rebuilds their tables from the remaining ones.
+
+        Arguments:
+            node1 {tuple} -- A tuple of (course, professor).
+            node2 {tuple} -- A tuple of (course, professor).
+
+        Keyword Arguments:
+            constraint_func {function} -- The constraint to remove, None removes
+                                          all of them (default: {None}).
+        """
+        for pair in ((node1, node2), (node2, node1)):
+            funcs = [entry for entry in self.binary_funcs.pop(pair, [])
+                     if constraint_func is not None and entry[0] is not constraint_func]
+            if funcs:
+                self.binary_funcs[pair] = funcs
+        self.rebuild_binary_constraint(node1, node2)
+        self.version += 1
+
     def update_binary_constraint_table(self, node_a, node_b, table_factor):
         """Updates the binary constraint table given two nodes and a table factor.
 
@@ -91,37 +616,663 @@ class CSP(object):
             self.binary_constraints[node_a] = {node_b: table_factor}
         elif node_b not in self.binary_constraints[node_a].keys():
             self.binary_constraints[node_a][node_b] = table_factor
+        elif isinstance(self.binary_constraints[node_a][node_b], LazyTable):
+            self.binary_constraints[node_a][node_b].add_table(table_factor)
         else:
+            # build a new table rather than multiplying in place, the current
+            # one may be shared through a TableCache
             current_table = self.binary_constraints[node_a][node_b]
             for i in table_factor:
                 for j in table_factor[i]:
                     assert i in current_table and j in current_table[i]
-                    current_table[i][j] *= table_factor[i][j]
+            self.binary_constraints[node_a][node_b] = {
+                i: {j: weight * table_factor[i][j] for j, weight in row.items()}
+                for i, row in current_table.items()}
+
+    def add_lazy_factor(self, node_a, node_b, constraint_func, reverse):
+        """Multiplies a constraint function into the LazyTable from node_a to
+        node_b, wrapping an existing eager table if there is one.
+
+        Arguments:
+            node_a {tuple} -- A tuple of (course, professor).
+            node_b {tuple} -- A tuple of (course, professor).
+            constraint_func {function} -- A constraint function.
+            reverse {bool} -- Whether constraint_func takes node_b's value first.
+        """
+        neighbors = self.binary_constraints.setdefault(node_a, {})
+        current_table = neighbors.get(node_b)
+        if not isinstance(current_table, LazyTable):
+            lazy_table = LazyTable(node_a[0], node_b[0])
+            if current_table is not None:
+                lazy_table.add_table(current_table)
+            neighbors[node_b] = current_table = lazy_table
+        current_table.add_factor(constraint_func, reverse)
+
+
+def propagate(csp):
+    """Prunes the domains of a CSP before local search: node consistency from
+    zeroed unary entries, then AC-3 arc consistency over the binary tables.
+    Nodes left with a single value are forced to it, and AC-3 removes the
+    values of their neighbors that conflict with it. The domains are only
+    replaced when every node keeps at least one value.
+
+    Arguments:
+        csp {CSP} -- The constraint satisfaction problem to prune.
+
+    Raises:
+        InfeasibleError: Raises InfeasibleError if some node has no consistent value.
+
+    Returns:
+        dict -- The forced assignments {node: value} of singleton domains.
+    """
+    domains = {}
+    for node in csp.nodes:
+        unary = csp.unary_constraints.get(node)
+        domain = csp.node_domains[node]
+        if unary is not None:
+            domain = [val for val in domain if unary[val] != 0]
+        if not domain:
+            raise InfeasibleError(node)
+        domains[node] = domain
+
+    queue = collections.deque((node_a, node_b) for node_a in csp.nodes
+                              for node_b in csp.binary_constraints.get(node_a, {}))
+    queued = set(queue)
+    while queue:
+        arc = queue.popleft()
+        queued.discard(arc)
+        node_a, node_b = arc
+        table = csp.binary_constraints[node_a][node_b]
+        domain_b = domains[node_b]
+        if isinstance(table, LazyTable):
+            # read lazy tables without filling their memo
+            supported = [val_a for val_a in domains[node_a]
+                         if any(table.compute(val_a, val_b) != 0 for val_b in domain_b)]
+        else:
+            supported = [val_a for val_a in domains[node_a]
+                         if any(table[val_a][val_b] != 0 for val_b in domain_b)]
+        if len(supported) == len(domains[node_a]):
+            continue
+        if not supported:
+            raise InfeasibleError(node_a)
+        domains[node_a] = supported
+        for node_c in csp.binary_constraints[node_a]:
+            if node_c != node_b and (node_c, node_a) not in queued:
+                queue.append((node_c, node_a))
+                queued.add((node_c, node_a))
+
+    for node, domain in domains.items():
+        current = csp.node_domains[node]
+        if len(domain) != len(current):
+            if isinstance(current, array):
+                domain = array(current.typecode, domain)
+            csp.node_domains[node] = domain
+            csp.version += 1
+    return {node: domain[0] for node, domain in domains.items() if len(domain) == 1}
+
+
+def least_conflicted(domain, current, conflicts, weights, rng=random):
+    """Walks a (shuffled) domain and keeps the least conflicted value;
+    equally conflicted values replace the current pick at random,
+    weighted on soft-constraints.
+
+    Arguments:
+        domain {list} -- Candidate values, in the order they are tried.
+        current {tuple} -- The value the node has now.
+        conflicts {dict} -- Maps each value to its number of conflicts.
+        weights {dict} -- Maps each value to its soft weight.
+
+    Keyword Arguments:
+        rng {random.Random} -- Source of randomness (default: {random}).
+
+    Returns:
+        tuple -- The chosen value.
+    """
+    best = current
+    min_conflicted = conflicts[current]
+    w0 = weights[current]
+    for each_domain in domain:
+        if each_domain == current:
+            continue
+        conflict = conflicts[each_domain]
+        if conflict < min_conflicted:
+            best = each_domain
+            min_conflicted = conflict
+            w0 = weights[each_domain]
+        elif conflict == min_conflicted:
+            w = weights[each_domain]
+            if rng.random() < w / (w + w0):
+                best = each_domain
+                w0 = w
+    return best
+
+
+class IndexedSet(object):
+    def __init__(self):
+        """A set that also supports O(1) random choice.
+
+        Attributes:
+            items {list} -- Members of the set, in no particular order.
+            positions {dict} -- Maps each member to its index in items.
+        """
+        self.items = []
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __contains__(self, item):
+        return item in self.positions
+
+    def add(self, item):
+        if item not in self.positions:
+            self.positions[item] = len(self.items)
+            self.items.append(item)
+
+    def discard(self, item):
+        index = self.positions.pop(item, None)
+        if index is None:
+            return
+        last = self.items.pop()
+        if index < len(self.items):
+            self.items[index] = last
+            self.positions[last] = index
+
+    def choice(self, rng=random):
+        return rng.choice(self.items)
+
+
+# Class definition for the search state of the STANDARD engine
+class RescanState(object):
+    def __init__(self, solver, assignments):
+        """Search state that rescans every constraint to find conflicts.
+
+        Arguments:
+            solver {minConflicts} -- The solver whose methods score the moves.
+            assignments {dict} -- Initial domain assignment of each node.
+        """
+        self.solver = solver
+        self.assignments = dict(assignments)
+        self.conflicted = set()
+        self.grids = []
+
+    def conflicted_nodes(self):
+        """Finds the conflicted nodes of the current assignment.
+
+        Returns:
+            set -- A set of conflicted nodes.
+        """
+        self.grids = self.solver.csp.occupancy_grids(self.assignments)
+        self.conflicted = self.solver.conflicted(self.assignments, self.grids)
+        return self.conflicted
+
+    def random_conflicted(self):
+        """Chooses a random node of the last conflicted_nodes scan.
+
+        Returns:
+            tuple -- A tuple of (course, professor).
+        """
+        return self.solver.rng.choice(tuple(self.conflicted))
+
+    def value_scores(self, node):
+        """Scores every value of a node against the current assignment.
+
+        Arguments:
+            node {tuple} -- A tuple of (course, professor).
+
+        Returns:
+            tuple -- (domain, conflicts, weights); conflicts and weights map
+                     each value of the domain to its number of conflicts
+                     and its soft weight.
+        """
+        solver = self.solver
+        domain = solver.csp.node_domains[node]
+        conflicts = {}
+        weights = {}
+        for val in domain:
+            conflicts[val], weights[val] = solver.score_value(
+                self.assignments, node, val, self.grids)
+        return domain, conflicts, weights
+
+    def best_value(self, node):
+        """Chooses the least conflicted value of a node, breaking ties
+        at random weighted on soft-constraints.
+
+        Arguments:
+            node {tuple} -- A tuple of (course, professor).
+
+        Returns:
+            tuple -- The chosen (room, hours) value.
+        """
+        domain, conflicts, weights = self.value_scores(node)
+        self.solver.rng.shuffle(domain)
+        return least_conflicted(domain, self.assignments[node], conflicts, weights,
+                                self.solver.rng)
+
+    def random_value(self, node):
+        """Chooses a random value of a node.
+
+        Arguments:
+            node {tuple} -- A tuple of (course, professor).
+
+        Returns:
+            tuple -- A (room, hours) value.
+        """
+        return self.solver.rng.choice(self.solver.csp.node_domains[node])
+
+    def move(self, node, val):
+        """Assigns a new value to a node; the grids are rebuilt by the
+        next conflicted_nodes scan.
+
+        Arguments:
+            node {tuple} -- A tuple of (course, professor).
+            val {tuple} -- The new (room, hours) value of the node.
+        """
+        self.assignments[node] = val
+
+    def assignment(self):
+        """Returns a copy of the current assignment.
+
+        Returns:
+            dict -- Domain assignment of each node.
+        """
+        return dict(self.assignments)
+
+
+# Class definition to keep conflict counts up to date move by move
+class ConflictTracker(object):
+    def __init__(self, csp, assignments, rng=random):
+        """Incremental conflict bookkeeping for an assignment of a CSP.
+
+        Attributes:
+            csp {CSP} -- The constraint satisfaction problem.
+            assignments {dict} -- Current domain assignment of each node.
+            value_conflicts {dict} -- Maps each node to {value: number of violated
+                                      unary and binary constraints the node
+                                      has at that value}.
+            value_weights {dict} -- Maps each node to {value: product of the
+                                    non-zero binary weights at that value}.
+            grids {list} -- The OccupancyGrid of each resource constraint;
+                            room clashes are read from them on demand.
+            conflicted {IndexedSet} -- Nodes in at least one violated constraint.
+            rng {random.Random} -- Source of randomness.
+            edge_weights {dict} -- Maps (node, neighbor) to the weight a violation
+                                   of their binary constraint adds to
+                                   value_conflicts, 1 unless raised by breakout.
+        """
+        self.csp = csp
+        self.rng = rng
+        self.assignments = dict(assignments)
+        self.edge_weights = {}
+        self.value_conflicts = {}
+        self.value_weights = {}
+        self.grids = csp.occupancy_grids(self.assignments)
+        self.conflicted = IndexedSet()
+        for node in csp.nodes:
+            self.score_node(node)
+            self.refresh(node)
+
+    def score_node(self, node):
+        """Computes the conflicts and soft weight of every value of a node
+        from the current assignments of its neighbors.
+
+        Arguments:
+            node {tuple} -- A tuple of (course, professor).
+        """
+        unary = self.csp.unary_constraints.get(node)
+        neighbors = self.csp.binary_constraints.get(node, {})
+        conflicts = {}
+        weights = {}
+        for val in self.csp.node_domains[node]:
+            count = 1 if unary is not None and unary[val] == 0 else 0
+            soft_weight = 1
+            for neigh, table in neighbors.items():
+                weight = table[val][self.assignments[neigh]]
+                if weight == 0:
+                    count += self.edge_weights.get((node, neigh), 1)
+                else:
+                    soft_weight *= weight
+            conflicts[val] = count
+            weights[val] = soft_weight
+        self.value_conflicts[node] = conflicts
+        self.value_weights[node] = weights
+
+    def refresh(self, node):
+        """Adds or removes a node from the conflicted set.
+
+        Arguments:
+            node {tuple} -- A tuple of (course, professor).
+        """
+        val = self.assignments[node]
+        if self.value_conflicts[node][val] or any(grid.clashes(node, val) for grid in self.grids):
+            self.conflicted.add(node)
+        else:
+            self.conflicted.discard(node)
+
+    def move(self, node, val):
+        """Assigns a new value to a node and updates the bookkeeping of its
+        neighbors and of the nodes it leaves or joins on a grid only.
+
+        Arguments:
+            node {tuple} -- A tuple of (course, professor).
+            val {tuple} -- The new (room, hours) value of the node.
+        """
+        old = self.assignments[node]
+        if old == val:
+            return
+        self.assignments[node] = val
+        clashing = set()
+        for grid in self.grids:
+            clashing.update(grid.overlapping(node, old))
+            grid.remove(node)
+            grid.place(node, val)
+            clashing.update(grid.overlapping(node, val))
+        binary_constraints = self.csp.binary_constraints
+        for neigh in binary_constraints.get(node, {}):
+            reverse = binary_constraints[neigh][node]
+            conflicts = self.value_conflicts[neigh]
+            weights = self.value_weights[neigh]
+            edge_weight = self.edge_weights.get((neigh, node), 1)
+            for neigh_val in self.csp.node_domains[neigh]:
+                row = reverse[neigh_val]
+                w_old = row[old]
+                w_new = row[val]
+                if w_old == w_new:
+                    continue
+                if w_old == 0:
+                    conflicts[neigh_val] -= edge_weight
+                else:
+                    weights[neigh_val] /= w_old
+                if w_new == 0:
+                    conflicts[neigh_val] += edge_weight
+                else:
+                    weights[neigh_val] *= w_new
+            self.refresh(neigh)
+        for neigh in clashing:
+            self.refresh(neigh)
+        self.refresh(node)
+
+    def breakout(self, node, val):
+        """Breakout constraint weighting: when moving a node to val would not
+        lower its weighted conflicts, every binary constraint the node now
+        violates gains one unit of weight.
+
+        Arguments:
+            node {tuple} -- A tuple of (course, professor).
+            val {tuple} -- The value the node is about to move to.
+        """
+        current = self.assignments[node]
+        if self.value_conflicts[node][val] < self.value_conflicts[node][current]:
+            return
+        binary_constraints = self.csp.binary_constraints
+        for neigh, table in binary_constraints.get(node, {}).items():
+            neigh_current = self.assignments[neigh]
+            if table[current][neigh_current] != 0:
+                continue
+            for a, b, b_current in ((node, neigh, neigh_current), (neigh, node, current)):
+                self.edge_weights[(a, b)] = self.edge_weights.get((a, b), 1) + 1
+                rows = binary_constraints[a][b]
+                conflicts = self.value_conflicts[a]
+                for a_val in self.csp.node_domains[a]:
+                    if rows[a_val][b_current] == 0:
+                        conflicts[a_val] += 1
+
+    def random_value(self, node):
+        """Chooses a random value of a node.
+
+        Arguments:
+            node {tuple} -- A tuple of (course, professor).
+
+        Returns:
+            tuple -- A (room, hours) value.
+        """
+        return self.rng.choice(self.csp.node_domains[node])
+
+    def conflicted_nodes(self):
+        """Returns the nodes in at least one violated constraint.
+
+        Returns:
+            IndexedSet -- The conflicted nodes, kept up to date by move.
+        """
+        return self.conflicted
+
+    def random_conflicted(self):
+        """Chooses a random conflicted node.
+
+        Returns:
+            tuple -- A tuple of (course, professor).
+        """
+        return self.conflicted.choice(self.rng)
+
+    def assignment(self):
+        """Returns a copy of the current assignment.
+
+        Returns:
+            dict -- Domain assignment of each node.
+        """
+        return dict(self.assignments)
+
+    def value_scores(self, node):
+        """Reads the scores of every value of a node off the bookkeeping.
+
+        Arguments:
+            node {tuple} -- A tuple of (course, professor).
+
+        Returns:
+            tuple -- (domain, conflicts, weights); conflicts and weights map
+                     each value of the domain to its number of violated
+                     constraints and its soft weight.
+        """
+        conflicts = self.value_conflicts[node]
+        if self.grids:
+            conflicts = {val: count + sum(grid.clashes(node, val) for grid in self.grids)
+                         for val, count in conflicts.items()}
+        return self.csp.node_domains[node], conflicts, self.value_weights[node]
+
+    def best_value(self, node):
+        """Chooses the least conflicted value of a node, breaking ties
+        at random weighted on soft-constraints.
+
+        Arguments:
+            node {tuple} -- A tuple of (course, professor).
+
+        Returns:
+            tuple -- The chosen (room, hours) value.
+        """
+        domain, conflicts, weights = self.value_scores(node)
+        self.rng.shuffle(domain)
+        return least_conflicted(domain, self.assignments[node], conflicts, weights, self.rng)
+
+
+# Class definition for observers of a minConflicts search
+class SearchObserver(object):
+    """Receives the progress of a minConflicts search. The hooks do nothing;
+    subclasses override the ones they need. A search without an observer
+    pays one test per trial.
+    """
+
+    def on_iteration(self, iteration, conflicts, node, evaluated, accepted, val):
+        """Called on each trial, before the chosen node moves.
+
+        Arguments:
+            iteration {int} -- Number of trials run before this one.
+            conflicts {int} -- Number of conflicted nodes of the current assignment.
+            node {tuple} -- The conflicted node chosen.
+            evaluated {int} -- Number of values scored to choose the new value.
+            accepted {bool} -- Whether the node moves off its current value.
+            val {tuple} -- The value the node moves to.
+        """
+
+    def on_restart(self, iteration, run):
+        """Called when the search restarts from a new random assignment.
+
+        Arguments:
+            iteration {int} -- Number of trials run so far.
+            run {int} -- Number of the run starting, from 2.
+        """
+
+    def on_finish(self, result):
+        """Called once the search ends.
+
+        Arguments:
+            result {SolveResult} -- The outcome of the search.
+        """
+
+
+# Class definition to record a minConflicts search trial by trial
+class SearchTrace(SearchObserver):
+    def __init__(self):
+        """Records the conflict count of every trial of a search and
+        counts the values evaluated and the moves accepted.
+        """
+        self.conflicts = []
+        self.nodes = collections.Counter()
+        self.evaluated = 0
+        self.accepted = 0
+        self.restarts = 0
+        self.result = None
+
+    def on_iteration(self, iteration, conflicts, node, evaluated, accepted, val):
+        self.conflicts.append(conflicts)
+        self.nodes[node] += 1
+        self.evaluated += evaluated
+        self.accepted += accepted
+
+    def on_restart(self, iteration, run):
+        self.restarts += 1
+
+    def on_finish(self, result):
+        self.result = result
 
 
 # Class definition to minimize conflicts
 class minConflicts(object):
-    def __init__(self, csp):
+    def __init__(self, csp, engine=STANDARD, rng=None, weighting=False, noise=0.0,
+                 restart_unit=None, observer=None):
+        """Min-conflicts local search over a CSP.
+
+        Arguments:
+            csp {CSP} -- The constraint satisfaction problem to solve.
+
+        Keyword Arguments:
+            engine {str} -- STANDARD rescans every constraint on each
+                            iteration, INCREMENTAL keeps conflict counts
+                            up to date with a ConflictTracker, COMPILED
+                            searches over a compiledcsp.CompiledCSP
+                            (default: {STANDARD}).
+            rng {random.Random} -- Source of randomness, or an int seed for a
+                                   new random.Random; None uses the global
+                                   random module (default: {None}).
+            weighting {bool} -- Raise the weight of binary constraints that stay
+                                violated at a local minimum (breakout), see
+                                ConflictTracker.breakout (default: {False}).
+            noise {float} -- Probability of moving the chosen node to a random
+                             value instead of its best one (default: {0.0}).
+            restart_unit {int} -- Restart from a new random assignment after
+                                  restart_unit * luby(k) trials of the k-th
+                                  run, None never restarts (default: {None}).
+            observer {SearchObserver} -- Told about every trial, restart and the
+                                         result of search (default: {None}).
+
+        Raises:
+            ValueError: Raises ValueError if engine is unknown, or if weighting
+                        is asked of another engine than INCREMENTAL.
+        """
+        if engine not in ENGINES:
+            raise ValueError("Unknown engine {}.".format(engine))
+        if weighting and engine != INCREMENTAL:
+            raise ValueError("Constraint weighting needs the {} engine.".format(INCREMENTAL))
         self.csp = csp
+        self.engine = engine
+        self.weighting = weighting
+        self.noise = noise
+        self.restart_unit = restart_unit
+        self.observer = observer
+        self.compiled = None
+        if rng is None:
+            rng = random
+        elif not isinstance(rng, random.Random):
+            rng = random.Random(rng)
+        self.rng = rng
 
-    def initial_var_assignment(self):
-        """Assigns each node a random domain value.
+    def initial_var_assignment(self, initial=None, greedy=False):
+        """Assigns each node a random domain value, or warm starts from a prior
+        assignment: its values are kept where still in the node's domain and
+        allowed by the unary constraints, and the other nodes are seeded.
+
+        Keyword Arguments:
+            initial {dict} -- A prior, possibly partial, assignment (default: {None}).
+            greedy {bool} -- Seed each remaining node, in turn, with its least
+                             conflicted value given the nodes assigned so far
+                             rather than at random (default: {False}).
 
         Returns:
-            dict -- Random domain assignment of each node.
+            dict -- Domain assignment of each node.
         """
-        return {node: random.choice(self.csp.node_domains[node]) for node in self.csp.nodes}
+        if not initial and not greedy:
+            return {node: self.rng.choice(self.csp.node_domains[node]) for node in self.csp.nodes}
+        assignments = {}
+        for node, val in (initial or {}).items():
+            if node not in self.csp.node_domains or val not in self.csp.node_domains[node]:
+                continue
+            unary = self.csp.unary_constraints.get(node)
+            if unary is None or unary[val] != 0:
+                assignments[node] = val
+        missing = [node for node in self.csp.nodes if node not in assignments]
+        if not greedy:
+            for node in missing:
+                assignments[node] = self.rng.choice(self.csp.node_domains[node])
+            return assignments
+        grids = self.csp.occupancy_grids(assignments)
+        for node in missing:
+            unary = self.csp.unary_constraints.get(node)
+            neighbors = [(neigh, table) for neigh, table
+                         in self.csp.binary_constraints.get(node, {}).items()
+                         if neigh in assignments]
+            domain = list(self.csp.node_domains[node])
+            self.rng.shuffle(domain)
+            best = None
+            best_conflicts = None
+            for val in domain:
+                conflicts = 1 if unary is not None and unary[val] == 0 else 0
+                conflicts += sum(1 for neigh, table in neighbors
+                                 if table[val][assignments[neigh]] == 0)
+                conflicts += sum(grid.clashes(node, val) for grid in grids)
+                if best_conflicts is None or conflicts < best_conflicts:
+                    best = val
+                    best_conflicts = conflicts
+                    if not conflicts:
+                        break
+            assignments[node] = best
+            for grid in grids:
+                grid.place(node, best)
+        return assignments
 
-    def conflicted(self, assignments):
+    def conflicted(self, assignments, grids=None):
         """Finds a set of conflicted nodes (which evaluate to zero).
 
         Arguments:
             assignments {dict} -- Random domain assignment of each node.
 
+        Keyword Arguments:
+            grids {list} -- The assignment's occupancy grids, built when None
+                            (default: {None}).
+
         Returns:
             set -- A set of conflicted nodes.
         """
+        if grids is None:
+            grids = self.csp.occupancy_grids(assignments)
         conflicted = set()
+        for grid in grids:
+            for node, span in grid.placements.items():
+                resource, start, end = span
+                counts = grid.counts[resource]
+                if any(counts[slot] > 1 for slot in range(start, end)):
+                    conflicted.add(node)
         for node in assignments:
             if node in conflicted:
                 continue
@@ -152,10 +1303,15 @@ class minConflicts(object):
         """
         conflicted = set()
         domain = assignments[node]
+        for grid in self.csp.occupancy_grids(assignments):
+            overlapping = grid.overlapping(node, domain)
+            if overlapping:
+                conflicted.add(node)
+                conflicted.update(overlapping)
         soft_weight = 1
         # proportional to number of soft-constraints satisfied
         # checks for missing keys on unary constraints
-        if self.csp.unary_constraints[node][domain] == 0:
+        if node in self.csp.unary_constraints and self.csp.unary_constraints[node][domain] == 0:
             conflicted.add(node)
         if node in self.csp.binary_constraints:
             neighbors = self.csp.binary_constraints[node].keys()
@@ -169,6 +1325,66 @@ class minConflicts(object):
                     soft_weight *= weight
         return (conflicted, soft_weight)
 
+    def score_value(self, assignments, node, val, grids=None):
+        """Scores a trial move of node to val without copying or mutating
+        the assignments; neighbors keep their assigned values.
+
+        Arguments:
+            assignments {dict} -- Current domain assignment of each node.
+            node {tuple} -- A tuple of (course, professor).
+            val {tuple} -- The (room, hours) value to try for the node.
+
+        Keyword Arguments:
+            grids {list} -- The assignment's occupancy grids, built when None
+                            (default: {None}).
+
+        Returns:
+            tuple -- (number of conflicted nodes, soft weight), the same
+                     values conflicted_neighbors returns as (len(set), weight)
+                     for the assignments with node moved to val; a node that
+                     clashes both on a table and on a grid counts twice.
+        """
+        if grids is None:
+            grids = self.csp.occupancy_grids(assignments)
+        unary = self.csp.unary_constraints.get(node)
+        conflicts = 1 if unary is not None and unary[val] == 0 else 0
+        for grid in grids:
+            conflicts += grid.clashes(node, val)
+        soft_weight = 1
+        if node in self.csp.binary_constraints:
+            for neigh, table in self.csp.binary_constraints[node].items():
+                weight = table[val][assignments[neigh]]
+                if weight == 0:
+                    conflicts += 1
+                else:
+                    soft_weight *= weight
+        if conflicts and (unary is None or unary[val] != 0):
+            # the node itself is conflicted along with its neighbors
+            conflicts += 1
+        return (conflicts, soft_weight)
+
+    def soft_weight(self, assignments):
+        """Computes the soft-constraint quality of an assignment.
+
+        Arguments:
+            assignments {dict} -- Domain assignment of each node.
+
+        Returns:
+            int -- Product of the unary weights and of the weight of every binary
+                   constraint, each pair of nodes counted once.
+        """
+        soft_weight = 1
+        done = set()
+        for node in self.csp.nodes:
+            assigned_domain = assignments[node]
+            if node in self.csp.unary_constraints:
+                soft_weight *= self.csp.unary_constraints[node][assigned_domain]
+            for neigh, table in self.csp.binary_constraints.get(node, {}).items():
+                if neigh not in done:
+                    soft_weight *= table[assigned_domain][assignments[neigh]]
+            done.add(node)
+        return soft_weight
+
     def rand_conflict_var(self, conflicted, assignments):
         """Chooses a random conflicted variable.
 
@@ -179,45 +1395,701 @@ class minConflicts(object):
         Returns:
             tuple -- A tuple of (rooms, hours), assigned values, and node.
         """
-        node = random.choice(tuple(conflicted))
+        node = self.rng.choice(tuple(conflicted))
         val = assignments[node]
         domain = self.csp.node_domains[node]
-        random.shuffle(domain)
+        self.rng.shuffle(domain)
         return domain, val, node
 
-    def solve(self, max_iters=100):
+    def new_state(self, assignments):
+        """Creates the engine's search state for an initial assignment.
+
+        Arguments:
+            assignments {dict} -- Initial domain assignment of each node.
+
+        Returns:
+            object -- A RescanState, ConflictTracker or compiledcsp.CompiledState.
+        """
+        if self.engine == INCREMENTAL:
+            return ConflictTracker(self.csp, assignments, self.rng)
+        if self.engine == COMPILED:
+            from compiledcsp import CompiledCSP, CompiledState
+            # compile once, and again only after the CSP has changed
+            if self.compiled is None or self.compiled.version != self.csp.version:
+                self.compiled = CompiledCSP(self.csp)
+            return CompiledState(self.compiled, assignments, self.rng)
+        return RescanState(self, assignments)
+
+    def search(self, max_iters=None, time_budget=None, stop=None, initial=None, greedy=True):
+        """Runs min-conflicts until the assignment is consistent or the budget
+        runs out, keeping the least conflicted assignment seen on the way.
+
+        Keyword Arguments:
+            max_iters {int} -- Max number of trials, None for no limit; when
+                               time_budget is None too, iteration_budget(csp)
+                               is used (default: {None}).
+            time_budget {float} -- Seconds the search may run (default: {None}).
+            stop {function} -- Called before each trial; the search is
+                               abandoned when it returns True (default: {None}).
+            initial {dict} -- Warm start from this prior, possibly partial,
+                              assignment, see initial_var_assignment; restarts
+                              still start at random (default: {None}).
+            greedy {bool} -- Seed the nodes initial leaves out greedily rather
+                             than at random (default: {True}).
+
+        Returns:
+            SolveResult -- The best assignment, its number of conflicted
+                           nodes and the number of trials run.
+        """
+        if max_iters is None and time_budget is None:
+            max_iters = iteration_budget(self.csp)
+        deadline = None if time_budget is None else time.perf_counter() + time_budget
+        if initial is not None:
+            state = self.new_state(self.initial_var_assignment(initial, greedy))
+        else:
+            state = self.new_state(self.initial_var_assignment())
+        observer = self.observer
+        best = None
+        best_conflicts = None
+        iterations = 0
+        runs = 1
+        run_iterations = 0
+        while True:
+            if self.restart_unit is not None and \
+                    run_iterations >= self.restart_unit * luby(runs):
+                state = self.new_state(self.initial_var_assignment())
+                runs += 1
+                run_iterations = 0
+                if observer is not None:
+                    observer.on_restart(iterations, runs)
+            no_conflicted = len(state.conflicted_nodes())
+            if best_conflicts is None or no_conflicted < best_conflicts:
+                best = state.assignment()
+                best_conflicts = no_conflicted
+            if not no_conflicted:
+                break
+            if max_iters is not None and iterations >= max_iters:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            if stop is not None and stop():
+                break
+            node = state.random_conflicted()
+            if self.noise and self.rng.random() < self.noise:
+                val = state.random_value(node)
+                evaluated = 1
+            else:
+                val = self.choose_value(state, node, iterations, no_conflicted, best_conflicts)
+                evaluated = None
+                if self.weighting:
+                    state.breakout(node, val)
+            if observer is not None:
+                accepted = val != state.assignments[node]
+                if self.engine == COMPILED:
+                    # report the node and value, not their indices
+                    node_name = self.compiled.nodes[node]
+                    node_val = self.compiled.values[node][val]
+                else:
+                    node_name = node
+                    node_val = val
+                if evaluated is None:
+                    evaluated = len(self.csp.node_domains[node_name])
+                observer.on_iteration(iterations, no_conflicted, node_name, evaluated,
+                                      accepted, node_val)
+            state.move(node, val)
+            iterations += 1
+            run_iterations += 1
+        result = SolveResult(best, best_conflicts, iterations)
+        if observer is not None:
+            observer.on_finish(result)
+        return result
+
+    def choose_value(self, state, node, iteration, cost, best_cost):
+        """Chooses the value a conflicted node moves to on a trial.
+
+        Arguments:
+            state {object} -- The search state, see new_state.
+            node {tuple} -- The conflicted node.
+            iteration {int} -- Number of trials run so far.
+            cost {int} -- Number of conflicted nodes of the current assignment.
+            best_cost {int} -- Number of conflicted nodes of the best assignment.
+
+        Returns:
+            tuple -- The chosen (room, hours) value.
+        """
+        return state.best_value(node)
+
+    def solve(self, max_iters=100, stop=None, initial=None):
         """Attempts to map node to its domain
         in a manner that satisfies the constraints.
 
         Keyword Arguments:
             max_iters {int} -- Max number of trials allowed (default: {100}).
+            stop {function} -- Called before each trial; the search is
+                               abandoned when it returns True (default: {None}).
+            initial {dict} -- Warm start from this prior, possibly partial,
+                              assignment; missing or invalid nodes are seeded
+                              greedily (default: {None}).
 
         Returns:
              dict -- Final domain assignment of each node.
         """
-        assignments = self.initial_var_assignment()
-        for _ in range(max_iters):
-            conflicted = self.conflicted(assignments)
-            if not conflicted:
-                return assignments
-            domain, val, node = self.rand_conflict_var(conflicted, assignments)
-            c0, w0 = self.conflicted_neighbors(assignments, node)
-            min_conflicted = len(c0)
-            for each_domain in domain:
-                if each_domain == val:
+        result = self.search(max_iters, stop=stop, initial=initial)
+        return result.assignments if result.conflicts == 0 else None
+
+
+def luby(i):
+    """Returns the i-th term of the Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, ...
+
+    Arguments:
+        i {int} -- Position in the sequence, from 1.
+
+    Returns:
+        int -- The i-th term.
+    """
+    while True:
+        k = 1
+        while (1 << k) - 1 < i:
+            k += 1
+        if (1 << k) - 1 == i:
+            return 1 << (k - 1)
+        i -= (1 << (k - 1)) - 1
+
+
+def iteration_budget(csp, per_node=ITERATIONS_PER_NODE):
+    """Sizes an iteration budget from the number of nodes of a CSP
+    and the density of its constraint graph.
+
+    Arguments:
+        csp {CSP} -- The constraint satisfaction problem.
+
+    Keyword Arguments:
+        per_node {int} -- Iterations per node of a CSP without binary
+                          constraints (default: {ITERATIONS_PER_NODE}).
+
+    Returns:
+        int -- per_node x nodes x (1 + density), where density is the share
+               of node pairs that have a binary constraint, or 1 when a
+               resource constraint links every pair.
+    """
+    no_nodes = len(csp.nodes)
+    if no_nodes < 2:
+        return per_node
+    if csp.resource_constraints:
+        density = 1
+    else:
+        no_edges = sum(len(neighbors) for neighbors in csp.binary_constraints.values()) / 2
+        density = no_edges / (no_nodes * (no_nodes - 1) / 2)
+    return int(math.ceil(per_node * no_nodes * (1 + density)))
+
+
+# Class definition for tabu search
+class tabuSearch(minConflicts):
+    def __init__(self, csp, engine=STANDARD, rng=None, tenure=TABU_TENURE, observer=None):
+        """Min-conflicts local search that always moves a conflicted node
+        to its best value that is not tabu. Moving a node off a value makes
+        that (node, value) pair tabu for tenure trials, which stops the
+        search from flipping a node between two equally conflicted values.
+
+        Arguments:
+            csp {CSP} -- The constraint satisfaction problem to solve.
+
+        Keyword Arguments:
+            engine {str} -- The search state engine, see minConflicts
+                            (default: {STANDARD}).
+            rng {random.Random} -- Source of randomness, see minConflicts
+                                   (default: {None}).
+            tenure {int} -- Trials a (node, value) pair stays tabu
+                            (default: {TABU_TENURE}).
+            observer {SearchObserver} -- See minConflicts (default: {None}).
+        """
+        super(tabuSearch, self).__init__(csp, engine, rng, observer=observer)
+        self.tenure = tenure
+        self.tabu = {}
+
+    def new_state(self, assignments):
+        """Creates the engine's search state and clears the tabu list.
+
+        Arguments:
+            assignments {dict} -- Initial domain assignment of each node.
+
+        Returns:
+            object -- A RescanState, ConflictTracker or compiledcsp.CompiledState.
+        """
+        self.tabu = {}
+        return super(tabuSearch, self).new_state(assignments)
+
+    def choose_value(self, state, node, iteration, cost, best_cost):
+        """Chooses the least conflicted value of a node other than its current
+        one, skipping tabu values unless the move is estimated to beat the
+        best cost so far (aspiration).
+
+        Arguments:
+            state {object} -- The search state, see new_state.
+            node {tuple} -- The conflicted node.
+            iteration {int} -- Number of trials run so far.
+            cost {int} -- Number of conflicted nodes of the current assignment.
+            best_cost {int} -- Number of conflicted nodes of the best assignment.
+
+        Returns:
+            tuple -- The chosen (room, hours) value, the current one if every
+                     other value is tabu.
+        """
+        current = state.assignments[node]
+        domain, conflicts, weights = state.value_scores(node)
+        admissible = []
+        for val in domain:
+            if val == current:
+                continue
+            if (self.tabu.get((node, val), -1) < iteration
+                    or cost + conflicts[val] - conflicts[current] < best_cost):
+                admissible.append(val)
+        if not admissible:
+            return current
+        self.rng.shuffle(admissible)
+        best = least_conflicted(admissible, admissible[0], conflicts, weights, self.rng)
+        self.tabu[(node, current)] = iteration + self.tenure
+        return best
+
+
+# Class definition for the soft-constraint quality phase
+class simulatedAnnealing(object):
+    def __init__(self, csp, rng=None, start_temperature=ANNEAL_START_TEMPERATURE,
+                 end_temperature=ANNEAL_END_TEMPERATURE):
+        """Improves the soft-constraint quality of a feasible assignment by
+        simulated annealing over its summed log soft weights. Proposals move
+        one node or swap the values of two; those that break a hard constraint
+        are rejected, and scores are read off a ConflictTracker.
+
+        Arguments:
+            csp {CSP} -- The constraint satisfaction problem.
+
+        Keyword Arguments:
+            rng {random.Random} -- Source of randomness, see minConflicts
+                                   (default: {None}).
+            start_temperature {float} -- Temperature of the first proposal
+                                         (default: {ANNEAL_START_TEMPERATURE}).
+            end_temperature {float} -- Temperature at the end of the budget
+                                       (default: {ANNEAL_END_TEMPERATURE}).
+        """
+        self.csp = csp
+        if rng is None:
+            rng = random
+        elif not isinstance(rng, random.Random):
+            rng = random.Random(rng)
+        self.rng = rng
+        self.start_temperature = start_temperature
+        self.end_temperature = end_temperature
+
+    def log_weight(self, tracker, node, val):
+        """Sums the log weights of the unary and binary constraints of a node
+        at a value, its neighbors keeping their assigned values.
+
+        Arguments:
+            tracker {ConflictTracker} -- Bookkeeping of the current assignment.
+            node {tuple} -- A tuple of (course, professor).
+            val {tuple} -- The (room, hours) value of the node.
+
+        Returns:
+            float -- The node's share of the objective at val.
+        """
+        weight = math.log(tracker.value_weights[node][val])
+        unary = self.csp.unary_constraints.get(node)
+        if unary is not None:
+            weight += math.log(unary[val])
+        return weight
+
+    def objective(self, assignments):
+        """Sums the log weights of every unary and binary constraint of a
+        feasible assignment, each pair of nodes counted once.
+
+        Arguments:
+            assignments {dict} -- Domain assignment of each node.
+
+        Returns:
+            float -- The log of minConflicts.soft_weight(assignments).
+        """
+        objective = 0.0
+        done = set()
+        for node in self.csp.nodes:
+            val = assignments[node]
+            if node in self.csp.unary_constraints:
+                objective += math.log(self.csp.unary_constraints[node][val])
+            for neigh, table in self.csp.binary_constraints.get(node, {}).items():
+                if neigh not in done:
+                    objective += math.log(table[val][assignments[neigh]])
+            done.add(node)
+        return objective
+
+    def anneal(self, assignments, time_budget=None, max_iters=None):
+        """Anneals a feasible assignment, keeping the best one seen.
+
+        Arguments:
+            assignments {dict} -- A feasible domain assignment of each node.
+
+        Keyword Arguments:
+            time_budget {float} -- Seconds the search may run (default: {None}).
+            max_iters {int} -- Max number of proposals; the temperature cools
+                               as the first of the two budgets runs out, over
+                               iteration_budget(csp) proposals when neither
+                               is given (default: {None}).
+
+        Raises:
+            ValueError: Raises ValueError if assignments violates a hard constraint.
+
+        Returns:
+            AnnealResult -- The best assignment, its objective and the number
+                            of proposals tried.
+        """
+        tracker = ConflictTracker(self.csp, assignments, self.rng)
+        if len(tracker.conflicted):
+            raise ValueError("Annealing needs a feasible assignment.")
+        if max_iters is None and time_budget is None:
+            max_iters = iteration_budget(self.csp)
+        start = time.perf_counter()
+        cooling = math.log(self.end_temperature / self.start_temperature)
+        current = self.objective(tracker.assignments)
+        best = tracker.assignment()
+        best_objective = current
+        nodes = self.csp.nodes
+        iterations = 0
+        while nodes:
+            progress = 0.0
+            if time_budget is not None:
+                progress = (time.perf_counter() - start) / time_budget
+            if max_iters is not None:
+                progress = max(progress, iterations / max_iters)
+            if progress >= 1:
+                break
+            temperature = self.start_temperature * math.exp(cooling * progress)
+            iterations += 1
+            node = self.rng.choice(nodes)
+            if len(nodes) > 1 and self.rng.random() < ANNEAL_SWAP_RATE:
+                # swap the values of two nodes, which an all-different day
+                # cannot reach one feasible move at a time
+                other = self.rng.choice(nodes)
+                val = tracker.assignments[other]
+                other_val = tracker.assignments[node]
+                if (other == node or val == other_val or val not in tracker.value_conflicts[node]
+                        or other_val not in tracker.value_conflicts[other]):
+                    continue
+                moves = [(node, val), (other, other_val)]
+            else:
+                val = self.rng.choice(self.csp.node_domains[node])
+                if val == tracker.assignments[node] or tracker.value_conflicts[node][val]:
+                    continue
+                if any(grid.clashes(node, val) for grid in tracker.grids):
+                    continue
+                moves = [(node, val)]
+            delta = 0.0
+            undo = []
+            for move_node, val in moves:
+                old = tracker.assignments[move_node]
+                delta += self.log_weight(tracker, move_node, val) - \
+                    self.log_weight(tracker, move_node, old)
+                tracker.move(move_node, val)
+                undo.append((move_node, old))
+            if len(tracker.conflicted) or \
+                    (delta < 0 and self.rng.random() >= math.exp(delta / temperature)):
+                for move_node, old in reversed(undo):
+                    tracker.move(move_node, old)
+                continue
+            current += delta
+            if current > best_objective + 1e-9:
+                best = tracker.assignment()
+                best_objective = current
+        return AnnealResult(best, best_objective, iterations)
+
+
+# Class definition for complete search
+class backtrackingSearch(object):
+    def __init__(self, csp):
+        """Depth-first backtracking over a CSP with MRV variable ordering,
+        least-constraining-value ordering and forward checking. Unlike
+        minConflicts it can prove that no consistent assignment exists.
+
+        Arguments:
+            csp {CSP} -- The constraint satisfaction problem to solve.
+
+        Attributes:
+            status {str} -- SOLVED, INFEASIBLE or LIMIT after solve.
+            expanded {int} -- Number of values tried by the last solve.
+        """
+        self.csp = csp
+        self.status = None
+        self.expanded = 0
+        self.masks = None
+
+    def occupancy_masks(self):
+        """Maps each node to the slots its values can hold under the
+        resource constraints.
+
+        Returns:
+            dict -- {node: {(constraint index, resource): bitmask of slots}}
+        """
+        masks = {}
+        for node in self.csp.nodes:
+            node_masks = masks[node] = {}
+            for index, occupies in enumerate(self.csp.resource_constraints):
+                for val in self.csp.node_domains[node]:
+                    span = occupies(node, val)
+                    if span is None:
+                        continue
+                    resource, start, end = span
+                    key = (index, resource)
+                    node_masks[key] = node_masks.get(key, 0) | ((1 << end) - (1 << start))
+        return masks
+
+    def conflicts_with(self, node, val, other, other_val):
+        """Checks whether two assigned values violate a hard constraint.
+
+        Arguments:
+            node {tuple} -- A tuple of (course, professor).
+            val {tuple} -- The (room, hours) value of node.
+            other {tuple} -- A second node.
+            other_val {tuple} -- The value of the second node.
+
+        Returns:
+            bool -- True if a binary or resource constraint is violated.
+        """
+        table = self.csp.binary_constraints.get(node, {}).get(other)
+        if table is not None and table[val][other_val] == 0:
+            return True
+        for occupies in self.csp.resource_constraints:
+            span = occupies(node, val)
+            other_span = occupies(other, other_val)
+            if (span is not None and other_span is not None and span[0] == other_span[0]
+                    and span[1] < other_span[2] and other_span[1] < span[2]):
+                return True
+        return False
+
+    def related(self, node):
+        """Returns the nodes a value of node can rule out values of.
+
+        Arguments:
+            node {tuple} -- A tuple of (course, professor).
+
+        Returns:
+            list -- Neighbors of node, and the nodes that can hold a slot of
+                    a resource node can hold.
+        """
+        neighbors = list(self.csp.binary_constraints.get(node, {}))
+        if not self.csp.resource_constraints:
+            return neighbors
+        if self.masks is None or self.masks.keys() != set(self.csp.nodes):
+            self.masks = self.occupancy_masks()
+        own = self.masks[node]
+        known = set(neighbors)
+        known.add(node)
+        for other in self.csp.nodes:
+            if other in known:
+                continue
+            other_masks = self.masks[other]
+            if any(mask & other_masks.get(key, 0) for key, mask in own.items()):
+                neighbors.append(other)
+        return neighbors
+
+    def solve(self, max_nodes=None, time_budget=None):
+        """Searches for an assignment that violates no hard constraint.
+
+        Keyword Arguments:
+            max_nodes {int} -- Max number of values tried, None for no limit
+                               (default: {None}).
+            time_budget {float} -- Seconds the search may run (default: {None}).
+
+        Returns:
+            dict -- Domain assignment of each node, None when the CSP is
+                    infeasible (status INFEASIBLE) or a limit was hit
+                    (status LIMIT).
+        """
+        deadline = None if time_budget is None else time.perf_counter() + time_budget
+        self.expanded = 0
+        self.status = None
+        domains = {}
+        for node in self.csp.nodes:
+            unary = self.csp.unary_constraints.get(node)
+            domains[node] = [val for val in self.csp.node_domains[node]
+                             if unary is None or unary[val] != 0]
+            if not domains[node]:
+                self.status = INFEASIBLE
+                return None
+        self.masks = None
+        related = {node: self.related(node) for node in self.csp.nodes}
+        assignments = {}
+
+        def out_of_budget():
+            if max_nodes is not None and self.expanded >= max_nodes:
+                return True
+            return deadline is not None and time.perf_counter() >= deadline
+
+        def eliminated(node, val):
+            """Values of unassigned related nodes that node = val rules out."""
+            removed = []
+            for other in related[node]:
+                if other in assignments:
+                    continue
+                pruned = [other_val for other_val in domains[other]
+                          if self.conflicts_with(node, val, other, other_val)]
+                if pruned:
+                    removed.append((other, pruned))
+            return removed
+
+        def backtrack():
+            if len(assignments) == len(self.csp.nodes):
+                return True
+            # MRV, ties broken by the most related unassigned nodes
+            node = min((node for node in self.csp.nodes if node not in assignments),
+                       key=lambda node: (len(domains[node]), -len(related[node])))
+            # LCV: try first the values that rule out the fewest others
+            scored = []
+            for val in domains[node]:
+                removed = eliminated(node, val)
+                scored.append((sum(len(pruned) for _, pruned in removed), val, removed))
+            scored.sort(key=lambda item: item[0])
+            for _, val, removed in scored:
+                if out_of_budget():
+                    self.status = LIMIT
+                    return False
+                self.expanded += 1
+                # forward checking
+                if any(len(pruned) == len(domains[other]) for other, pruned in removed):
+                    continue
+                saved = [(other, domains[other]) for other, _ in removed]
+                for other, pruned in removed:
+                    pruned = set(pruned)
+                    domains[other] = [other_val for other_val in domains[other]
+                                      if other_val not in pruned]
+                assignments[node] = val
+                if backtrack():
+                    return True
+                if self.status == LIMIT:
+                    return False
+                del assignments[node]
+                for other, domain in saved:
+                    domains[other] = domain
+            return False
+
+        if backtrack():
+            self.status = SOLVED
+            return dict(assignments)
+        if self.status is None:
+            self.status = INFEASIBLE
+        return None
+
+
+# State of the worker processes of parallel_solve
+_worker_csp = None
+_worker_engine = STANDARD
+_worker_stop = None
+_worker_tenure = None
+
+
+def _init_worker(csp, engine, stop, tenure=None, build=None, domains=None):
+    global _worker_csp, _worker_engine, _worker_stop, _worker_tenure
+    if build is not None:
+        csp = build()
+        csp.node_domains.update(domains)
+        csp.version += 1
+    _worker_csp = csp
+    _worker_engine = engine
+    _worker_stop = stop
+    _worker_tenure = tenure
+
+
+def _solve_start(seed, max_iters, time_budget=None):
+    if _worker_tenure is None:
+        solver = minConflicts(_worker_csp, _worker_engine, seed)
+    else:
+        solver = tabuSearch(_worker_csp, _worker_engine, seed, _worker_tenure)
+    result = solver.search(max_iters, time_budget, _worker_stop.is_set)
+    if result.conflicts != 0:
+        return None, None
+    return result.assignments, solver.soft_weight(result.assignments)
+
+
+def parallel_solve(csp, starts, max_iters=100, engine=STANDARD, processes=None,
+                   seed=None, first=True, tenure=None, time_budget=None, build=None):
+    """Runs independently seeded minConflicts searches of the same CSP
+    across a process pool.
+
+    Without build the CSP is handed to each worker once, when the pool
+    starts, through the fork start method: it is inherited rather than
+    pickled, so its LazyTables may hold closures. With build the workers
+    make their own copy instead, so any start method will do and only
+    build and the domains, which propagate may have pruned, are pickled.
+
+    Arguments:
+        csp {CSP} -- The constraint satisfaction problem to solve.
+        starts {int} -- Number of searches to run.
+
+    Keyword Arguments:
+        max_iters {int} -- Max number of trials of each search, None for no
+                           limit when time_budget is given (default: {100}).
+        engine {str} -- The minConflicts engine (default: {STANDARD}).
+        processes {int} -- Size of the pool, None for one per CPU (default: {None}).
+        seed {int} -- Seeds the seeds of the searches (default: {None}).
+        first {bool} -- Return the first feasible assignment and cancel the other
+                        searches, otherwise wait for all of them and return the
+                        feasible assignment with the largest soft_weight
+                        (default: {True}).
+        tenure {int} -- Run tabuSearch with this tenure instead of minConflicts
+                        (default: {None}).
+        time_budget {float} -- Seconds all the searches together may run; the
+                               searches still running are stopped when it is
+                               spent (default: {None}).
+        build {function} -- A picklable callable, e.g. a functools.partial of a
+                            module level function, called without arguments in
+                            each worker to rebuild the CSP (default: {None}).
+
+    Raises:
+        ValueError: Raises ValueError if build is not given and the fork start
+                    method is not available on this platform.
+
+    Returns:
+        dict -- Final domain assignment of each node, None if no search succeeded.
+    """
+    if build is None:
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise ValueError("parallel_solve needs the fork start method to hand the CSP "
+                             "to its workers; pass build to rebuild it in each worker.")
+        context = multiprocessing.get_context('fork')
+    else:
+        context = multiprocessing.get_context()
+    stop = context.Event()
+    if build is None:
+        initargs = (csp, engine, stop, tenure)
+    else:
+        initargs = (None, engine, stop, tenure, build, dict(csp.node_domains))
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    seeder = random.Random(seed)
+    seeds = [seeder.getrandbits(32) for _ in range(starts)]
+    best = None
+    best_weight = None
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context,
+                             initializer=_init_worker, initargs=initargs) as executor:
+        futures = [executor.submit(_solve_start, start_seed, max_iters, time_budget)
+                   for start_seed in seeds]
+        timeout = None if deadline is None else max(deadline - time.perf_counter(), 0)
+        try:
+            for future in as_completed(futures, timeout):
+                assignments, soft_weight = future.result()
+                if assignments is None:
                     continue
-                assignments_cpy = copy.deepcopy(assignments)
-                assignments_cpy[node] = each_domain
-                conflict, w = self.conflicted_neighbors(assignments_cpy, node)
-                if len(conflict) < min_conflicted:
-                    assignments = assignments_cpy
-                    min_conflicted = len(conflict)
-                    w0 = w
-                elif len(conflict) == min_conflicted:
-                    # choose equally conflicted node by
-                    # random weighted on soft-constraint
-                    r = random.random()
-                    if r < w / (w + w0):
-                        w0 = w
-                        assignments = assignments_cpy
-        return None  
+                if first:
+                    return assignments
+                if best is None or soft_weight > best_weight:
+                    best = assignments
+                    best_weight = soft_weight
+        except FuturesTimeout:
+            # the searches stop at their next trial, keep what finished in time
+            for future in futures:
+                if future.done() and not future.cancelled():
+                    assignments, soft_weight = future.result()
+                    if assignments is not None and (best is None or soft_weight > best_weight):
+                        best = assignments
+                        best_weight = soft_weight
+        finally:
+            stop.set()
+            for future in futures:
+                future.cancel()
+    return best
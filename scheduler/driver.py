@@ -4,6 +4,7 @@ import json
 import datamaker
 import pandas as pd
 from teachercourse_csp import assigner
+from excel_loader import load_workbook
 from IPython.display import display
 
 
@@ -16,46 +17,8 @@ def main():
         output = '{:0>2}'.format(hs)+':'+'{:0>2}'.format(ms)+' to ' + '{:0>2}'.format(he)+':'+ '{:0>2}'.format(me) 
         return output
 
-    df = pd.read_excel('my_data.xlsx')
-
-    prof_df = df.iloc[:,0:4]
-    prof_df['prof_courses'] = prof_df['prof_courses'].str.replace(', ',',')
-    rooms_df = df.iloc[:,4:6]
-    rooms_df.dropna(inplace=True)
-    rooms_df['room_capacity'] = rooms_df['room_capacity'].astype(u'int8')
-    rooms_df['rooms'] = rooms_df['rooms'].astype('str')
-    courses_df = df.iloc[:,6:]
-    courses_df.dropna(inplace=True)
-
-    professors = []
-    prof_info = {}
-    for index, row in prof_df.iterrows():
-            data = {}
-            prof = row['professor']
-            professors.append(prof)
-            courses = row['prof_courses'].split(',')
-            data['courses'] = courses
-            data['start_time'] = row['prof_start_time']
-            data['end_time'] = row['prof_end_time']
-            prof_info[prof] = data
-            
-    rooms = []
-    room_capacities = {}
-    for _, row in rooms_df.iterrows():
-        room = row['rooms']
-        room_capacities[room] = row['room_capacity']
-        rooms.append(room)
-
-    courses = []
-    course_no_students = {}
-    course_mins = {}
-    course_days_weekly = {}
-    for _, row in courses_df.iterrows():
-        course = row['course']
-        courses.append(course)
-        course_no_students[course] = int(row['course_no_students'])
-        course_mins[course] = int(row['course_mins'])
-        course_days_weekly[course] = int(row['course_days_weekly'])
+    professors, prof_info, rooms, room_capacities, courses, course_no_students, \
+        course_mins, course_days_weekly = load_workbook('my_data.xlsx')
     print("Data loaded successfully!")
 
     datamaker.make_data()
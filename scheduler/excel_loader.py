@@ -0,0 +1,147 @@
+"""
+Loads the scheduler's data from an Excel workbook such as my_data.xlsx.
+
+The sheet holds three blocks of columns side by side: the professors
+(professor, prof_courses, prof_start_time, prof_end_time), the rooms
+(rooms, room_capacity) and the courses (course, course_no_students,
+course_mins, course_days_weekly, course_no_sections). Each block is built
+with column operations. The parsed instance is pickled next to the
+workbook, keyed by its path, mtime and hash, so later runs skip pandas and
+the Excel parsing altogether.
+"""
+import hashlib
+import os
+import pickle
+
+# Suffix of the cache file saved next to a workbook
+CACHE_SUFFIX = '.cache'
+# Bumped when the layout of the cached instance changes
+CACHE_VERSION = 1
+
+
+def workbook_key(path):
+    """Identifies the contents of a workbook.
+
+    Arguments:
+        path {str} -- The workbook.
+
+    Returns:
+        [tuple] -- (absolute path, mtime in nanoseconds, sha1 hex digest)
+    """
+    with open(path, 'rb') as workbook:
+        digest = hashlib.sha1(workbook.read()).hexdigest()
+    return (os.path.abspath(path), os.stat(path).st_mtime_ns, digest)
+
+
+def parse_workbook(path):
+    """Reads a workbook with pandas.
+
+    Arguments:
+        path {str} -- The workbook.
+
+    Returns:
+        [tuple] -- (professors, prof_info, rooms, room_capacities, courses,
+                    course_no_students, course_mins, course_days_weekly)
+    """
+    # imported here so that cache hits never pay for importing pandas
+    import pandas as pd
+
+    df = pd.read_excel(path)
+
+    prof_df = df.iloc[:, 0:4].dropna()
+    professors = prof_df['professor'].tolist()
+    prof_courses = prof_df['prof_courses'].str.replace(', ', ',').str.split(',').tolist()
+    start_times = prof_df['prof_start_time'].astype(int).tolist()
+    end_times = prof_df['prof_end_time'].astype(int).tolist()
+    prof_info = {prof: {'courses': prof_course_list, 'start_time': start, 'end_time': end}
+                 for prof, prof_course_list, start, end
+                 in zip(professors, prof_courses, start_times, end_times)}
+
+    rooms_df = df.iloc[:, 4:6].dropna()
+    rooms = rooms_df['rooms'].astype(str).tolist()
+    room_capacities = dict(zip(rooms, rooms_df['room_capacity'].astype(int).tolist()))
+
+    courses_df = df.iloc[:, 6:].dropna()
+    courses = courses_df['course'].tolist()
+    course_no_students = dict(zip(courses, courses_df['course_no_students'].astype(int).tolist()))
+    course_mins = dict(zip(courses, courses_df['course_mins'].astype(int).tolist()))
+    course_days_weekly = dict(zip(courses, courses_df['course_days_weekly'].astype(int).tolist()))
+
+    return (professors, prof_info, rooms, room_capacities, courses,
+            course_no_students, course_mins, course_days_weekly)
+
+
+def load_cache(cache_path, key):
+    """Loads the instance saved by save_cache. A missing or stale file
+    (other key or cache version) gives None; so does a file that cannot be
+    loaded, which is removed.
+
+    Arguments:
+        cache_path {str} -- The cache file.
+        key {tuple} -- workbook_key of the workbook.
+
+    Returns:
+        [tuple] -- The cached instance, or None.
+    """
+    try:
+        with open(cache_path, 'rb') as cache_file:
+            saved = pickle.load(cache_file)
+        if saved.get('version') != CACHE_VERSION or saved.get('key') != key:
+            return None
+        return saved['user_data']
+    except FileNotFoundError:
+        return None
+    except Exception:
+        # corrupt, or pickled by code that has since changed: parse again
+        try:
+            os.remove(cache_path)
+        except OSError:
+            pass
+        return None
+
+
+def save_cache(cache_path, key, user_data):
+    """Saves a parsed instance under the key of its workbook.
+
+    Arguments:
+        cache_path {str} -- The cache file, replaced atomically.
+        key {tuple} -- workbook_key of the workbook.
+        user_data {tuple} -- The parsed instance.
+    """
+    saved = {'version': CACHE_VERSION, 'key': key, 'user_data': user_data}
+    temp_path = cache_path + '.tmp'
+    with open(temp_path, 'wb') as cache_file:
+        pickle.dump(saved, cache_file, pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, cache_path)
+
+
+def load_workbook(path, cache_path=None, use_cache=True):
+    """Loads the user_data tuple taken by assigner from a workbook, from
+    the cache when the workbook has not changed since it was parsed.
+
+    Arguments:
+        path {str} -- The workbook.
+
+    Keyword Arguments:
+        cache_path {str} -- The cache file, None for the workbook's path
+                            with CACHE_SUFFIX (default: {None}).
+        use_cache {bool} -- Read and write the cache (default: {True}).
+
+    Returns:
+        [tuple] -- (professors, prof_info, rooms, room_capacities, courses,
+                    course_no_students, course_mins, course_days_weekly)
+    """
+    if not use_cache:
+        return parse_workbook(path)
+    if cache_path is None:
+        cache_path = path + CACHE_SUFFIX
+    key = workbook_key(path)
+    user_data = load_cache(cache_path, key)
+    if user_data is None:
+        user_data = parse_workbook(path)
+        try:
+            save_cache(cache_path, key, user_data)
+        except OSError:
+            # a read-only directory only costs the next run a parse
+            pass
+    return user_data
@@ -0,0 +1,241 @@
+"""
+Generates synthetic instances in the sample_data.txt format read by assigner.
+
+Every part of an instance is drawn from its own random stream derived from
+the seed, so the JSON is written key by key and element by element without
+building the instance in memory; a 20k-course instance streams straight to
+disk. Run as a script:
+
+    python instancegen.py instance.json --courses 20000 --rooms 500 --profs 4000
+    python instancegen.py instance.json --durations 60:0.5,90:0.3,180:0.2 --days 2:1
+"""
+
+import argparse
+import json
+import random
+
+# Defaults modelled on the hand-written sample instance of datamaker.py
+CAPACITY_RANGE = (20, 40)
+QUALIFICATION_DENSITY = 0.2
+DURATION_MIX = {60: 0.6, 90: 0.4}
+DAYS_MIX = {1: 0.2, 2: 0.5, 3: 0.3}
+SECTIONS_MIX = {1: 0.6, 2: 0.4}
+# Earliest start hours and working-day lengths of the professors
+PROF_START_HOURS = (8, 9, 10)
+PROF_HOURS = (6, 8, 9)
+
+
+def stream(seed, part):
+    """Returns the random stream of one part of an instance.
+
+    Arguments:
+        seed {int} -- The instance seed.
+        part {str} -- Name of the part, e.g. 'rooms'.
+
+    Returns:
+        random.Random -- A generator seeded from both.
+    """
+    return random.Random("{}:{}".format(seed, part))
+
+
+def draw(rng, mix):
+    """Draws a value from a {value: weight} mix.
+
+    Arguments:
+        rng {random.Random} -- Source of randomness.
+        mix {dict} -- Maps each value to its relative weight.
+
+    Returns:
+        object -- One of the values.
+    """
+    return rng.choices(list(mix), weights=list(mix.values()))[0]
+
+
+def write_json_list(out, values):
+    """Writes an iterable as a JSON list, one element at a time."""
+    out.write('[')
+    for index, value in enumerate(values):
+        if index:
+            out.write(', ')
+        out.write(json.dumps(value))
+    out.write(']')
+
+
+def write_json_object(out, items):
+    """Writes an iterable of (key, value) pairs as a JSON object, one pair at a time."""
+    out.write('{')
+    for index, (key, value) in enumerate(items):
+        if index:
+            out.write(', ')
+        out.write(json.dumps(key))
+        out.write(': ')
+        out.write(json.dumps(value))
+    out.write('}')
+
+
+def generate_instance(out, no_courses, no_rooms, no_profs, seed=0,
+                      capacity_range=CAPACITY_RANGE,
+                      qualification_density=QUALIFICATION_DENSITY,
+                      duration_mix=DURATION_MIX, days_mix=DAYS_MIX,
+                      sections_mix=SECTIONS_MIX):
+    """Streams a synthetic instance to a file object as JSON.
+
+    Arguments:
+        out {file} -- A text file object open for writing.
+        no_courses {int} -- Number of courses.
+        no_rooms {int} -- Number of rooms.
+        no_profs {int} -- Number of professors.
+
+    Keyword Arguments:
+        seed {int} -- Seeds every random stream (default: {0}).
+        capacity_range {tuple} -- (low, high) bounds of the uniform room capacities
+                                  (default: {CAPACITY_RANGE}).
+        qualification_density {float} -- Fraction of all courses each professor is
+                                          qualified for; every course also gets at
+                                          least one professor
+                                          (default: {QUALIFICATION_DENSITY}).
+        duration_mix {dict} -- {minutes: weight} of course durations
+                               (default: {DURATION_MIX}).
+        days_mix {dict} -- {days held per week: weight} (default: {DAYS_MIX}).
+        sections_mix {dict} -- {number of sections: weight} (default: {SECTIONS_MIX}).
+
+    Raises:
+        ValueError: Raises ValueError if there are no courses, rooms or professors.
+    """
+    if no_courses < 1 or no_rooms < 1 or no_profs < 1:
+        raise ValueError("An instance needs courses, rooms and professors.")
+    courses = ['course {}'.format(i) for i in range(no_courses)]
+    rooms = ['room {}'.format(i) for i in range(no_rooms)]
+    professors = ['prof {}'.format(i) for i in range(no_profs)]
+    low, high = capacity_range
+
+    def room_capacities():
+        rng = stream(seed, 'rooms')
+        return ((room, rng.randint(low, high)) for room in rooms)
+
+    # enrollments never exceed the largest room, replayed from its stream
+    largest = max(capacity for _, capacity in room_capacities())
+
+    def course_no_students():
+        rng = stream(seed, 'students')
+        return ((course, rng.randint(min(low, largest) // 2, largest)) for course in courses)
+
+    def mix(part, values):
+        rng = stream(seed, part)
+        return ((course, draw(rng, values)) for course in courses)
+
+    def prof_info():
+        rng = stream(seed, 'professors')
+        extra = int(qualification_density * no_courses)
+        for index, professor in enumerate(professors):
+            # course i is always taught by professor i % no_profs
+            qualified = set(range(index, no_courses, no_profs))
+            qualified.update(rng.sample(range(no_courses), min(extra, no_courses)))
+            start_time = rng.choice(PROF_START_HOURS)
+            yield professor, {'courses': [courses[i] for i in sorted(qualified)],
+                              'start_time': start_time,
+                              'end_time': start_time + rng.choice(PROF_HOURS)}
+
+    parts = [
+        ('courses', lambda: write_json_list(out, courses)),
+        ('professors', lambda: write_json_list(out, professors)),
+        ('rooms', lambda: write_json_list(out, rooms)),
+        ('room_capacities', lambda: write_json_object(out, room_capacities())),
+        ('prof_info', lambda: write_json_object(out, prof_info())),
+        ('course_no_students', lambda: write_json_object(out, course_no_students())),
+        ('course_mins', lambda: write_json_object(out, mix('durations', duration_mix))),
+        ('course_no_sections', lambda: write_json_object(out, mix('sections', sections_mix))),
+        ('course_days_weekly', lambda: write_json_object(out, mix('days', days_mix))),
+    ]
+    out.write('{')
+    for index, (key, write) in enumerate(parts):
+        if index:
+            out.write(', ')
+        out.write(json.dumps(key))
+        out.write(': ')
+        write()
+    out.write('}')
+
+
+def parse_mix(text):
+    """Parses a {value: weight} mix given on the command line as
+    'value:weight,value:weight', e.g. '60:0.6,90:0.4'.
+
+    Arguments:
+        text {str} -- The mix.
+
+    Raises:
+        argparse.ArgumentTypeError: Raises ArgumentTypeError if a pair is malformed,
+                                    a weight is negative or all weights are zero.
+
+    Returns:
+        dict -- Maps each int value to its float weight.
+    """
+    mix = {}
+    try:
+        for pair in text.split(','):
+            value, weight = pair.split(':')
+            mix[int(value)] = float(weight)
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected value:weight pairs such as 60:0.6,90:0.4, "
+                                         "got {!r}".format(text))
+    if any(weight < 0 for weight in mix.values()) or not sum(mix.values()) > 0:
+        raise argparse.ArgumentTypeError("weights must be non-negative and not all zero, "
+                                         "got {!r}".format(text))
+    return mix
+
+
+def load_instance(path, sections=False):
+    """Loads an instance file as the user_data tuple taken by assigner.
+
+    Arguments:
+        path {str} -- The instance file.
+
+    Keyword Arguments:
+        sections {bool} -- Also return course_no_sections, which assigner does not
+                           take; files without it give one section per course
+                           (default: {False}).
+
+    Returns:
+        tuple -- (professors, prof_info, rooms, room_capacities, courses,
+                  course_no_students, course_mins, course_days_weekly), followed by
+                  course_no_sections when sections is set
+    """
+    with open(path) as instance_file:
+        data = json.load(instance_file)
+    user_data = (data['professors'], data['prof_info'], data['rooms'], data['room_capacities'],
+                 data['courses'], data['course_no_students'], data['course_mins'],
+                 data['course_days_weekly'])
+    if sections:
+        course_no_sections = data.get('course_no_sections',
+                                      {course: 1 for course in data['courses']})
+        return user_data + (course_no_sections,)
+    return user_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('path', help='file the instance is written to')
+    parser.add_argument('--courses', type=int, default=100)
+    parser.add_argument('--rooms', type=int, default=20)
+    parser.add_argument('--profs', type=int, default=40)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--capacity', type=int, nargs=2, default=CAPACITY_RANGE,
+                        metavar=('LOW', 'HIGH'))
+    parser.add_argument('--density', type=float, default=QUALIFICATION_DENSITY,
+                        help='fraction of the courses each professor can teach')
+    parser.add_argument('--durations', type=parse_mix, default=DURATION_MIX, metavar='MIX',
+                        help='minutes:weight pairs of the course durations (default: 60:0.6,90:0.4)')
+    parser.add_argument('--days', type=parse_mix, default=DAYS_MIX, metavar='MIX',
+                        help='days per week:weight pairs (default: 1:0.2,2:0.5,3:0.3)')
+    parser.add_argument('--sections', type=parse_mix, default=SECTIONS_MIX, metavar='MIX',
+                        help='sections:weight pairs (default: 1:0.6,2:0.4)')
+    args = parser.parse_args()
+    with open(args.path, 'w') as out:
+        generate_instance(out, args.courses, args.rooms, args.profs, args.seed,
+                          tuple(args.capacity), args.density, args.durations,
+                          args.days, args.sections)
+
+
+if __name__ == '__main__':
+    main()
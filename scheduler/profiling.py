@@ -0,0 +1,172 @@
+"""
+Profiles assigner on an instance file without editing driver.py.
+
+The instance is read the way driver.py reads sample_data.txt (any file
+written by datamaker.make_data or instancegen.py will do), but the file is
+never rewritten. assigner runs once under cProfile and, with the same seed,
+once under tracemalloc, so allocation tracing does not skew the timings.
+The memory snapshot is taken inside the solve of the day holding the most
+memory, right after its search while its CSP and constraint tables are
+still alive, and is diffed against a snapshot taken before the run. The
+top functions by cumulative time, the top allocation sites and the time
+each day spent in each phase are printed; --pstats saves the profile for
+snakeviz, gprof2dot or flameprof.
+
+    python -m scheduler.profiling
+    python -m scheduler.profiling instance.json --top 30 --pstats week.pstats
+
+The module is not named profile, which would shadow the standard library
+module cProfile imports.
+"""
+import argparse
+import cProfile
+import os
+import pstats
+import random
+import sys
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from cspsolver import ENGINES
+from instancegen import load_instance
+from teachercourse_csp import AssignerStats, DaySolver, assigner, INCREMENTAL, WEEKDAYS, PHASES
+
+# The instance driver.py solves
+DEFAULT_INSTANCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sample_data.txt')
+# Rows printed of each report
+TOP = 20
+# Frames kept per allocation traceback
+TRACE_FRAMES = 1
+
+
+def profile_time(user_data, seed, engine, stats=None):
+    """Runs assigner under cProfile.
+
+    Arguments:
+        user_data {tuple} -- A tuple of lists containing the user's data information.
+        seed {int} -- Seeds the random module before the run.
+        engine {str} -- The minConflicts engine.
+
+    Keyword Arguments:
+        stats {AssignerStats} -- Passed on to assigner (default: {None}).
+
+    Returns:
+        [cProfile.Profile] -- The profile of the run.
+    """
+    random.seed(seed)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        assigner(user_data, engine, stats=stats)
+    finally:
+        profiler.disable()
+    return profiler
+
+
+def filter_snapshot(snapshot):
+    """Drops the allocations of tracemalloc and the import machinery from a snapshot."""
+    return snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<unknown>')])
+
+
+def profile_memory(user_data, seed, engine, frames=TRACE_FRAMES):
+    """Runs assigner under tracemalloc. DaySolver.search is wrapped for the
+    run so that a snapshot is taken after each day's search, before the
+    day's CSP and tables are dropped; the one taken when the most memory
+    was traced is kept.
+
+    Arguments:
+        user_data {tuple} -- A tuple of lists containing the user's data information.
+        seed {int} -- Seeds the random module before the run.
+        engine {str} -- The minConflicts engine.
+
+    Keyword Arguments:
+        frames {int} -- Frames kept per allocation traceback (default: {TRACE_FRAMES}).
+
+    Returns:
+        [tuple] -- (snapshot at the fullest day, snapshot before the run, bytes traced
+                    at the fullest day, peak traced bytes of the run)
+    """
+    search = DaySolver.search
+    fullest = {'current': -1, 'snapshot': None}
+
+    def traced_search(day_solver, *args, **kwargs):
+        result = search(day_solver, *args, **kwargs)
+        current = tracemalloc.get_traced_memory()[0]
+        if current > fullest['current']:
+            fullest['current'] = current
+            # drop the previous day's snapshot before taking the next one
+            fullest['snapshot'] = None
+            fullest['snapshot'] = tracemalloc.take_snapshot()
+        return result
+
+    random.seed(seed)
+    tracemalloc.start(frames)
+    DaySolver.search = traced_search
+    try:
+        baseline = tracemalloc.take_snapshot()
+        assigner(user_data, engine)
+        current, peak = tracemalloc.get_traced_memory()
+        if fullest['snapshot'] is None:
+            # no day was searched
+            fullest['current'], fullest['snapshot'] = current, tracemalloc.take_snapshot()
+    finally:
+        DaySolver.search = search
+        tracemalloc.stop()
+    return (filter_snapshot(fullest['snapshot']), filter_snapshot(baseline),
+            fullest['current'], peak)
+
+
+def print_phases(stats):
+    """Prints the seconds each day spent in each phase and its attempts."""
+    print('{:<6}'.format('day') + ''.join('{:>24}'.format(phase) for phase in PHASES)
+          + '{:>10}'.format('attempts'))
+    for day in WEEKDAYS:
+        print('{:<6}'.format(day)
+              + ''.join('{:>24.4f}'.format(stats.timings[day][phase]) for phase in PHASES)
+              + '{:>10}'.format(stats.attempts[day]))
+    print('retry rounds:', stats.retries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('path', nargs='?', default=DEFAULT_INSTANCE,
+                        help='instance file (default: sample_data.txt)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--engine', default=INCREMENTAL, choices=ENGINES)
+    parser.add_argument('--top', type=int, default=TOP, help='rows printed of each report')
+    parser.add_argument('--sort', default='cumulative',
+                        help='pstats sort key of the time report')
+    parser.add_argument('--pstats', help='file the cProfile stats are dumped to')
+    parser.add_argument('--frames', type=int, default=TRACE_FRAMES,
+                        help='frames kept per allocation traceback')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc run')
+    args = parser.parse_args()
+
+    user_data = load_instance(args.path)
+    stats = AssignerStats()
+    profiler = profile_time(user_data, args.seed, args.engine, stats)
+    if args.pstats:
+        profiler.dump_stats(args.pstats)
+    pstats.Stats(profiler).strip_dirs().sort_stats(args.sort).print_stats(args.top)
+    print_phases(stats)
+
+    if not args.no_memory:
+        snapshot, baseline, current, peak = profile_memory(user_data, args.seed, args.engine,
+                                                           args.frames)
+        print()
+        print('traced bytes at the fullest day:', current)
+        print('peak traced bytes:', peak)
+        key = 'traceback' if args.frames > 1 else 'lineno'
+        for stat in snapshot.compare_to(baseline, key)[:args.top]:
+            print(stat)
+            if args.frames > 1:
+                for line in stat.traceback.format():
+                    print('   ', line)
+
+
+if __name__ == '__main__':
+    main()
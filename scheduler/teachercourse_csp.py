@@ -1,7 +1,16 @@
-from cspsolver import CSP, minConflicts
-
+from cspsolver import CSP, TableCache, InfeasibleError, minConflicts, parallel_solve, iteration_budget, \
+    propagate, backtrackingSearch, tabuSearch, simulatedAnnealing, INCREMENTAL, COMPILED
+
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import functools
+import hashlib
+import math
+import os
+import pickle
 import random
 import collections
+import time
 
 """
 Takes in the data file and outputs class schedules for each weekday.
@@ -14,6 +23,31 @@ THURSDAY = 'thur'
 FRIDAY = 'fri'
 WEEKDAYS = [MONDAY, TUESDAY, WEDNESDAY, THURSDAY, FRIDAY]
 
+# Typecode of domains of slot ids below SLOT_ID_LIMIT, and of larger ids
+SLOT_TYPECODE = 'H'
+WIDE_SLOT_TYPECODE = 'I' if array('I').itemsize >= 4 else 'L'
+SLOT_ID_LIMIT = 1 << (8 * array(SLOT_TYPECODE).itemsize)
+
+# Bytes of eager constraint tables per day before switching to lazy tables
+TABLE_MEMORY_BUDGET = 1024 ** 3
+
+# Days with at most this many sections that local search fails on are
+# searched again by complete search
+EXACT_SEARCH_MAX_NODES = 12
+# Values the complete search may try before giving up on the day
+EXACT_SEARCH_NODE_LIMIT = 10000
+
+# Rounds in which assigner moves the overflow sections of failed days and
+# solves the changed days again
+MAX_RETRIES = 2
+
+# Phases of building and solving a day timed by AssignerStats
+ADD_NODES = 'add_nodes'
+ADD_UNARY = 'add_unary_constraint'
+ADD_BINARY = 'add_binary_constraint'
+SOLVE = 'solve'
+PHASES = (ADD_NODES, ADD_UNARY, ADD_BINARY, SOLVE)
+
 
 def pref_handler(rand_day):
     """Given a random day, return a list of days weighted by preference.
@@ -82,6 +116,97 @@ def maps_day_to_class(course_days_weekly, courses):
     return courses_on_days
 
 
+class SlotRegistry(object):
+    def __init__(self, slots=None):
+        """Interns each (room, (hour, minute)) domain value as a small integer id,
+        so node domains can be compact arrays of ids and constraint
+        tables are keyed by ints instead of nested tuples.
+
+        Keyword Arguments:
+            slots {list} -- Slots to register first, in id order, e.g. those of
+                            a saved table cache (default: {None}).
+
+        Attributes:
+            slots {list} -- The (room, (hour, minute)) of each id.
+            ids {dict} -- Maps each (room, (hour, minute)) to its id.
+        """
+        self.slots = []
+        self.ids = {}
+        for room, hour_and_min in slots or ():
+            self.intern(room, hour_and_min)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def intern(self, room, hour_and_min):
+        """Returns the id of a room and start time, registering it if new.
+
+        Arguments:
+            room {str} -- A room.
+            hour_and_min {tuple} -- The (hour, minute) start time.
+
+        Returns:
+            int -- The slot id.
+        """
+        slot = (room, hour_and_min)
+        slot_id = self.ids.get(slot)
+        if slot_id is None:
+            slot_id = self.ids[slot] = len(self.slots)
+            self.slots.append(slot)
+        return slot_id
+
+    def domain(self, rooms, hours):
+        """Interns every room and start time pair of a node's domain.
+
+        Arguments:
+            rooms {list} -- Candidate rooms.
+            hours {set} -- Candidate (hour, minute) start times.
+
+        Returns:
+            array -- The slot ids, an array of SLOT_TYPECODE, or of
+                     WIDE_SLOT_TYPECODE once an id reaches SLOT_ID_LIMIT.
+        """
+        ids = [self.intern(room, hour) for room in rooms for hour in hours]
+        if ids and max(ids) >= SLOT_ID_LIMIT:
+            return array(WIDE_SLOT_TYPECODE, ids)
+        return array(SLOT_TYPECODE, ids)
+
+    def slot(self, slot_id):
+        """Returns the (room, (hour, minute)) of a slot id."""
+        return self.slots[slot_id]
+
+    def room(self, slot_id):
+        """Returns the room of a slot id."""
+        return self.slots[slot_id][0]
+
+    def time(self, slot_id):
+        """Returns the (hour, minute) start time of a slot id."""
+        return self.slots[slot_id][1]
+
+    def encode(self, assignments):
+        """Maps the rooms and times of an assignment to slot ids.
+
+        Arguments:
+            assignments {dict} -- A map {node: (room, (hour, minute))}.
+
+        Returns:
+            [dict] -- A map {node: slot id}.
+        """
+        return {node: self.intern(room, hour_and_min)
+                for node, (room, hour_and_min) in assignments.items()}
+
+    def decode(self, assignments):
+        """Maps the slot ids of an assignment back to rooms and times.
+
+        Arguments:
+            assignments {dict} -- A map {node: slot id}.
+
+        Returns:
+            [dict] -- A map {node: (room, (hour, minute))}.
+        """
+        return {node: self.slots[slot_id] for node, slot_id in assignments.items()}
+
+
 def hours_for_prof(prof_info, professor_name):
     """Assigns a professor time for their class based on their preferences
 
@@ -124,7 +249,8 @@ def add_nodes(
         rooms_chosen,
         full_prof_assignment,
         prof_info,
-        csp):
+        csp,
+        registry=None):
     """Adds nodes (course, professor) and its list of domains (rooms, hours) to csp.
 
     Arguments:
@@ -134,18 +260,26 @@ def add_nodes(
         full_prof_assignment {dict} -- A dictionary mapping course to professor.
         prof_info {dict} -- A dictionary mapping professor to his class info (courses taught, start_time, end_time).
         csp {cspsolver.CSP} -- A instance of the Constraint Satisfaction Problem class.
+
+    Keyword Arguments:
+        registry {SlotRegistry} -- Intern the domains as arrays of slot ids
+                                   rather than lists of (room, hours) (default: {None}).
     """
     for course in courses:
         rooms_for_course = rooms_chosen[course] if course in rooms_chosen else rooms
         professor = full_prof_assignment[course]
-        if professor:
+        if not professor:
+            continue
+        if registry is not None:
+            domain = registry.domain(rooms_for_course, hours_for_prof(prof_info, professor))
+        else:
             domain = [
                 (room,
                  hour) for room in rooms_for_course for hour in hours_for_prof(
                     prof_info,
                     professor)]
-            node_name = (course, professor)
-            csp.add_node(node_name, domain)
+        node_name = (course, professor)
+        csp.add_node(node_name, domain)
 
 
 def add_unary_constraint(csp, room_has_capacity):
@@ -156,7 +290,7 @@ def add_unary_constraint(csp, room_has_capacity):
         room_has_capacity {<class 'function'>} -- An unary constraint function.
     """
     for node in csp.nodes:
-        csp.add_unary_constraint(node, room_has_capacity)
+        csp.add_unary_constraint(node, room_has_capacity, kind='room_has_capacity')
 
 
 def compute_course_start_end(
@@ -181,42 +315,234 @@ def compute_course_start_end(
     return (course_start_time, course_end_time)
 
 
-def add_binary_constraint(csp, course_mins_map, no_class_overlap, no_time_clash):
-    """Adds binary constraints to list of nodes.
+def course_slots(start_hour, start_mins, course_mins_map, course_name):
+    """Computes the 10-minute slots a course holds its room for.
+
+    Arguments:
+        start_hour {int} -- Start hour of the course.
+        start_mins {int} -- Start minute of the course.
+        course_mins_map {dict} -- A dictionary mapping course name to duration in minutes.
+        course_name {str} -- Course name.
+
+    Returns:
+        [tuple] -- (first slot, slot after the last), counted like compute_course_start_end.
     """
-    for index, node_n in enumerate(csp.nodes):
-        (course_n, prof_n) = node_n
-        for j in range(index, len(csp.nodes)):
-            node_m = csp.nodes[j]
-            (course_m, prof_m) = node_m
-            if prof_n == prof_m:
-                if course_n == course_m:
-                    continue
-                csp.add_binary_constraint(node_n, node_m, no_class_overlap)
-            csp.add_binary_constraint(node_n, node_m, no_time_clash)
-
-
-def assigner(user_data):
-    """Takes in data provided by the user and creates class schedule.
+    start = start_hour * 6 + start_mins // 10
+    return (start, start + int(math.ceil(course_mins_map[course_name] / 10)))
+
+
+def overflow_sections(csp, assignments):
+    """Picks the sections to move off a failed day: the conflicted node with
+    the most conflicts is dropped from the assignment and from csp until the
+    rest of the assignment is consistent.
+
+    Arguments:
+        csp {cspsolver.CSP} -- The day's constraint satisfaction problem; the
+                               overflow nodes are removed from it.
+        assignments {dict} -- The least conflicted assignment found for the day.
+
+    Returns:
+        [list] -- The overflow nodes (course, professor).
+    """
+    min_conflict = minConflicts(csp)
+    assignments = dict(assignments)
+    overflow = []
+    while True:
+        conflicted = min_conflict.conflicted(assignments)
+        if not conflicted:
+            return overflow
+        node = max(sorted(conflicted), key=lambda node: len(
+            min_conflict.conflicted_neighbors(assignments, node)[0]))
+        overflow.append(node)
+        del assignments[node]
+        csp.remove_node(node)
+
+
+def clash_candidates(csp, course_mins_map, registry=None):
+    """Finds the pairs of nodes that could hold the same room at the same time:
+    nodes are indexed by candidate room, and within a room a sweep over the
+    time windows their domains span in it pairs up the overlapping ones.
+
+    Arguments:
+        csp {cspsolver.CSP} -- A instance of the Constraint Satisfaction Problem class.
+        course_mins_map {dict} -- A dictionary mapping course name to duration.
+
+    Keyword Arguments:
+        registry {SlotRegistry} -- Decodes domains of slot ids (default: {None}).
+
+    Returns:
+        [set] -- A set of (index, index) pairs into csp.nodes, lower index first.
+    """
+    nodes_by_room = collections.defaultdict(list)
+    for index, node in enumerate(csp.nodes):
+        windows = {}
+        domain = csp.node_domains[node]
+        if registry is not None:
+            domain = map(registry.slot, domain)
+        for room, (hours, mins) in domain:
+            course_start, course_end = course_slots(hours, mins, course_mins_map, node[0])
+            start, end = windows.get(room, (course_start, course_end))
+            windows[room] = (min(start, course_start), max(end, course_end))
+        for room, (start, end) in windows.items():
+            nodes_by_room[room].append((start, end, index))
+    pairs = set()
+    for windows in nodes_by_room.values():
+        windows.sort()
+        active = []
+        for start, end, index in windows:
+            active = [(other_end, other) for other_end, other in active if other_end > start]
+            for _, other in active:
+                pairs.add((min(index, other), max(index, other)))
+            active.append((end, index))
+    return pairs
+
+
+def add_binary_constraint(csp, course_mins_map, no_class_overlap, no_time_clash=None,
+                          registry=None):
+    """Adds binary constraints to list of nodes. Edges are only created between
+    the classes of a professor and, for no_time_clash, between classes that
+    share a candidate room and time window (see clash_candidates).
+
+    Arguments:
+        csp {cspsolver.CSP} -- A instance of the Constraint Satisfaction Problem class.
+        course_mins_map {dict} -- A dictionary mapping course name to duration.
+        no_class_overlap {<class 'function'>} -- Binary constraint between the
+                                                 classes of a professor.
+
+    Keyword Arguments:
+        no_time_clash {<class 'function'>} -- Binary constraint between every pair of
+                                              classes that can clash; None when room
+                                              clashes are checked by add_room_occupancy
+                                              (default: {None}).
+        registry {SlotRegistry} -- Decodes domains of slot ids (default: {None}).
+    """
+    nodes_by_prof = collections.defaultdict(list)
+    for index, (course, prof) in enumerate(csp.nodes):
+        nodes_by_prof[prof].append(index)
+    same_prof = {(index, other) for indices in nodes_by_prof.values()
+                 for index in indices for other in indices if index < other}
+    clashes = set() if no_time_clash is None else clash_candidates(csp, course_mins_map, registry)
+    for index, other in sorted(same_prof | clashes):
+        node_n = csp.nodes[index]
+        node_m = csp.nodes[other]
+        if (index, other) in same_prof:
+            csp.add_binary_constraint(node_n, node_m, no_class_overlap, kind='no_class_overlap')
+        if (index, other) in clashes:
+            csp.add_binary_constraint(node_n, node_m, no_time_clash, kind='no_time_clash')
+
+
+def add_room_occupancy(csp, course_mins_map, registry=None):
+    """Adds a room x 10-minute-slot occupancy constraint in place of pairwise
+    no_time_clash tables: no two classes may hold a room at the same time.
+
+    Arguments:
+        csp {cspsolver.CSP} -- A instance of the Constraint Satisfaction Problem class.
+        course_mins_map {dict} -- A dictionary mapping course name to duration.
+
+    Keyword Arguments:
+        registry {SlotRegistry} -- Decodes domains of slot ids (default: {None}).
+    """
+    slots = None if registry is None else registry.slots
+
+    def occupies(node, val):
+        room, (hours, mins) = val if slots is None else slots[val]
+        start_time, end_time = course_slots(hours, mins, course_mins_map, node[0])
+        return (room, start_time, end_time)
+
+    csp.add_resource_constraint(occupies)
+
+
+def data_fingerprint(user_data):
+    """Hashes the parts of the user's data the constraint tables depend on.
 
     Arguments:
         user_data {tuple} -- A tuple of lists containing the user's data information.
 
     Returns:
-        [dict] -- Returns a map {day: a list of classes taught by professors with room numbers and times}.
+        [str] -- A hex digest of room capacities, enrollments and course durations.
+    """
+    professors, prof_info, rooms, room_capacities, courses, \
+        course_no_students, course_mins_map, course_days_weekly = user_data
+    data = (sorted(room_capacities.items()), sorted(course_no_students.items()),
+            sorted(course_mins_map.items()))
+    return hashlib.sha1(repr(data).encode()).hexdigest()
+
+
+def load_table_cache(path, fingerprint):
+    """Loads the slot registry and table cache saved by save_table_cache. A
+    missing or stale file (other data fingerprint) starts empty; so does a
+    file that cannot be loaded, which is removed.
+
+    Arguments:
+        path {str} -- The cache file.
+        fingerprint {str} -- data_fingerprint of the user's data.
+
+    Returns:
+        [tuple] -- (SlotRegistry, cspsolver.TableCache)
+    """
+    try:
+        with open(path, 'rb') as cache_file:
+            saved = pickle.load(cache_file)
+        if saved.get('fingerprint') != fingerprint:
+            return SlotRegistry(), TableCache()
+        return SlotRegistry(saved['slots']), TableCache(saved['tables'])
+    except FileNotFoundError:
+        return SlotRegistry(), TableCache()
+    except Exception:
+        # corrupt, or pickled by code that has since changed: rebuild it
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return SlotRegistry(), TableCache()
+
+
+def save_table_cache(path, fingerprint, registry, table_cache):
+    """Saves a slot registry and the tables cached over its slot ids.
+
+    Arguments:
+        path {str} -- The cache file, replaced atomically.
+        fingerprint {str} -- data_fingerprint of the user's data.
+        registry {SlotRegistry} -- The registry the tables' slot ids refer to.
+        table_cache {cspsolver.TableCache} -- The tables to save.
+    """
+    saved = {'fingerprint': fingerprint, 'slots': registry.slots,
+             'tables': table_cache.tables}
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as cache_file:
+        pickle.dump(saved, cache_file, pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
+
+
+def constraint_functions(room_capacities, course_no_students, course_mins_map, registry):
+    """Makes the constraint functions of the days' CSPs. They are closures
+    over the user's data, so worker processes make their own from the
+    picklable data rather than receive them.
+
+    Arguments:
+        room_capacities {dict} -- A dictionary mapping room to its capacity.
+        course_no_students {dict} -- A dictionary mapping course to its enrollment.
+        course_mins_map {dict} -- A dictionary mapping course name to duration.
+        registry {SlotRegistry} -- Decodes the slot ids of the domains.
+
+    The binary functions carry a matrix attribute, their vectorised form,
+    which compiledcsp.CompiledCSP evaluates a whole edge at a time with.
+
+    Returns:
+        [tuple] -- (room_has_capacity, no_class_overlap, no_time_clash)
     """
     def room_has_capacity(val, course):
         """Unary constraints function: checks to see if given room has
         room for all students in course.
 
         Arguments:
-            val {tuple} -- Contains values for room and time of class.
+            val {int} -- Slot id of the room and time of class.
             Course {string} -- Name of course.
 
         Returns:
             [bool] -- Whether or not the room has capacity for all students in course.
         """
-        room, hour_and_min = val
+        room, hour_and_min = registry.slot(val)
         no_students = course_no_students[course]
         return room_capacities[room] >= no_students
 
@@ -224,16 +550,16 @@ def assigner(user_data):
         """Binary constraint function: checks to see if there is overlap in times between two courses.
 
         Arguments:
-            node1 {tuple} -- (location, (hour, minute)) of the first class.
-            node2 {tuple} -- (location, (hour, minute)) of the second class.
+            node1 {int} -- Slot id of the (location, (hour, minute)) of the first class.
+            node2 {int} -- Slot id of the (location, (hour, minute)) of the second class.
             course1 {string} -- Name of first course to check for overlap.
             course2 {string} -- Name of second course to check for overlap.
 
         Returns:
             [int] -- 1 if no overlap exists between two classes, 0 if there is overlap.
         """
-        _, (hours1, mins1) = node1
-        _, (hours2, mins2) = node2
+        _, (hours1, mins1) = registry.slot(node1)
+        _, (hours2, mins2) = registry.slot(node2)
         course_start1, course_end1 = compute_course_start_end(
             hours1, mins1, course_mins_map, course1)
         course_start2, course_end2 = compute_course_start_end(
@@ -249,59 +575,436 @@ def assigner(user_data):
         """Binary constraint function: checks to see if there is a time clash for a course given two rooms and times.
 
         Arguments:
-            val1 {tuple} -- Contains first set of room and time.
-            val2 {tuple} -- Contains second set of room and time.
+            val1 {int} -- Slot id of the first set of room and time.
+            val2 {int} -- Slot id of the second set of room and time.
             course1 {string} -- Name of course to check for time clash.
-            dummy {string} -- Dummy parameter. Added to help with refactor.
+            dummy {string} -- Name of the second course.
 
         Returns:
             [int] -- 1 if no time clash between rooms and times for course, 0 if there is time clash.
         """
-        (room1, time1) = val1
-        (room2, time2) = val2
+        (room1, time1) = registry.slot(val1)
+        (room2, time2) = registry.slot(val2)
         if room1 != room2:
             return 1
         hours1, mins1 = time1
         hours2, mins2 = time2
-        start_time1, end_time1 = compute_course_start_end(
-            hours1, mins1, course_mins_map, course1)
-        start_time2, _ = compute_course_start_end(
-            hours2, mins2, course_mins_map, dummy)
-        if start_time1 <= start_time2 < end_time1:
+        start_time1, end_time1 = course_slots(hours1, mins1, course_mins_map, course1)
+        start_time2, end_time2 = course_slots(hours2, mins2, course_mins_map, dummy)
+        # the same overlap rule as the room occupancy grid
+        if start_time1 < end_time2 and start_time2 < end_time1:
             return 0
         return 1
 
+    room_codes = {}
+
+    def slot_arrays(vals):
+        """Returns the room codes and first 10-minute slots of slot ids as arrays."""
+        # imported here so that only the compiled engine needs numpy
+        import numpy as np
+
+        slots = [registry.slot(val) for val in vals]
+        rooms = [room_codes.setdefault(room, len(room_codes)) for room, _ in slots]
+        starts = [hours * 6 + mins // 10 for _, (hours, mins) in slots]
+        return np.array(rooms, dtype=np.int32), np.array(starts, dtype=np.int32)
+
+    def no_class_overlap_matrix(vals1, vals2, course1, course2):
+        """no_class_overlap of every pair of vals1 and vals2, as a |vals1| x |vals2| array."""
+        import numpy as np
+
+        # start1 - start2, compared with the durations instead of the end times
+        diff = np.subtract.outer(slot_arrays(vals1)[1], slot_arrays(vals2)[1])
+        mins1, mins2 = course_mins_map[course1], course_mins_map[course2]
+        weights = np.ones(diff.shape, dtype=np.int8)
+        weights[(diff == mins2) | (diff == -mins1)] = 2
+        weights[(diff > mins2) | (diff < -mins1)] = 0
+        return weights
+
+    def no_time_clash_matrix(vals1, vals2, course1, course2):
+        """no_time_clash of every pair of vals1 and vals2, as a |vals1| x |vals2| array."""
+        import numpy as np
+
+        room1, start1 = slot_arrays(vals1)
+        room2, start2 = slot_arrays(vals2)
+        diff = np.subtract.outer(start1, start2)
+        span1 = int(math.ceil(course_mins_map[course1] / 10))
+        span2 = int(math.ceil(course_mins_map[course2] / 10))
+        clash = (np.equal.outer(room1, room2) & (diff < span2)) & (diff > -span1)
+        return (~clash).astype(np.int8)
+
+    no_class_overlap.matrix = no_class_overlap_matrix
+    no_time_clash.matrix = no_time_clash_matrix
+    return room_has_capacity, no_class_overlap, no_time_clash
+
+
+class DaySolver(object):
+    def __init__(self, user_data, full_prof_assignment, registry, table_cache,
+                 engine=INCREMENTAL, memory_budget=TABLE_MEMORY_BUDGET, starts=1,
+                 processes=None, time_budget=None, partial=False, room_grid=True,
+                 exact_nodes=EXACT_SEARCH_MAX_NODES, tenure=None, anneal_budget=None):
+        """Builds and solves the CSP of one day. It holds only data, so it can
+        be pickled to the worker processes that solve weekdays in parallel.
+
+        Arguments:
+            user_data {tuple} -- A tuple of lists containing the user's data information.
+            full_prof_assignment {dict} -- A dictionary mapping course to professor.
+            registry {SlotRegistry} -- Interns the domains' rooms and times.
+            table_cache {cspsolver.TableCache} -- Shares constraint tables between days.
+
+        Keyword Arguments:
+            See assigner.
+        """
+        self.user_data = user_data
+        self.full_prof_assignment = full_prof_assignment
+        self.registry = registry
+        self.table_cache = table_cache
+        self.engine = engine
+        self.memory_budget = memory_budget
+        self.starts = starts
+        self.processes = processes
+        self.time_budget = time_budget
+        self.partial = partial
+        self.room_grid = room_grid
+        self.exact_nodes = exact_nodes
+        self.tenure = tenure
+        self.anneal_budget = anneal_budget
+
+    def build(self, day_courses, timings=None):
+        """Builds the CSP of one day's courses.
+
+        Arguments:
+            day_courses {list} -- The courses held that day.
+
+        Keyword Arguments:
+            timings {dict} -- Seconds spent adding the nodes, the unary and the
+                              binary constraints are added to its ADD_NODES,
+                              ADD_UNARY and ADD_BINARY entries (default: {None}).
+
+        Returns:
+            [cspsolver.CSP] -- The day's constraint satisfaction problem.
+        """
+        professors, prof_info, rooms, room_capacities, courses, \
+            course_no_students, course_mins_map, course_days_weekly = self.user_data
+        room_has_capacity, no_class_overlap, no_time_clash = constraint_functions(
+            room_capacities, course_no_students, course_mins_map, self.registry)
+        # the compiled engine builds its arrays from the constraint functions'
+        # matrix forms, so no eager tables are built for it
+        memory_budget = 0 if self.engine == COMPILED else self.memory_budget
+        csp = CSP(memory_budget, self.table_cache)
+        start = time.perf_counter()
+        add_nodes(
+            day_courses,
+            rooms,
+            {},
+            self.full_prof_assignment,
+            prof_info,
+            csp,
+            self.registry)
+        nodes_end = time.perf_counter()
+        add_unary_constraint(csp, room_has_capacity)
+        unary_end = time.perf_counter()
+        if self.room_grid:
+            add_binary_constraint(csp, course_mins_map, no_class_overlap,
+                                  registry=self.registry)
+            add_room_occupancy(csp, course_mins_map, self.registry)
+        else:
+            add_binary_constraint(csp, course_mins_map, no_class_overlap, no_time_clash,
+                                  self.registry)
+        if timings is not None:
+            timings[ADD_NODES] += nodes_end - start
+            timings[ADD_UNARY] += unary_end - nodes_end
+            timings[ADD_BINARY] += time.perf_counter() - unary_end
+        return csp
+
+    def search(self, csp, budget_scale, initial, day_courses=None):
+        """Searches one day's CSP.
+
+        Arguments:
+            csp {cspsolver.CSP} -- The day's constraint satisfaction problem.
+            budget_scale {int} -- Multiplies the day's iteration or time budget.
+            initial {dict} -- Warm start assignment, None to start at random.
+
+        Keyword Arguments:
+            day_courses {list} -- The courses csp was built from, so that parallel
+                                  starts rebuild it in their workers instead of
+                                  relying on fork (default: {None}).
+
+        Returns:
+            [tuple] -- (solution, attempt): the consistent assignment or None, and
+                       the least conflicted assignment reached.
+        """
+        try:
+            propagate(csp)
+            feasible = True
+        except InfeasibleError:
+            feasible = False
+        if not feasible and not self.partial:
+            return None, minConflicts(csp).initial_var_assignment(initial, greedy=True)
+        solution, attempt = self.local_search(csp, budget_scale, initial, day_courses)
+        if solution is None and feasible and len(csp.nodes) <= self.exact_nodes:
+            # a small day local search fails on is either solved or proved
+            # infeasible by complete search
+            exact_solution = backtrackingSearch(csp).solve(EXACT_SEARCH_NODE_LIMIT,
+                                                           self.time_budget)
+            if exact_solution is not None:
+                return exact_solution, exact_solution
+        return solution, attempt
+
+    def local_search(self, csp, budget_scale, initial, day_courses=None):
+        """Searches one day's CSP with minConflicts, tabuSearch or parallel starts.
+
+        Arguments:
+            See search.
+
+        Keyword Arguments:
+            See search.
+
+        Returns:
+            [tuple] -- See search.
+        """
+        time_budget = self.time_budget * budget_scale if self.time_budget else None
+        max_iters = None if time_budget else iteration_budget(csp) * budget_scale
+        if self.starts > 1:
+            # the constraint functions are closures, rebuild them in the workers
+            build = None if day_courses is None else functools.partial(self.build, day_courses)
+            day_solution = parallel_solve(csp, self.starts, max_iters, self.engine,
+                                          self.processes, tenure=self.tenure,
+                                          time_budget=time_budget, build=build)
+            if day_solution is None:
+                return None, minConflicts(csp).initial_var_assignment(initial, greedy=True)
+            return day_solution, day_solution
+        if self.tenure is None:
+            min_conflict = minConflicts(csp, self.engine)
+        else:
+            min_conflict = tabuSearch(csp, self.engine, tenure=self.tenure)
+        result = min_conflict.search(max_iters, time_budget, initial=initial)
+        return (result.assignments if result.conflicts == 0 else None), result.assignments
+
+    def solve(self, day_courses, budget_scale=1, initial=None, timings=None):
+        """Builds and solves one day.
+
+        Arguments:
+            day_courses {list} -- The courses held that day.
+
+        Keyword Arguments:
+            budget_scale {int} -- Multiplies the day's iteration or time budget
+                                  (default: {1}).
+            initial {dict} -- Warm start assignment of slot ids (default: {None}).
+            timings {dict} -- Seconds spent in each of PHASES are added to it,
+                              see build; SOLVE covers propagation, search and
+                              annealing (default: {None}).
+
+        Returns:
+            [tuple] -- (solution, attempt, overflow): the consistent assignment or
+                       None, the least conflicted assignment reached, and the
+                       overflow_sections of a failed day.
+        """
+        csp = self.build(day_courses, timings)
+        start = time.perf_counter()
+        solution, attempt = self.search(csp, budget_scale, initial, day_courses)
+        if solution is None:
+            overflow = overflow_sections(csp, attempt)
+        else:
+            overflow = []
+            if self.anneal_budget:
+                solution = simulatedAnnealing(csp).anneal(
+                    solution, self.anneal_budget).assignments
+        if timings is not None:
+            timings[SOLVE] += time.perf_counter() - start
+        return solution, attempt, overflow
+
+
+class AssignerStats(object):
+    def __init__(self):
+        """Where assigner spent its time: the seconds each weekday spent in
+        each of PHASES, summed over its attempts, the number of attempts at
+        each day and the number of retry rounds.
+        """
+        self.timings = {day: dict.fromkeys(PHASES, 0.0) for day in WEEKDAYS}
+        self.attempts = dict.fromkeys(WEEKDAYS, 0)
+        self.retries = 0
+
+    def add(self, day, timings):
+        """Records one attempt at a day.
+
+        Arguments:
+            day {str} -- The weekday.
+            timings {dict} -- Seconds the attempt spent in each of PHASES.
+        """
+        for phase, seconds in timings.items():
+            self.timings[day][phase] += seconds
+        self.attempts[day] += 1
+
+    def day_retries(self, day):
+        """Returns the number of times a day was solved again."""
+        return max(self.attempts[day] - 1, 0)
+
+    def total(self, phase):
+        """Returns the seconds all days spent in a phase."""
+        return sum(timings[phase] for timings in self.timings.values())
+
+
+# State of the worker processes that solve weekdays in parallel
+_day_solver = None
+
+
+def _init_day_worker(day_solver):
+    global _day_solver
+    _day_solver = day_solver
+
+
+def _solve_weekday(day_courses, budget_scale, initial):
+    registry = _day_solver.registry
+    if initial is not None:
+        initial = registry.encode(initial)
+    timings = dict.fromkeys(PHASES, 0.0)
+    solution, attempt, overflow = _day_solver.solve(day_courses, budget_scale, initial,
+                                                    timings)
+    if solution is not None:
+        solution = registry.decode(solution)
+    return solution, registry.decode(attempt), overflow, timings
+
+
+def assigner(user_data, engine=INCREMENTAL, memory_budget=TABLE_MEMORY_BUDGET, starts=1,
+             processes=None, time_budget=None, partial=False, room_grid=True,
+             exact_nodes=EXACT_SEARCH_MAX_NODES, tenure=None, anneal_budget=None,
+             table_cache_path=None, parallel_days=False, day_processes=None, stats=None):
+    """Takes in data provided by the user and creates class schedule.
+
+    Failed days are retried up to MAX_RETRIES times: their overflow sections
+    (see overflow_sections) move to other days, days already solved are kept
+    or repaired from their solution, and only the failing days get a growing
+    budget.
+
+    Arguments:
+        user_data {tuple} -- A tuple of lists containing the user's data information.
+
+    Keyword Arguments:
+        engine {str} -- The minConflicts engine used for each day (default: {INCREMENTAL}).
+        memory_budget {int} -- Memory budget of each day's CSP, see cspsolver.CSP
+                               (default: {TABLE_MEMORY_BUDGET}).
+        starts {int} -- Independent searches per day; more than one runs them
+                        with cspsolver.parallel_solve (default: {1}).
+        processes {int} -- Pool size for parallel starts, None for one per CPU
+                           (default: {None}).
+        time_budget {float} -- Seconds each attempt at a day may search, instead of
+                               an iteration budget sized from the day's CSP
+                               (default: {None}).
+        partial {bool} -- For days never solved, return the least conflicted
+                          assignment found instead of None (default: {False}).
+        room_grid {bool} -- Check room clashes on an occupancy grid rather than
+                            with pairwise no_time_clash tables (default: {True}).
+        exact_nodes {int} -- Days with at most this many sections that local search
+                             fails on are searched again by backtracking, which
+                             also proves a day infeasible
+                             (default: {EXACT_SEARCH_MAX_NODES}).
+        tenure {int} -- Search each day with cspsolver.tabuSearch using this tabu
+                        tenure instead of minConflicts (default: {None}).
+        anneal_budget {float} -- Seconds of cspsolver.simulatedAnnealing spent
+                                 improving the soft constraints of each solved day
+                                 (default: {None}).
+        table_cache_path {str} -- File the constraint tables are loaded from and
+                                  saved to, so they persist between runs; without
+                                  it they are only shared by the days and retries
+                                  of this call (default: {None}).
+        parallel_days {bool} -- Build and solve the weekdays of each round in
+                                worker processes; tables they build are not
+                                added to the saved table cache (default: {False}).
+        day_processes {int} -- Pool size for parallel_days, None for one per CPU
+                               (default: {None}).
+        stats {AssignerStats} -- Filled in with the time each day spent in each
+                                 phase and the retries (default: {None}).
+
+    Returns:
+        [dict] -- Returns a map {day: a list of classes taught by professors with room numbers and times}.
+    """
     professors, prof_info, rooms, room_capacities, courses, \
         course_no_students, course_mins_map, course_days_weekly = user_data
-
     full_prof_assignment = profs_for_courses(courses, professors, prof_info)
-    rooms_chosen = {} 
-    solution = collections.defaultdict(lambda: None)
+    if table_cache_path is not None:
+        fingerprint = data_fingerprint(user_data)
+        registry, table_cache = load_table_cache(table_cache_path, fingerprint)
+    else:
+        registry, table_cache = SlotRegistry(), TableCache()
+    day_solver = DaySolver(user_data, full_prof_assignment, registry, table_cache, engine,
+                           memory_budget, starts, processes, time_budget, partial, room_grid,
+                           exact_nodes, tenure, anneal_budget)
+    executor = None
+    if parallel_days:
+        executor = ProcessPoolExecutor(max_workers=min(day_processes or len(WEEKDAYS),
+                                                       len(WEEKDAYS)),
+                                       initializer=_init_day_worker, initargs=(day_solver,))
+    daily_courses = maps_day_to_class(course_days_weekly, courses)
+    day_solutions = {}
+    attempts = {}
+    # days to solve this round, each with its warm start assignment
+    pending = {day: None for day in WEEKDAYS}
+    failing = set()
     retry = 0
-    solved = True
-    while retry < 3:
-        daily_courses = maps_day_to_class(course_days_weekly, courses)
-        max_iters = 100 * (retry + 1)
-        for day in WEEKDAYS:
-            csp = CSP()
-            courses = daily_courses[day]
-            add_nodes(
-                courses,
-                rooms,
-                rooms_chosen,
-                full_prof_assignment,
-                prof_info,
-                csp)
-            add_unary_constraint(csp, room_has_capacity)
-            add_binary_constraint(csp, course_mins_map, no_class_overlap, no_time_clash)
-            min_conflict = minConflicts(csp)
-            day_solution = min_conflict.solve(max_iters)
-            if not day_solution:
-                retry += 1
-                solved = False
+    try:
+        while True:
+            days = [day for day in WEEKDAYS if day in pending]
+            # only the days that keep failing get a growing budget
+            scales = {day: retry + 1 if day in failing else 1 for day in days}
+            if executor is not None:
+                futures = {day: executor.submit(
+                    _solve_weekday, daily_courses[day], scales[day],
+                    None if pending[day] is None else registry.decode(pending[day]))
+                    for day in days}
+                results = {}
+                for day, future in futures.items():
+                    solution, attempt, overflow, timings = future.result()
+                    if solution is not None:
+                        solution = registry.encode(solution)
+                    results[day] = solution, registry.encode(attempt), overflow
+                    if stats is not None:
+                        stats.add(day, timings)
             else:
-                solution[day] = day_solution
-        if solved: 
-            break 
-        solved = True
+                results = {}
+                for day in days:
+                    timings = None if stats is None else dict.fromkeys(PHASES, 0.0)
+                    results[day] = day_solver.solve(daily_courses[day], scales[day],
+                                                    pending[day], timings)
+                    if stats is not None:
+                        stats.add(day, timings)
+            failed = {}
+            for day in days:
+                day_solution, attempts[day], overflow = results[day]
+                if day_solution is None:
+                    failed[day] = overflow
+                    day_solutions.pop(day, None)
+                else:
+                    day_solutions[day] = day_solution
+            if not failed or retry == MAX_RETRIES:
+                break
+            retry += 1
+            if stats is not None:
+                stats.retries = retry
+            failing.update(failed)
+            pending = {}
+            for day, overflow in failed.items():
+                pending[day] = {node: val for node, val in attempts[day].items()
+                                if node not in overflow}
+                for course, _ in overflow:
+                    targets = [target for target in pref_handler(day)
+                               if target not in failed and course not in daily_courses[target]]
+                    if not targets:
+                        continue
+                    target = min(targets, key=lambda target: len(daily_courses[target]))
+                    daily_courses[day].remove(course)
+                    daily_courses[target].append(course)
+                    if target not in pending:
+                        pending[target] = day_solutions.get(target, attempts[target])
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    solution = collections.defaultdict(lambda: None)
+    for day, day_solution in day_solutions.items():
+        solution[day] = registry.decode(day_solution)
+    if table_cache_path is not None:
+        save_table_cache(table_cache_path, fingerprint, registry, table_cache)
+    if partial:
+        for day in WEEKDAYS:
+            if solution[day] is None:
+                solution[day] = registry.decode(attempts[day])
     return solution
@@ -0,0 +1,149 @@
+"""
+This is the test suite for compiledcsp.py.
+"""
+import os, sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from unittest import TestCase, main
+import numpy as np
+from cspsolver import CSP, minConflicts, COMPILED
+from compiledcsp import CompiledCSP
+
+
+def not_equal(val1, val2, course1, course2):
+    return 0 if val1 == val2 else 1
+
+
+def prefer_apart(val1, val2, course1, course2):
+    return 2 if abs(val1 - val2) > 1 else 1
+
+
+def prefer_apart_matrix(vals1, vals2, course1, course2):
+    return np.where(np.abs(np.subtract.outer(vals1, vals2)) > 1, 2, 1)
+
+
+prefer_apart.matrix = prefer_apart_matrix
+
+
+def create_csp():
+    csp = CSP()
+    csp.add_node("class1", [1, 2, 3])
+    csp.add_node("class2", [1, 2])
+    csp.add_node("class3", [3, 1, 2])
+    csp.add_unary_constraint("class3", lambda val, course: val != 3)
+    csp.add_binary_constraint("class1", "class2", not_equal)
+    csp.add_binary_constraint("class1", "class2", prefer_apart)
+    csp.add_binary_constraint("class2", "class3", not_equal)
+    return csp
+
+
+def create_room_csp():
+    csp = CSP()
+    domain = [(room, start) for room in ("648", "649") for start in range(3)]
+    for node in ("class1", "class2", "class3"):
+        csp.add_node(node, list(domain))
+    csp.add_binary_constraint("class1", "class2", lambda val1, val2, course1, course2:
+                              0 if val1[1] == val2[1] else 1)
+    csp.add_resource_constraint(lambda node, val: (val[0], val[1], val[1] + 2))
+    return csp
+
+
+class CompiledCspTestCase(TestCase):
+    def setUp(self):
+        self.csp = create_csp()
+        self.compiled = CompiledCSP(self.csp)
+        self.minC = minConflicts(self.csp)
+
+    def test_tables(self):
+        table = self.compiled.table(0, 1)
+        self.assertEqual(table.tolist(), [[0, 1], [1, 0], [2, 1]])
+        self.assertEqual(self.compiled.table(1, 0).tolist(), table.T.tolist())
+        self.assertRaises(KeyError, lambda: self.compiled.table(0, 2))
+        self.assertEqual(self.compiled.unary[2].tolist(), [0, 1, 1])
+
+    def test_lazy_tables(self):
+        # the same constraints stored as LazyTables compile to the same weights,
+        # prefer_apart through its matrix form and not_equal entry by entry
+        csp = CSP(memory_budget=0)
+        for node in self.csp.nodes:
+            csp.add_node(node, self.csp.node_domains[node])
+        csp.add_unary_constraint("class3", lambda val, course: val != 3)
+        csp.add_binary_constraint("class1", "class2", not_equal)
+        csp.add_binary_constraint("class1", "class2", prefer_apart)
+        csp.add_binary_constraint("class2", "class3", not_equal)
+        compiled = CompiledCSP(csp)
+        self.assertEqual(compiled.weights.tolist(), self.compiled.weights.tolist())
+        # an eager table wrapped in a LazyTable with a matrix form factor
+        csp = create_csp()
+        csp.add_binary_constraint("class3", "class2", prefer_apart, lazy=True)
+        eager = create_csp()
+        eager.add_binary_constraint("class3", "class2", prefer_apart)
+        self.assertEqual(CompiledCSP(csp).weights.tolist(), CompiledCSP(eager).weights.tolist())
+
+    def test_encode_decode(self):
+        assignments = {"class1": 3, "class2": 1, "class3": 2}
+        assignment = self.compiled.encode(assignments)
+        self.assertEqual(assignment.tolist(), [2, 0, 2])
+        self.assertEqual(self.compiled.decode(assignment), assignments)
+
+    def test_conflicted_matches_csp(self):
+        for assignments in ({"class1": 1, "class2": 1, "class3": 3},
+                            {"class1": 2, "class2": 1, "class3": 2},
+                            {"class1": 3, "class2": 2, "class3": 2}):
+            assignment = self.compiled.encode(assignments)
+            conflicted = {self.compiled.nodes[i] for i in self.compiled.conflicted(assignment)}
+            self.assertEqual(conflicted, self.minC.conflicted(assignments))
+            for i, node in enumerate(self.compiled.nodes):
+                for k, val in enumerate(self.compiled.values[i]):
+                    self.assertEqual(self.compiled.score_value(assignment, i, k),
+                                     self.minC.score_value(assignments, node, val))
+
+    def test_score_values(self):
+        for assignments in ({"class1": 1, "class2": 1, "class3": 3},
+                            {"class1": 3, "class2": 2, "class3": 1}):
+            assignment = self.compiled.encode(assignments)
+            for i in range(len(self.compiled.nodes)):
+                conflicts, weights = self.compiled.score_values(assignment, i)
+                expected = [self.compiled.score_value(assignment, i, k)
+                            for k in range(self.compiled.domain_sizes[i])]
+                self.assertEqual(list(zip(conflicts.tolist(), weights.tolist())), expected)
+
+    def test_room_occupancy(self):
+        csp = create_room_csp()
+        compiled = CompiledCSP(csp)
+        minC = minConflicts(csp)
+        self.assertEqual(compiled.grid_shapes, [(2, 4)])
+        for assignments in ({"class1": ("648", 0), "class2": ("648", 1), "class3": ("649", 2)},
+                            {"class1": ("648", 0), "class2": ("649", 0), "class3": ("648", 2)},
+                            {"class1": ("649", 1), "class2": ("649", 2), "class3": ("649", 0)},
+                            {"class1": ("648", 1), "class2": ("648", 1), "class3": ("648", 1)}):
+            assignment = compiled.encode(assignments)
+            grids = compiled.occupancy(assignment)
+            conflicted = {compiled.nodes[i] for i in compiled.conflicted(assignment, grids)}
+            self.assertEqual(conflicted, minC.conflicted(assignments))
+            for i in range(3):
+                conflicts, weights = compiled.score_values(assignment, i)
+                expected = [compiled.score_value(assignment, i, k)
+                            for k in range(compiled.domain_sizes[i])]
+                self.assertEqual(list(zip(conflicts.tolist(), weights.tolist())), expected)
+                # the same clash rule as the occupancy grids of the other engines
+                node = compiled.nodes[i]
+                self.assertEqual(expected, [minC.score_value(assignments, node, val)
+                                            for val in compiled.values[i]])
+            self.assertEqual(grids[0].tolist(), compiled.occupancy(assignment)[0].tolist())
+        result = minConflicts(csp, COMPILED, rng=2).solve(100)
+        self.assertEqual(minC.conflicted(result), set())
+
+    def test_nbytes(self):
+        self.assertEqual(self.compiled.weights.dtype, np.float32)
+        self.assertEqual(self.compiled.weights.size, 2 * (3 * 2) + 2 * (2 * 3))
+        self.assertTrue(self.compiled.nbytes > self.compiled.weights.nbytes)
+
+    def test_solve_compiled(self):
+        result = minConflicts(self.csp, COMPILED).solve(100)
+        self.assertEqual(self.minC.conflicted(result), set())
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,16 @@
 """
 This is the test suite for cspsolver.py.
 """
-import os, sys
+import math, multiprocessing, os, sys, time
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from unittest import TestCase, main, skip
-from cspsolver import CSP, minConflicts
+from unittest import TestCase, main, mock, skip
+from cspsolver import CSP, TableCache, minConflicts, ConflictTracker, IndexedSet, LazyTable, OccupancyGrid, \
+    INCREMENTAL, \
+    COMPILED, TABLE_ENTRY_BYTES, ITERATIONS_PER_NODE, InfeasibleError, parallel_solve, \
+    iteration_budget, propagate, backtrackingSearch, tabuSearch, \
+    TABU_TENURE, simulatedAnnealing, luby, SOLVED, INFEASIBLE, LIMIT, SearchTrace
 
 
 def create_csp1():
@@ -23,6 +27,34 @@ def create_csp2():
     return csp
 
 
+def not_equal(val1, val2, course1, course2):
+    return 0 if val1 == val2 else 1
+
+
+def create_csp3():
+    csp = CSP()
+    for node in ("class1", "class2", "class3"):
+        csp.add_node(node, [1, 2, 3])
+    csp.add_binary_constraint("class1", "class2", not_equal)
+    csp.add_binary_constraint("class2", "class3", not_equal)
+    csp.add_binary_constraint("class1", "class3", not_equal)
+    return csp
+
+
+def occupies_two_slots(node, val):
+    room, start = val
+    return (room, start, start + 2)
+
+
+def create_csp4():
+    csp = CSP()
+    domain = [(room, start) for room in ("648", "649") for start in range(3)]
+    for node in ("class1", "class2", "class3", "class4"):
+        csp.add_node(node, list(domain))
+    csp.add_resource_constraint(occupies_two_slots)
+    return csp
+
+
 def create_user_data():
     courses = ["physics", "chemistry"]
     professors = ['John Smith', 'Lisa Jones', 'Mike Williams']
@@ -186,6 +218,123 @@ class CspTestCase(TestCase):
         self.assertEqual(binary_constraint[node1][node2], {"factor1": {"factor2": 1}})
         self.assertEqual(binary_constraint[node1][node3], factor2)
 
+    def test_lazy_binary_constraint(self):
+        calls = []
+
+        def counting_clash(val1, val2, course1, course2):
+            calls.append((val1, val2))
+            return 0 if val1 == val2 else 1
+
+        csp = create_csp3()
+        csp.add_node("class4", [1, 2, 3])
+        csp.add_binary_constraint("class1", "class4", counting_clash, lazy=True)
+        table = csp.binary_constraints["class4"]["class1"]
+        self.assertTrue(isinstance(table, LazyTable))
+        self.assertEqual(calls, [])
+        self.assertEqual(table[2][2], 0)
+        self.assertEqual(table[2][3], 1)
+        self.assertEqual(table[2][3], 1)
+        self.assertEqual(calls, [(2, 2), (3, 2)])
+        # an eager table is kept as a factor of the lazy one
+        csp.add_binary_constraint("class1", "class2", not_equal, lazy=True)
+        self.assertEqual(csp.binary_constraints["class1"]["class2"][1][1], 0)
+        self.assertEqual(csp.binary_constraints["class2"]["class1"][3][1], 1)
+
+    def test_remove_node(self):
+        csp = create_csp3()
+        version = csp.version
+        csp.remove_node("class2")
+        self.assertTrue(csp.version > version)
+        self.assertEqual(csp.nodes, ["class1", "class3"])
+        self.assertEqual(set(csp.binary_constraints), {"class1", "class3"})
+        self.assertEqual(list(csp.binary_constraints["class1"]), ["class3"])
+        self.assertEqual(csp.binary_funcs.keys(), {("class1", "class3")})
+        csp.remove_node("class1")
+        self.assertEqual(csp.binary_constraints, {})
+        self.assertEqual(csp.table_bytes, 0)
+        with self.assertRaises(ValueError):
+            csp.remove_node("class1")
+
+    def test_replace_domain(self):
+        csp = create_csp3()
+        csp.add_unary_constraint("class1", lambda val, course: 2 if val == 4 else 1)
+        csp.replace_domain("class1", [3, 4])
+        self.assertEqual(csp.unary_constraints["class1"], {3: 1, 4: 2})
+        self.assertEqual(csp.binary_constraints["class1"]["class2"],
+                         {3: {1: 1, 2: 1, 3: 0}, 4: {1: 1, 2: 1, 3: 1}})
+        self.assertEqual(csp.binary_constraints["class2"]["class1"],
+                         {1: {3: 1, 4: 1}, 2: {3: 1, 4: 1}, 3: {3: 0, 4: 1}})
+        self.assertEqual(csp.table_bytes, (12 + 12 + 18) * TABLE_ENTRY_BYTES)
+        solution = minConflicts(csp, INCREMENTAL, rng=2).solve(100)
+        self.assertTrue(solution["class1"] in (3, 4))
+        self.assertEqual(minConflicts(csp).conflicted(solution), set())
+
+    def test_remove_constraints(self):
+        csp = create_csp3()
+        twice = lambda val1, val2, course1, course2: 2
+        csp.add_binary_constraint("class2", "class1", twice)
+        csp.add_unary_constraint("class1", lambda val, course: 3)
+        csp.remove_binary_constraint("class1", "class2", not_equal)
+        self.assertEqual(csp.binary_constraints["class1"]["class2"][1], {1: 2, 2: 2, 3: 2})
+        self.assertEqual(csp.binary_funcs[("class2", "class1")], [(twice, None, None)])
+        csp.remove_binary_constraint("class2", "class1")
+        self.assertNotIn("class2", csp.binary_constraints["class1"])
+        self.assertEqual(list(csp.binary_constraints["class2"]), ["class3"])
+        csp.remove_unary_constraint("class1")
+        self.assertNotIn("class1", csp.unary_constraints)
+        self.assertEqual(minConflicts(csp).conflicted({"class1": 1, "class2": 1, "class3": 2}),
+                         set())
+
+    def test_compiled_invalidation(self):
+        csp = create_csp3()
+        minC = minConflicts(csp, COMPILED, rng=1)
+        self.assertEqual(minC.search(100).conflicts, 0)
+        compiled = minC.compiled
+        self.assertEqual(minC.search(100).conflicts, 0)
+        self.assertIs(minC.compiled, compiled)
+        csp.add_node("class4", [1, 2, 3])
+        for node in ("class1", "class2", "class3"):
+            csp.add_binary_constraint(node, "class4", not_equal)
+        self.assertEqual(minC.search(50).conflicts, 2)
+        self.assertIsNot(minC.compiled, compiled)
+        csp.remove_node("class4")
+        self.assertEqual(minC.search(100).conflicts, 0)
+
+    def test_table_cache(self):
+        cache = TableCache()
+        tables = []
+        for _ in range(2):
+            csp = CSP(table_cache=cache)
+            for node in ("class1", "class2"):
+                csp.add_node(node, [1, 2])
+                csp.add_unary_constraint(node, lambda val, course: val, kind="unary")
+            csp.add_binary_constraint("class1", "class2", not_equal, kind="not_equal")
+            csp.add_binary_constraint("class1", "class2",
+                                      lambda val1, val2, course1, course2: 2, kind="two")
+            tables.append(csp.binary_constraints["class1"]["class2"])
+            self.assertEqual(csp.unary_constraints["class2"], {1: 1, 2: 2})
+        self.assertEqual((len(cache), cache.misses, cache.hits), (3, 3, 5))
+        self.assertEqual(tables[0], {1: {1: 0, 2: 2}, 2: {1: 2, 2: 0}})
+        self.assertEqual(tables[1], tables[0])
+        # the combined table is new, the cached factor is left untouched
+        self.assertEqual(cache.tables[("not_equal", "c", "c", (1, 2), (1, 2))][0],
+                         {1: {1: 0, 2: 1}, 2: {1: 1, 2: 0}})
+
+    def test_memory_budget(self):
+        csp = CSP(memory_budget=2 * 9 * TABLE_ENTRY_BYTES)
+        for node in ("class1", "class2", "class3"):
+            csp.add_node(node, [1, 2, 3])
+        csp.add_binary_constraint("class1", "class2", not_equal)
+        csp.add_binary_constraint("class2", "class3", not_equal)
+        csp.add_binary_constraint("class2", "class3", not_equal, lazy=False)
+        self.assertEqual(csp.table_bytes, 2 * 9 * TABLE_ENTRY_BYTES)
+        self.assertFalse(isinstance(csp.binary_constraints["class1"]["class2"], LazyTable))
+        self.assertTrue(isinstance(csp.binary_constraints["class2"]["class3"], LazyTable))
+        self.assertEqual(len(csp.binary_constraints["class3"]["class2"].factors), 1)
+        self.assertEqual(len(csp.binary_constraints["class3"]["class2"].tables), 1)
+        result = minConflicts(csp, INCREMENTAL).solve(100)
+        self.assertNotEqual(result["class2"], result["class3"])
+
     # def test_add_binary_constraint(self):
     #     """
     #     Test if add binary constraint work.
@@ -232,5 +381,423 @@ class MinConflictsTestCase(TestCase):
         self.assertNotEqual(result["class3"], "domin5")
 
 
+    def test_score_value(self):
+        csp = create_csp3()
+        for node in csp.nodes:
+            csp.add_unary_constraint(node, lambda val, course: val != 3)
+        minC = minConflicts(csp)
+        assignments = {"class1": 1, "class2": 1, "class3": 2}
+        for node in csp.nodes:
+            for val in (1, 2, 3):
+                moved = dict(assignments)
+                moved[node] = val
+                conflict, weight = minC.conflicted_neighbors(moved, node)
+                self.assertEqual(minC.score_value(assignments, node, val), (len(conflict), weight))
+        self.assertEqual(assignments, {"class1": 1, "class2": 1, "class3": 2})
+
+    def test_unknown_engine(self):
+        self.assertRaises(ValueError, lambda: minConflicts(self.minC.csp, "quantum"))
+
+    def test_solve_incremental(self):
+        minC = minConflicts(create_csp3(), INCREMENTAL)
+        result = minC.solve(100)
+        self.assertEqual(sorted(result.values()), [1, 2, 3])
+        self.assertEqual(minC.conflicted(result), set())
+
+    def test_search_anytime(self):
+        csp = create_csp3()
+        csp.add_node("class4", [1, 2, 3])
+        for node in ("class1", "class2", "class3"):
+            csp.add_binary_constraint(node, "class4", not_equal)
+        for engine in (INCREMENTAL, COMPILED, "standard"):
+            result = minConflicts(csp, engine, rng=3).search(max_iters=50)
+            self.assertEqual(result.conflicts, 2)
+            self.assertEqual(result.iterations, 50)
+            self.assertEqual(len(minConflicts(csp).conflicted(result.assignments)), 2)
+            result = minConflicts(create_csp3(), engine, rng=3).search(time_budget=5)
+            self.assertEqual(result.conflicts, 0)
+            self.assertEqual(sorted(result.assignments.values()), [1, 2, 3])
+        result = minConflicts(csp).search(time_budget=0.01)
+        self.assertEqual(result.conflicts, 2)
+        self.assertEqual(minConflicts(csp).solve(20), None)
+
+    def test_iteration_budget(self):
+        self.assertEqual(iteration_budget(create_csp2()), 3 * ITERATIONS_PER_NODE)
+        self.assertEqual(iteration_budget(create_csp3()), 6 * ITERATIONS_PER_NODE)
+        self.assertEqual(iteration_budget(create_csp3(), per_node=1), 6)
+
+    def test_seeded_rng(self):
+        results = []
+        for _ in range(2):
+            minC = minConflicts(create_csp3(), INCREMENTAL, rng=7)
+            results.append(minC.solve(100))
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(sorted(results[0].values()), [1, 2, 3])
+
+    def test_weighting_noise_restarts(self):
+        with self.assertRaises(ValueError):
+            minConflicts(create_csp3(), weighting=True)
+        for options in ({"weighting": True}, {"noise": 0.2}, {"restart_unit": 4},
+                        {"weighting": True, "noise": 0.1, "restart_unit": 8}):
+            minC = minConflicts(create_csp3(), INCREMENTAL, rng=4, **options)
+            result = minC.search(max_iters=200)
+            self.assertEqual(result.conflicts, 0)
+            self.assertEqual(sorted(result.assignments.values()), [1, 2, 3])
+        csp = create_csp3()
+        csp.add_node("class4", [1, 2, 3])
+        for node in ("class1", "class2", "class3"):
+            csp.add_binary_constraint(node, "class4", not_equal)
+        for engine in ("standard", INCREMENTAL, COMPILED):
+            result = minConflicts(csp, engine, rng=4, noise=0.5, restart_unit=2).search(50)
+            self.assertEqual(result.conflicts, 2)
+            self.assertEqual(result.iterations, 50)
+
+    def test_warm_start(self):
+        csp = create_csp3()
+        solution = {"class1": 3, "class2": 1, "class3": 2}
+        for engine in ("standard", INCREMENTAL, COMPILED):
+            result = minConflicts(csp, engine, rng=1).search(100, initial=solution)
+            self.assertEqual(result, (solution, 0, 0))
+        csp.replace_domain("class1", [2, 3, 4])
+        csp.add_node("class4", [1, 2, 3, 4])
+        for node in ("class1", "class2", "class3"):
+            csp.add_binary_constraint(node, "class4", not_equal)
+        minC = minConflicts(csp, INCREMENTAL, rng=1)
+        seeded = minC.initial_var_assignment({"class1": 3, "class2": 1, "class3": 5}, True)
+        self.assertEqual(seeded["class1"], 3)
+        self.assertEqual(seeded["class2"], 1)
+        self.assertEqual(minC.conflicted(seeded), set())
+        seeded = minC.initial_var_assignment({"class2": 1, "class5": 1})
+        self.assertEqual(seeded["class2"], 1)
+        self.assertEqual(set(seeded), {"class1", "class2", "class3", "class4"})
+        result = minC.search(100, initial={"class1": 3, "class2": 1, "class3": 2})
+        self.assertEqual(result.conflicts, 0)
+        self.assertEqual(result.iterations, 0)
+        self.assertEqual(result.assignments["class4"], 4)
+        self.assertTrue(minC.solve(initial={"class1": 1}))
+
+    def test_observer(self):
+        csp = create_csp3()
+        csp.add_node("class4", [1, 2, 3])
+        for node in ("class1", "class2", "class3"):
+            csp.add_binary_constraint(node, "class4", not_equal)
+        for engine in ("standard", INCREMENTAL):
+            trace = SearchTrace()
+            result = minConflicts(csp, engine, rng=2, restart_unit=8,
+                                  observer=trace).search(40)
+            self.assertEqual(len(trace.conflicts), 40)
+            self.assertTrue(all(conflicts >= 2 for conflicts in trace.conflicts))
+            self.assertEqual(sum(trace.nodes.values()), 40)
+            self.assertEqual(trace.evaluated, 40 * 3)
+            self.assertTrue(0 < trace.accepted <= 40)
+            self.assertTrue(trace.restarts > 0)
+            self.assertEqual(trace.result, result)
+        trace = SearchTrace()
+        result = tabuSearch(create_csp3(), INCREMENTAL, rng=2, observer=trace).search(100)
+        self.assertEqual(result.conflicts, 0)
+        self.assertEqual(len(trace.conflicts), result.iterations)
+
+    def test_luby(self):
+        self.assertEqual([luby(i) for i in range(1, 16)],
+                         [1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8])
+
+    def test_soft_weight(self):
+        csp = create_csp3()
+        csp.add_binary_constraint("class1", "class3",
+                                  lambda val1, val2, course1, course2: 2 if val1 < val2 else 1)
+        minC = minConflicts(csp)
+        self.assertEqual(minC.soft_weight({"class1": 1, "class2": 2, "class3": 3}), 2)
+        self.assertEqual(minC.soft_weight({"class1": 3, "class2": 2, "class3": 1}), 1)
+        self.assertEqual(minC.soft_weight({"class1": 1, "class2": 2, "class3": 1}), 0)
+
+    def test_parallel_solve(self):
+        csp = create_csp3()
+        result = parallel_solve(csp, 3, max_iters=100, engine=INCREMENTAL, processes=2, seed=1)
+        self.assertEqual(sorted(result.values()), [1, 2, 3])
+        result = parallel_solve(csp, 2, max_iters=100, processes=2, seed=1, first=False)
+        self.assertEqual(sorted(result.values()), [1, 2, 3])
+        csp.add_node("class4", [1])
+        csp.add_binary_constraint("class4", "class1", not_equal)
+        csp.add_unary_constraint("class4", lambda val, course: 0)
+        self.assertEqual(parallel_solve(csp, 2, max_iters=10, processes=2), None)
+
+    def test_parallel_solve_time_budget(self):
+        csp = create_csp3()
+        csp.add_node("class4", [1, 2, 3])
+        for node in ("class1", "class2", "class3"):
+            csp.add_binary_constraint(node, "class4", not_equal)
+        start = time.perf_counter()
+        result = parallel_solve(csp, 4, max_iters=None, processes=2, seed=1, time_budget=0.2)
+        elapsed = time.perf_counter() - start
+        self.assertEqual(result, None)
+        # without the shared budget the unbounded searches would never return;
+        # the bound only leaves room for pool start-up on a loaded machine
+        self.assertLess(elapsed, 30)
+
+    def test_parallel_solve_build(self):
+        csp = create_csp3()
+        # a pruned domain reaches the workers that rebuild the CSP
+        csp.node_domains["class1"] = [2]
+        start_method = multiprocessing.get_start_method(allow_none=True)
+        multiprocessing.set_start_method("spawn", force=True)
+        try:
+            result = parallel_solve(csp, 2, max_iters=100, processes=2, seed=1,
+                                    build=create_csp3)
+        finally:
+            multiprocessing.set_start_method(start_method, force=True)
+        self.assertEqual(result["class1"], 2)
+        self.assertEqual(sorted(result.values()), [1, 2, 3])
+        with mock.patch("multiprocessing.get_all_start_methods", return_value=["spawn"]):
+            with self.assertRaises(ValueError):
+                parallel_solve(csp, 2, max_iters=100, processes=2)
+
+
+class TabuSearchTestCase(TestCase):
+    def test_solve(self):
+        for engine in ("standard", INCREMENTAL, COMPILED):
+            result = tabuSearch(create_csp3(), engine, rng=5).search(max_iters=100)
+            self.assertEqual(result.conflicts, 0)
+            self.assertEqual(sorted(result.assignments.values()), [1, 2, 3])
+            solution = tabuSearch(create_csp4(), engine, rng=5, tenure=3).solve(200)
+            self.assertEqual(minConflicts(create_csp4()).conflicted(solution), set())
+
+    def test_tabu_list(self):
+        csp = create_csp3()
+        tabu = tabuSearch(csp, INCREMENTAL, rng=1)
+        state = tabu.new_state({"class1": 1, "class2": 1, "class3": 1})
+        val = tabu.choose_value(state, "class1", 0, 3, 3)
+        self.assertTrue(val in (2, 3))
+        self.assertEqual(tabu.tabu, {("class1", 1): TABU_TENURE})
+        state.move("class1", val)
+        state.move("class1", 1)
+        tabu.tabu = {("class1", 2): 5, ("class1", 3): 5}
+        # aspiration: the tabu moves are estimated to beat the best cost
+        self.assertTrue(tabu.choose_value(state, "class1", 1, 3, 3) in (2, 3))
+        self.assertEqual(tabu.choose_value(state, "class1", 1, 3, 1), 1)
+        self.assertTrue(tabu.choose_value(state, "class1", 6, 3, 1) in (2, 3))
+
+    def test_parallel_solve(self):
+        result = parallel_solve(create_csp3(), 2, max_iters=100, processes=2, seed=1,
+                                tenure=2)
+        self.assertEqual(sorted(result.values()), [1, 2, 3])
+
+
+class SimulatedAnnealingTestCase(TestCase):
+    def test_anneal(self):
+        csp = create_csp3()
+        csp.add_binary_constraint("class1", "class3",
+                                  lambda val1, val2, course1, course2: 2 if val1 < val2 else 1)
+        annealing = simulatedAnnealing(csp, rng=2)
+        start = {"class1": 3, "class2": 2, "class3": 1}
+        self.assertEqual(annealing.objective(start), 0)
+        result = annealing.anneal(start, max_iters=500)
+        self.assertEqual(result.iterations, 500)
+        self.assertAlmostEqual(result.objective, math.log(2))
+        self.assertTrue(result.assignments["class1"] < result.assignments["class3"])
+        self.assertEqual(minConflicts(csp).conflicted(result.assignments), set())
+        result = annealing.anneal(start, time_budget=0.05)
+        self.assertAlmostEqual(result.objective, math.log(2))
+
+    def test_keeps_hard_constraints(self):
+        csp = create_csp4()
+        start = minConflicts(csp, INCREMENTAL, rng=1).solve(100)
+        result = simulatedAnnealing(csp, rng=1).anneal(start, max_iters=200)
+        self.assertEqual(minConflicts(csp).conflicted(result.assignments), set())
+        self.assertEqual(result.objective, 0)
+
+    def test_infeasible_start(self):
+        with self.assertRaises(ValueError):
+            simulatedAnnealing(create_csp3()).anneal({"class1": 1, "class2": 1, "class3": 2})
+
+
+class PropagateTestCase(TestCase):
+    def test_node_and_arc_consistency(self):
+        csp = create_csp3()
+        csp.add_unary_constraint("class1", lambda val, course: val == 2)
+        csp.add_unary_constraint("class2", lambda val, course: val != 3)
+        forced = propagate(csp)
+        self.assertEqual(forced, {"class1": 2, "class2": 1, "class3": 3})
+        self.assertEqual(csp.node_domains, {"class1": [2], "class2": [1], "class3": [3]})
+        self.assertEqual(minConflicts(csp).solve(1), forced)
+
+    def test_lazy_tables(self):
+        csp = CSP()
+        csp.add_node("class1", [1])
+        csp.add_node("class2", [1, 2])
+        csp.add_binary_constraint("class1", "class2", not_equal, lazy=True)
+        self.assertEqual(propagate(csp), {"class1": 1, "class2": 2})
+        self.assertEqual(len(csp.binary_constraints["class1"]["class2"]), 0)
+
+    def test_infeasible(self):
+        csp = create_csp3()
+        csp.add_node("class4", [1, 2, 3])
+        for node in ("class1", "class2", "class3"):
+            csp.add_binary_constraint(node, "class4", not_equal)
+        csp.add_unary_constraint("class1", lambda val, course: val == 1)
+        csp.add_unary_constraint("class2", lambda val, course: val == 1)
+        with self.assertRaises(InfeasibleError):
+            propagate(csp)
+        self.assertEqual(csp.node_domains["class1"], [1, 2, 3])
+        csp.add_unary_constraint("class4", lambda val, course: 0)
+        with self.assertRaises(InfeasibleError) as context:
+            propagate(csp)
+        self.assertEqual(context.exception.node, "class4")
+
+
+class BacktrackingTestCase(TestCase):
+    def create_pigeonhole(self):
+        csp = create_csp3()
+        csp.add_node("class4", [1, 2, 3])
+        for node in ("class1", "class2", "class3"):
+            csp.add_binary_constraint(node, "class4", not_equal)
+        return csp
+
+    def test_solve(self):
+        csp = create_csp3()
+        search = backtrackingSearch(csp)
+        solution = search.solve()
+        self.assertEqual(search.status, SOLVED)
+        self.assertEqual(sorted(solution.values()), [1, 2, 3])
+        self.assertEqual(search.expanded, 3)
+
+    def test_infeasible(self):
+        # arc consistency cannot see that four classes need four values
+        csp = self.create_pigeonhole()
+        propagate(csp)
+        search = backtrackingSearch(csp)
+        self.assertIsNone(search.solve())
+        self.assertEqual(search.status, INFEASIBLE)
+
+    def test_unary_infeasible(self):
+        csp = create_csp3()
+        csp.add_unary_constraint("class2", lambda val, course: 0)
+        search = backtrackingSearch(csp)
+        self.assertIsNone(search.solve())
+        self.assertEqual(search.status, INFEASIBLE)
+        self.assertEqual(search.expanded, 0)
+
+    def test_limit(self):
+        search = backtrackingSearch(self.create_pigeonhole())
+        self.assertIsNone(search.solve(max_nodes=2))
+        self.assertEqual(search.status, LIMIT)
+        self.assertEqual(search.expanded, 2)
+
+    def test_resource_constraint(self):
+        search = backtrackingSearch(create_csp4())
+        solution = search.solve()
+        self.assertEqual(search.status, SOLVED)
+        self.assertEqual(minConflicts(create_csp4()).conflicted(solution), set())
+        csp = create_csp4()
+        csp.add_node("class5", [("648", 0)])
+        search = backtrackingSearch(csp)
+        self.assertIsNone(search.solve())
+        self.assertEqual(search.status, INFEASIBLE)
+
+
+    def test_related(self):
+        csp = create_csp4()
+        csp.add_node("class5", [("650", 0)])
+        csp.add_node("class6", [("650", 2), ("648", 5)])
+        search = backtrackingSearch(csp)
+        self.assertEqual(search.related("class1"), ["class2", "class3", "class4"])
+        self.assertEqual(search.related("class5"), [])
+        self.assertEqual(search.related("class6"), [])
+        csp.add_binary_constraint("class5", "class6", not_equal)
+        search = backtrackingSearch(csp)
+        self.assertEqual(search.related("class5"), ["class6"])
+
+
+class OccupancyGridTestCase(TestCase):
+    def test_grid(self):
+        grid = OccupancyGrid(occupies_two_slots)
+        grid.place("class1", ("648", 0))
+        grid.place("class2", ("648", 1))
+        grid.place("class3", ("649", 1))
+        self.assertEqual(grid.counts["648"], [1, 2, 1])
+        self.assertEqual(grid.clashes("class1", ("648", 0)), 1)
+        self.assertEqual(grid.clashes("class1", ("648", 2)), 1)
+        self.assertEqual(grid.clashes("class1", ("649", 3)), 0)
+        self.assertEqual(grid.clashes("class4", ("648", 1)), 2)
+        self.assertEqual(sorted(grid.overlapping("class4", ("648", 0))), ["class1", "class2"])
+        grid.remove("class2")
+        self.assertEqual(grid.counts["648"], [1, 1, 0])
+        self.assertEqual(grid.clashes("class1", ("648", 0)), 0)
+
+    def test_conflicted(self):
+        csp = create_csp4()
+        minC = minConflicts(csp)
+        assignments = {"class1": ("648", 0), "class2": ("648", 1),
+                       "class3": ("649", 0), "class4": ("649", 2)}
+        self.assertEqual(minC.conflicted(assignments), {"class1", "class2"})
+        self.assertEqual(minC.conflicted_neighbors(assignments, "class1")[0],
+                         {"class1", "class2"})
+        self.assertEqual(minC.score_value(assignments, "class1", ("649", 1)), (3, 1))
+        self.assertEqual(minC.score_value(assignments, "class1", ("650", 0)), (0, 1))
+        tracker = ConflictTracker(csp, assignments)
+        self.assertEqual(set(tracker.conflicted), {"class1", "class2"})
+        tracker.move("class2", ("648", 2))
+        self.assertEqual(set(tracker.conflicted), set())
+        assignments["class2"] = ("648", 2)
+        self.assertEqual(set(tracker.conflicted), minC.conflicted(assignments))
+
+    def test_solve(self):
+        for engine in ("standard", INCREMENTAL, COMPILED):
+            csp = create_csp4()
+            result = minConflicts(csp, engine, rng=5).solve(200)
+            self.assertEqual(minConflicts(csp).conflicted(result), set())
+
+
+class ConflictTrackerTestCase(TestCase):
+    def setUp(self):
+        self.csp = create_csp3()
+        self.minC = minConflicts(self.csp)
+
+    def test_initial_counts(self):
+        assignments = {"class1": 1, "class2": 1, "class3": 2}
+        tracker = ConflictTracker(self.csp, assignments)
+        self.assertEqual(set(tracker.conflicted), {"class1", "class2"})
+        self.assertEqual(tracker.value_conflicts["class3"], {1: 2, 2: 0, 3: 0})
+        self.assertEqual(tracker.value_conflicts["class1"], {1: 1, 2: 1, 3: 0})
+
+    def test_move_matches_rescan(self):
+        assignments = {"class1": 1, "class2": 1, "class3": 1}
+        tracker = ConflictTracker(self.csp, assignments)
+        for node, val in (("class1", 2), ("class3", 2), ("class3", 3), ("class2", 2)):
+            tracker.move(node, val)
+            assignments[node] = val
+            self.assertEqual(set(tracker.conflicted), self.minC.conflicted(assignments))
+            fresh = ConflictTracker(self.csp, assignments)
+            self.assertEqual(tracker.value_conflicts, fresh.value_conflicts)
+        self.assertEqual(tracker.best_value("class1"), 1)
+
+    def test_breakout(self):
+        assignments = {"class1": 1, "class2": 1, "class3": 2}
+        tracker = ConflictTracker(self.csp, assignments)
+        tracker.breakout("class1", 3)
+        self.assertEqual(tracker.edge_weights, {})
+        tracker.breakout("class1", 1)
+        self.assertEqual(tracker.edge_weights, {("class1", "class2"): 2, ("class2", "class1"): 2})
+        self.assertEqual(tracker.value_conflicts["class1"], {1: 2, 2: 1, 3: 0})
+        self.assertEqual(tracker.value_conflicts["class2"], {1: 2, 2: 1, 3: 0})
+        tracker.move("class2", 3)
+        self.assertEqual(tracker.value_conflicts["class1"], {1: 0, 2: 1, 3: 2})
+        self.assertEqual(len(tracker.conflicted), 0)
+        fresh = ConflictTracker(self.csp, tracker.assignments)
+        fresh.edge_weights = dict(tracker.edge_weights)
+        for node in self.csp.nodes:
+            fresh.score_node(node)
+        self.assertEqual(fresh.value_conflicts, tracker.value_conflicts)
+
+    def test_indexed_set(self):
+        items = IndexedSet()
+        for item in (1, 2, 3):
+            items.add(item)
+        items.add(2)
+        items.discard(1)
+        items.discard(4)
+        self.assertEqual(sorted(items), [2, 3])
+        self.assertTrue(items.choice() in (2, 3))
+
+
 if __name__ == '__main__':
     main()
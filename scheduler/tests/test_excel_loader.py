@@ -0,0 +1,83 @@
+"""
+This is the test suite for excel_loader.py.
+"""
+import os, pickle, shutil, sys, tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from unittest import TestCase, main, skipUnless
+from excel_loader import workbook_key, parse_workbook, load_cache, save_cache, load_workbook, \
+    CACHE_SUFFIX
+
+try:
+    import pandas
+    import openpyxl
+except ImportError:
+    pandas = None
+
+WORKBOOK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "my_data.xlsx")
+
+
+def create_user_data():
+    return (["John Smith"], {"John Smith": {"courses": ["physics"], "start_time": 9,
+                                            "end_time": 10}},
+            ["648"], {"648": 30}, ["physics"], {"physics": 10}, {"physics": 60},
+            {"physics": 2})
+
+
+class ExcelLoaderTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "data.xlsx")
+        shutil.copyfile(WORKBOOK, self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_workbook_key(self):
+        key = workbook_key(self.path)
+        self.assertEqual(key, workbook_key(self.path))
+        self.assertEqual(key[0], os.path.abspath(self.path))
+        with open(self.path, "ab") as workbook:
+            workbook.write(b"\0")
+        self.assertNotEqual(workbook_key(self.path)[2], key[2])
+
+    def test_cache(self):
+        cache_path = self.path + CACHE_SUFFIX
+        key = workbook_key(self.path)
+        self.assertEqual(load_cache(cache_path, key), None)
+        save_cache(cache_path, key, create_user_data())
+        self.assertEqual(load_cache(cache_path, key), create_user_data())
+        self.assertEqual(load_cache(cache_path, (key[0], key[1] + 1, key[2])), None)
+        self.assertEqual(load_cache(cache_path, key[:2] + ("stale",)), None)
+        for contents in (b"garbage", pickle.dumps(["not", "a", "dict"]),
+                         b"cno_such_module\nTable\n."):
+            with open(cache_path, "wb") as cache_file:
+                cache_file.write(contents)
+            self.assertEqual(load_cache(cache_path, key), None)
+            self.assertFalse(os.path.exists(cache_path))
+
+    def test_load_from_cache(self):
+        # a fresh cache is read without parsing the workbook
+        save_cache(self.path + CACHE_SUFFIX, workbook_key(self.path), create_user_data())
+        self.assertEqual(load_workbook(self.path), create_user_data())
+
+    @skipUnless(pandas, "needs pandas and openpyxl")
+    def test_parse_workbook(self):
+        professors, prof_info, rooms, room_capacities, courses, \
+            course_no_students, course_mins, course_days_weekly = parse_workbook(self.path)
+        self.assertEqual(set(prof_info), set(professors))
+        self.assertEqual(prof_info["John Smith"]["courses"], ["physics", "chemistry"])
+        self.assertEqual(prof_info["John Smith"]["start_time"], 8)
+        self.assertTrue(all(type(room) is str for room in rooms))
+        self.assertEqual(room_capacities["655"], 30)
+        self.assertEqual(set(course_mins), set(courses))
+        self.assertEqual(course_no_students["physics"], 35)
+        self.assertEqual(course_days_weekly["physics"], 3)
+        self.assertEqual(load_workbook(self.path)[2], rooms)
+        self.assertTrue(os.path.exists(self.path + CACHE_SUFFIX))
+        self.assertEqual(load_workbook(self.path)[2], rooms)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+This is the test suite for instancegen.py.
+"""
+import argparse, io, json, os, sys, tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from unittest import TestCase, main
+from instancegen import generate_instance, load_instance, parse_mix
+
+
+def generate(*args, **kwargs):
+    out = io.StringIO()
+    generate_instance(out, *args, **kwargs)
+    return out.getvalue()
+
+
+class InstancegenTestCase(TestCase):
+    def test_instance(self):
+        data = json.loads(generate(50, 6, 10, seed=1, capacity_range=(10, 30),
+                                   days_mix={2: 1}))
+        self.assertEqual(len(data['courses']), 50)
+        self.assertEqual(len(data['rooms']), 6)
+        self.assertEqual(len(data['professors']), 10)
+        largest = max(data['room_capacities'].values())
+        self.assertTrue(all(10 <= capacity <= 30 for capacity in data['room_capacities'].values()))
+        self.assertTrue(all(students <= largest for students in data['course_no_students'].values()))
+        self.assertEqual(set(data['course_days_weekly'].values()), {2})
+        self.assertTrue(set(data['course_mins'].values()) <= {60, 90})
+        taught = {course for info in data['prof_info'].values() for course in info['courses']}
+        self.assertEqual(taught, set(data['courses']))
+        for info in data['prof_info'].values():
+            self.assertTrue(info['start_time'] < info['end_time'])
+
+    def test_seed(self):
+        self.assertEqual(generate(20, 4, 5, seed=7), generate(20, 4, 5, seed=7))
+        self.assertNotEqual(generate(20, 4, 5, seed=7), generate(20, 4, 5, seed=8))
+        with self.assertRaises(ValueError):
+            generate(0, 4, 5)
+
+    def test_load_instance(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'instance.json')
+            with open(path, 'w') as out:
+                generate_instance(out, 5, 2, 3)
+            professors, prof_info, rooms, room_capacities, courses, \
+                course_no_students, course_mins, course_days_weekly = load_instance(path)
+        self.assertEqual(len(courses), 5)
+        self.assertEqual(set(prof_info), set(professors))
+        self.assertEqual(set(course_days_weekly), set(courses))
+
+    def test_load_instance_sections(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'instance.json')
+            with open(path, 'w') as out:
+                generate_instance(out, 5, 2, 3, sections_mix={3: 1})
+            user_data = load_instance(path, sections=True)
+            self.assertEqual(user_data[:-1], load_instance(path))
+            self.assertEqual(set(user_data[-1].values()), {3})
+            with open(path) as instance_file:
+                data = json.load(instance_file)
+            del data['course_no_sections']
+            with open(path, 'w') as out:
+                json.dump(data, out)
+            self.assertEqual(set(load_instance(path, sections=True)[-1].values()), {1})
+
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix('60:0.6,90:0.4'), {60: 0.6, 90: 0.4})
+        self.assertEqual(parse_mix('2:1'), {2: 1.0})
+        for text in ('60', '60:x', '1.5:1', '60:-1', '60:0,90:0'):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                parse_mix(text)
+        data = json.loads(generate(30, 4, 5, duration_mix=parse_mix('180:1'),
+                                   sections_mix=parse_mix('1:0,2:1')))
+        self.assertEqual(set(data['course_mins'].values()), {180})
+        self.assertEqual(set(data['course_no_sections'].values()), {2})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""
+This is the test suite for profiling.py.
+"""
+import os, pstats, sys, tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from unittest import TestCase, main
+from instancegen import load_instance
+from profiling import profile_time, profile_memory, DEFAULT_INSTANCE
+from teachercourse_csp import AssignerStats, DaySolver, INCREMENTAL, SOLVE
+
+
+class ProfilingTestCase(TestCase):
+    def setUp(self):
+        self.user_data = load_instance(DEFAULT_INSTANCE)
+
+    def test_profile_time(self):
+        stats = AssignerStats()
+        profiler = profile_time(self.user_data, 0, INCREMENTAL, stats)
+        self.assertTrue(stats.total(SOLVE) > 0)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "week.pstats")
+            profiler.dump_stats(path)
+            functions = {function for _, _, function in pstats.Stats(path).stats}
+        self.assertTrue("assigner" in functions)
+
+    def test_profile_memory(self):
+        search = DaySolver.search
+        snapshot, baseline, current, peak = profile_memory(self.user_data, 0, INCREMENTAL)
+        self.assertEqual(DaySolver.search, search)
+        self.assertTrue(0 < current <= peak)
+        # taken while a day's CSP was alive, so the solver's allocations show
+        files = {stat.traceback[0].filename for stat in snapshot.compare_to(baseline, "lineno")
+                 if stat.size_diff > 0}
+        self.assertTrue(any(path.endswith("cspsolver.py") for path in files))
+
+
+if __name__ == '__main__':
+    main()
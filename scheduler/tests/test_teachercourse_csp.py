@@ -1,13 +1,21 @@
 """
 This is the test suite for cspsolver.py.
 """
-import os, sys
+import multiprocessing, os, pickle, sys, tempfile
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from unittest import TestCase, main, skip
 
-from teachercourse_csp import pref_handler, assign_days_for_course, maps_day_to_class, hours_for_prof, profs_for_courses, add_nodes, assigner
-from cspsolver import CSP, minConflicts
+from teachercourse_csp import pref_handler, assign_days_for_course, maps_day_to_class, hours_for_prof, profs_for_courses, add_nodes, assigner, \
+    add_room_occupancy, add_binary_constraint, clash_candidates, SlotRegistry, \
+    data_fingerprint, load_table_cache, overflow_sections, DaySolver, AssignerStats, PHASES, \
+    SOLVE, constraint_functions, SLOT_ID_LIMIT
+from cspsolver import CSP, TableCache, LazyTable, minConflicts, COMPILED, INCREMENTAL
+from instancegen import load_instance
+
+# The instance driver.py solves
+SAMPLE_DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           'sample_data.txt')
 
 def create_csp():
     csp = CSP()
@@ -62,6 +70,116 @@ class Teachercourse_Csp_TestCase(TestCase):
         self.assertEqual(len(result5), 5)
         self.assertEqual(result5, ["mon", "tues", "wed", "thur", "fri"])
 
+    def test_overflow_sections(self):
+        self.csp.add_node(("physics", "John Smith"), [("648", (9, 0))])
+        self.csp.add_node(("chemistry", "Lisa Jones"), [("648", (9, 0)), ("648", (11, 0))])
+        self.csp.add_node(("biology", "Mike Williams"), [("648", (9, 30))])
+        add_room_occupancy(self.csp, {"physics": 60, "chemistry": 60, "biology": 60})
+        assignments = {("physics", "John Smith"): ("648", (9, 0)),
+                       ("chemistry", "Lisa Jones"): ("648", (11, 0)),
+                       ("biology", "Mike Williams"): ("648", (9, 30))}
+        overflow = overflow_sections(self.csp, assignments)
+        self.assertEqual(len(overflow), 1)
+        self.assertTrue(overflow[0] in (("physics", "John Smith"), ("biology", "Mike Williams")))
+        self.assertEqual(len(self.csp.nodes), 2)
+        self.assertEqual(overflow_sections(self.csp, assignments), [])
+
+    def test_assigner_moves_overflow(self):
+        # one room and a one hour window fit two 30 minute sections a day
+        courses = ["c{}".format(i) for i in range(8)]
+        prof_info = {'John Smith': {'courses': courses, 'start_time': 9, 'end_time': 10}}
+        user_data = (['John Smith'], prof_info, ["648"], {"648": 30}, courses,
+                     {course: 10 for course in courses}, {course: 30 for course in courses},
+                     {course: 1 for course in courses})
+        solved = 0
+        for _ in range(5):
+            solution = assigner(user_data, exact_nodes=0)
+            days = [day for day in ["mon", "tues", "wed", "thur", "fri"]
+                    if solution[day] is not None]
+            if len(days) == 5:
+                solved += 1
+                self.assertEqual(sum(len(solution[day]) for day in days), 8)
+        self.assertTrue(solved)
+
+    def test_day_solver_pickles(self):
+        user_data = create_user_data()
+        user_data[3]["648"] = 40
+        registry = SlotRegistry()
+        day_solver = DaySolver(user_data, {"physics": "John Smith"}, registry, TableCache())
+        day_solver = pickle.loads(pickle.dumps(day_solver))
+        solution, attempt, overflow = day_solver.solve(["physics"])
+        self.assertEqual(list(solution), [("physics", "John Smith")])
+        self.assertEqual(overflow, [])
+        self.assertEqual(day_solver.registry.room(solution[("physics", "John Smith")]), "648")
+
+    def test_parallel_starts_spawn(self):
+        user_data = create_user_data()
+        user_data[3]["648"] = 40
+        start_method = multiprocessing.get_start_method(allow_none=True)
+        multiprocessing.set_start_method("spawn", force=True)
+        try:
+            # the workers rebuild the day's closures instead of unpickling them
+            solution = assigner(user_data, starts=2, processes=2)
+        finally:
+            multiprocessing.set_start_method(start_method, force=True)
+        for day in ["mon", "tues", "wed", "thur", "fri"]:
+            self.assertTrue(solution[day] is not None)
+        self.assertEqual(sum(len(solution[day]) for day in solution), 3)
+
+    def test_assigner_parallel_days(self):
+        user_data = create_user_data()
+        user_data[3]["648"] = 40
+        solution = assigner(user_data, parallel_days=True, day_processes=2)
+        for day in ["mon", "tues", "wed", "thur", "fri"]:
+            self.assertTrue(solution[day] is not None)
+        self.assertEqual(sum(len(solution[day]) for day in solution), 3)
+
+    def test_assigner_stats(self):
+        user_data = create_user_data()
+        user_data[3]["648"] = 40
+        for parallel_days in (False, True):
+            stats = AssignerStats()
+            assigner(user_data, parallel_days=parallel_days, day_processes=2, stats=stats)
+            self.assertEqual(stats.retries, 0)
+            for day in ["mon", "tues", "wed", "thur", "fri"]:
+                self.assertEqual(stats.attempts[day], 1)
+                self.assertEqual(stats.day_retries(day), 0)
+                self.assertEqual(set(stats.timings[day]), set(PHASES))
+                self.assertTrue(all(seconds >= 0 for seconds in stats.timings[day].values()))
+            self.assertTrue(stats.total(SOLVE) > 0)
+
+    def test_table_cache_file(self):
+        user_data = create_user_data()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "tables.pickle")
+            assigner(user_data, table_cache_path=path)
+            registry, table_cache = load_table_cache(path, data_fingerprint(user_data))
+            self.assertTrue(len(registry))
+            self.assertTrue(len(table_cache))
+            solution = assigner(user_data, partial=True, table_cache_path=path)
+            self.assertTrue(any(solution.values()))
+            registry, table_cache = load_table_cache(path, "stale")
+            self.assertEqual((len(registry), len(table_cache)), (0, 0))
+
+    def test_corrupt_table_cache_file(self):
+        user_data = create_user_data()
+        fingerprint = data_fingerprint(user_data)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "tables.pickle")
+            for contents in (b"garbage", pickle.dumps(["not", "a", "dict"]),
+                             pickle.dumps({"fingerprint": fingerprint}),
+                             b"cno_such_module\nTable\n."):
+                with open(path, "wb") as cache_file:
+                    cache_file.write(contents)
+                registry, table_cache = load_table_cache(path, fingerprint)
+                self.assertEqual((len(registry), len(table_cache)), (0, 0))
+                self.assertFalse(os.path.exists(path))
+            with open(path, "wb") as cache_file:
+                cache_file.write(b"garbage")
+            assigner(user_data, partial=True, table_cache_path=path)
+            registry, table_cache = load_table_cache(path, fingerprint)
+            self.assertTrue(len(registry))
+
     def test_maps_day_to_class(self):
         course = ["physics", "chemistry", "japanese"]
         course_days = {"physics": 3, "chemistry": 1, "japanese": 5}
@@ -79,3 +197,152 @@ class Teachercourse_Csp_TestCase(TestCase):
         self.assertEqual(count_japanese, 5)
         self.assertEqual(count_chemistry, 1)
         self.assertEqual(count_physics, 3)
+
+    def test_assigner_partial(self):
+        solution = assigner(create_user_data(), partial=True, time_budget=0.01)
+        days = [day for day in ["mon", "tues", "wed", "thur", "fri"] if solution[day]]
+        self.assertTrue(days)
+        for day in days:
+            self.assertEqual(list(solution[day]), [("physics", "John Smith")])
+
+    def test_slot_registry(self):
+        registry = SlotRegistry()
+        self.assertEqual(registry.intern("648", (9, 0)), 0)
+        self.assertEqual(registry.intern("649", (9, 0)), 1)
+        self.assertEqual(registry.intern("648", (9, 0)), 0)
+        self.assertEqual(registry.room(1), "649")
+        self.assertEqual(registry.time(1), (9, 0))
+        self.assertEqual(registry.decode({"class1": 1}), {"class1": ("649", (9, 0))})
+        prof_info = {'John Smith': {'courses': ['physics'], 'start_time': 9, 'end_time': 10}}
+        add_nodes(["physics"], ["648", "650"], {}, {"physics": "John Smith"}, prof_info,
+                  self.csp, registry)
+        domain = self.csp.node_domains[("physics", "John Smith")]
+        self.assertEqual(domain.typecode, "H")
+        self.assertEqual(len(registry), 5)
+        self.assertEqual(sorted(map(registry.slot, domain)),
+                         [("648", (9, 0)), ("648", (9, 30)), ("650", (9, 0)), ("650", (9, 30))])
+
+    def test_registry_wide_ids(self):
+        registry = SlotRegistry([("r{}".format(i), (9, 0)) for i in range(SLOT_ID_LIMIT - 1)])
+        domain = registry.domain(["r0", "new"], [(9, 0)])
+        self.assertEqual(domain.typecode, "H")
+        self.assertEqual(list(domain), [0, SLOT_ID_LIMIT - 1])
+        domain = registry.domain(["r1", "newer"], [(9, 0)])
+        self.assertNotEqual(domain.typecode, "H")
+        self.assertEqual(list(domain), [1, SLOT_ID_LIMIT])
+        self.assertEqual(registry.slot(domain[1]), ("newer", (9, 0)))
+        self.csp.add_node(("physics", "John Smith"), domain)
+        self.assertTrue(minConflicts(self.csp).solve(10)[("physics", "John Smith")] in domain)
+
+    def test_registry_constraints(self):
+        registry = SlotRegistry()
+        self.csp.add_node(("physics", "John Smith"), registry.domain(["648"], [(9, 0)]))
+        self.csp.add_node(("chemistry", "Lisa Jones"), registry.domain(["648", "649"], [(9, 30)]))
+        course_mins = {"physics": 60, "chemistry": 60}
+        self.assertEqual(clash_candidates(self.csp, course_mins, registry), {(0, 1)})
+        add_room_occupancy(self.csp, course_mins, registry)
+        conflict = minConflicts(self.csp).conflicted({
+            ("physics", "John Smith"): registry.ids[("648", (9, 0))],
+            ("chemistry", "Lisa Jones"): registry.ids[("648", (9, 30))]})
+        self.assertEqual(len(conflict), 2)
+
+    def create_sparse_csp(self):
+        self.csp.add_node(("physics", "John Smith"), [("648", (9, 0)), ("648", (9, 30))])
+        self.csp.add_node(("chemistry", "Lisa Jones"), [("649", (9, 0))])
+        self.csp.add_node(("biology", "Lisa Jones"), [("648", (14, 0))])
+        self.csp.add_node(("math", "Mike Williams"), [("648", (10, 0)), ("649", (15, 0))])
+        return {"physics": 60, "chemistry": 60, "biology": 60, "math": 60}
+
+    def test_clash_candidates(self):
+        course_mins = self.create_sparse_csp()
+        self.assertEqual(clash_candidates(self.csp, course_mins), {(0, 3)})
+
+    def test_add_binary_constraint_sparse(self):
+        course_mins = self.create_sparse_csp()
+        add_binary_constraint(self.csp, course_mins, lambda *args: 1, lambda *args: 1)
+        edges = {(node, neigh) for node, neighbors in self.csp.binary_constraints.items()
+                 for neigh in neighbors if node < neigh}
+        self.assertEqual(edges, {
+            (("math", "Mike Williams"), ("physics", "John Smith")),
+            (("biology", "Lisa Jones"), ("chemistry", "Lisa Jones"))})
+
+    def test_add_room_occupancy(self):
+        self.csp.add_node(("physics", "John Smith"), [("648", (9, 0)), ("648", (10, 0))])
+        self.csp.add_node(("chemistry", "Lisa Jones"), [("648", (9, 30))])
+        add_room_occupancy(self.csp, {"physics": 60, "chemistry": 60})
+        minC = minConflicts(self.csp)
+        conflict = minC.conflicted({("physics", "John Smith"): ("648", (9, 0)),
+                                    ("chemistry", "Lisa Jones"): ("648", (9, 30))})
+        self.assertEqual(len(conflict), 2)
+        conflict = minC.conflicted({("physics", "John Smith"): ("648", (10, 0)),
+                                    ("chemistry", "Lisa Jones"): ("648", (9, 30))})
+        self.assertEqual(len(conflict), 2)
+        conflict = minC.conflicted({("physics", "John Smith"): ("648", (9, 0)),
+                                    ("chemistry", "Lisa Jones"): ("649", (9, 30))})
+        self.assertEqual(conflict, set())
+
+    def test_no_time_clash_symmetric(self):
+        # the later-listed section starts first and runs into the other one
+        registry = SlotRegistry()
+        course_mins = {"physics": 60, "chemistry": 60}
+        _, no_class_overlap, no_time_clash = constraint_functions(
+            {"648": 30}, {"physics": 10, "chemistry": 10}, course_mins, registry)
+        self.csp.add_node(("physics", "John Smith"), registry.domain(["648"], [(10, 0)]))
+        self.csp.add_node(("chemistry", "Lisa Jones"),
+                          registry.domain(["648"], [(9, 30), (9, 0)]))
+        physics, chemistry = registry.ids[("648", (10, 0))], registry.ids[("648", (9, 30))]
+        self.assertEqual(no_time_clash(physics, chemistry, "physics", "chemistry"), 0)
+        self.assertEqual(no_time_clash(chemistry, physics, "chemistry", "physics"), 0)
+        add_binary_constraint(self.csp, course_mins, no_class_overlap, no_time_clash, registry)
+        minC = minConflicts(self.csp)
+        self.assertEqual(len(minC.conflicted({("physics", "John Smith"): physics,
+                                              ("chemistry", "Lisa Jones"): chemistry})), 2)
+        self.assertEqual(minC.conflicted({("physics", "John Smith"): physics,
+                                          ("chemistry", "Lisa Jones"):
+                                              registry.ids[("648", (9, 0))]}), set())
+
+    def test_constraint_matrices(self):
+        registry = SlotRegistry()
+        course_mins = {"physics": 6, "chemistry": 3}
+        _, no_class_overlap, no_time_clash = constraint_functions(
+            {"648": 30, "649": 30}, {"physics": 10, "chemistry": 10}, course_mins, registry)
+        vals1 = list(registry.domain(["648", "649"], [(9, mins) for mins in range(0, 60, 10)]))
+        vals2 = list(registry.domain(["648"], [(9, 20), (10, 0), (8, 0), (11, 0)]))
+        for func, outcomes in ((no_class_overlap, {0, 1, 2}), (no_time_clash, {0, 1})):
+            matrix = func.matrix(vals1, vals2, "physics", "chemistry").tolist()
+            self.assertEqual(matrix, [[func(val1, val2, "physics", "chemistry") for val2 in vals2]
+                                      for val1 in vals1])
+            self.assertEqual({weight for row in matrix for weight in row}, outcomes)
+
+    def test_compiled_day_tables(self):
+        # the compiled engine builds no eager tables and compiles the same weights
+        from compiledcsp import CompiledCSP
+        user_data = load_instance(SAMPLE_DATA)
+        professors, prof_info, _, _, courses = user_data[:5]
+        full_prof_assignment = profs_for_courses(courses, professors, prof_info)
+        registry = SlotRegistry()
+        weights = {}
+        for engine in (INCREMENTAL, COMPILED):
+            day_solver = DaySolver(user_data, full_prof_assignment, registry, TableCache(),
+                                   engine, room_grid=False)
+            csp = day_solver.build(courses)
+            lazy = [isinstance(table, LazyTable) for neighbors in csp.binary_constraints.values()
+                    for table in neighbors.values()]
+            self.assertTrue(lazy)
+            self.assertEqual(set(lazy), {engine == COMPILED})
+            weights[engine] = CompiledCSP(csp).weights.tolist()
+        # compared whole, a diff of the weights would take minutes to print
+        self.assertTrue(weights[COMPILED] == weights[INCREMENTAL])
+
+    def test_room_occupancy_back_to_back(self):
+        # a 60 minute section holds its room for six 10-minute slots only
+        self.csp.add_node(("physics", "John Smith"), [("648", (9, 0))])
+        self.csp.add_node(("chemistry", "Lisa Jones"), [("648", (9, 50)), ("648", (10, 0))])
+        add_room_occupancy(self.csp, {"physics": 60, "chemistry": 60})
+        minC = minConflicts(self.csp)
+        self.assertEqual(minC.conflicted({("physics", "John Smith"): ("648", (9, 0)),
+                                          ("chemistry", "Lisa Jones"): ("648", (10, 0))}), set())
+        self.assertEqual(len(minC.conflicted({("physics", "John Smith"): ("648", (9, 0)),
+                                              ("chemistry", "Lisa Jones"): ("648", (9, 50))})), 2)
+        solution = minC.solve(100)
+        self.assertEqual(solution[("chemistry", "Lisa Jones")], ("648", (10, 0)))